@@ -1,8 +1,14 @@
 import os
 import sys
 import json
-import torch
+import glob
 import time
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_EXCEPTION
 
 # --- CONFIGURACIÓN DE RUTAS PARA IMPORTACIÓN ---
 # CURRENT_DIR es SISINTFINAL/02_CODE
@@ -21,11 +27,20 @@ sys.path.append(os.path.join(MODULES_PATH, "visual"))
 sys.path.append(os.path.join(MODULES_PATH, "integration"))
 sys.path.append(UTILS_PATH)
 
+# --- PERFIL DE IMPORTS (--profile-imports) ---
+# Se instala antes de importar los módulos para medir también el arranque
+from import_profiler import PROFILER
+if "--profile-imports" in sys.argv:
+    PROFILER.install()
+
 # --- IMPORTACIÓN DE TUS UTILS ---
 try:
     # Se importa desde la carpeta utils
     from logger import get_logger
     from helpers import validate_input_file, create_output_directory
+    from artifact_cache import ArtifactCache
+    from report_writer import ReportWriter, report_path, rle_event, expand_event, REPORT_FORMATS
+    from profiling import StageProfiler
     log = get_logger("PIPELINE_PRINCIPAL")
 except ImportError as e:
     print(f"Error crítico: No se encontraron tus utils en {UTILS_PATH}. Detalle: {e}")
@@ -37,117 +52,569 @@ try:
     import face_extractor as fe     # Desde modules/visual/face_extractor.py
     import synchronizer as sy       # Desde modules/integration/synchronizer.py
     import visualizer as vi         # Desde modules/integration/visualizer.py
+    import dashboard as db          # Desde modules/integration/dashboard.py
     import analyzer as an           # Desde modules/integration/analyzer.py
+    import vad                      # Desde modules/audio_text/vad.py
     from validator import run_manual_validation # Desde modules/integration/validator.py
 except ImportError as e:
     log.error(f"Error al importar módulos funcionales: {e}")
     sys.exit(1)
 
 # --- PARÁMETROS GLOBALES ---
-VIDEO_NAME = "video_04.mp4" 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+DEFAULT_VIDEO = "video_04.mp4" 
+FACE_BATCH_SIZE = 16  # Rostros por pasada del modelo de emociones
+FACE_WORKERS = 1      # Hilos de inferencia que consumen la cola de frames decodificados
+
+# --- OPCIONES POR VIDEO ---
+# Valores por defecto; la CLI, el modo lote y el servidor las pasan a run() como un dict
+DEFAULT_OPTIONS = {
+    "face_sampling": "fixed",   # "fixed" (cada 30 frames) o "adaptive" (grueso + bisección en los cambios)
+    "face_budget": 60,          # Tope de frames por minuto en muestreo adaptativo
+    "face_tracking": False,     # Sigue el rostro entre frames y solo re-detecta si pierde confianza
+    "series_format": "csv",     # "csv" o "npy" (columnar, se abre con memory-map al sincronizar)
+    "face_fusion": "hard",      # "hard" (emoción dominante por frame) o "soft" (vector de probabilidades)
+    "report_format": "json",    # "json" (indentado), "compact" o "ndjson" (una línea por evento)
+    "report_history": "list",   # "list" (etiqueta por frame) o "rle" (corridas [etiqueta, repeticiones])
+    "plot_format": "png",       # Formato del dashboard: png, jpg, svg o pdf
+    "plot_dpi": None,           # None = 300 (o 100 en modo rápido)
+    "fast_plot": False,         # Dashboard rápido: resolución de pantalla y márgenes fijos
+    "async_plot": False,        # Dibuja el dashboard en un hilo de fondo, fuera del camino crítico
+    "html_dashboard": False,    # Genera además el dashboard HTML interactivo (zoom por niveles)
+}
+OPTION_CHOICES = {
+    "face_sampling": ("fixed", "adaptive"),
+    "series_format": ("csv", "npy"),
+    "face_fusion": ("hard", "soft"),
+    "report_format": REPORT_FORMATS,
+    "report_history": ("list", "rle"),
+    "plot_format": vi.PLOT_FORMATS,
+}
+# Opciones que deben ser enteros positivos (o None si ese es su valor por defecto)
+POSITIVE_INT_OPTIONS = ("face_budget", "plot_dpi")
 
 # Definición de Rutas de Archivos (Estructura SISINTFINAL)
 # Las entradas están en 01_DATA/raw
-VIDEO_PATH = os.path.join(BASE, "01_DATA", "raw", VIDEO_NAME)
-CLEAN_NAME = os.path.splitext(VIDEO_NAME)[0]
+RAW_DIR = os.path.join(BASE, "01_DATA", "raw")
+REPORTS_DIR = os.path.join(BASE, "05_OUTPUTS", "json_reports")
+MANUAL_CSV = os.path.join(BASE, "01_DATA", "validation_labels.csv")
 
-# Salidas Intermedias y Finales organizadas según tu estructura
-AUDIO_OUT = os.path.join(BASE, "01_DATA", "audio_clean", f"audio_{CLEAN_NAME}.wav")
-CSV_OUT = os.path.join(BASE, "01_DATA", "series_temporales", f"{CLEAN_NAME}_faces.csv")
-JSON_OUT = os.path.join(BASE, "05_OUTPUTS", "json_reports", f"{CLEAN_NAME}_FINAL.json")
-IMG_OUT = os.path.join(BASE, "05_OUTPUTS", "visualizations", f"{CLEAN_NAME}.png")
+# Caché de artefactos direccionada por contenido (reemplaza el "skip logic" por nombre)
+CACHE_DIR = os.path.join(BASE, "01_DATA", "cache")
+CACHE_MAX_GB = 5.0
 
-def run():
-    start_time_pipeline = time.time()
-    log.info(f"=== INICIANDO PIPELINE MULTIMODAL: {VIDEO_NAME} ===")
-    
-    # 1. Validación Inicial
-    if not validate_input_file(VIDEO_PATH):
-        log.error(f"Archivo de video no encontrado: {VIDEO_PATH}")
+# Servidor de modelos residentes (server.py); vacío = siempre en proceso
+SERVER_URL = os.environ.get("SISINT_SERVER_URL", "")
+SERVER_HEALTH_TIMEOUT = 2.0
+
+_MODELS_LOCK = threading.Lock()
+
+class BranchError(RuntimeError):
+    """Fallo de una rama (audio o visual) que aborta el pipeline."""
+
+class ServerUnavailable(RuntimeError):
+    """El servidor de modelos no responde; se usa el modo en proceso."""
+
+def pipeline_options(options=None, **overrides):
+    """
+    Opciones completas de una corrida: DEFAULT_OPTIONS actualizado con `options`
+    (dict, p. ej. el que llega al servidor) y `overrides`. Lanza ValueError con
+    llaves, valores o tipos inválidos.
+    """
+    merged = dict(DEFAULT_OPTIONS)
+    for key, value in {**(options or {}), **overrides}.items():
+        if key not in DEFAULT_OPTIONS:
+            raise ValueError(f"Opción desconocida: {key}")
+        if key in OPTION_CHOICES and value not in OPTION_CHOICES[key]:
+            raise ValueError(f"Valor inválido para {key}: {value!r} (opciones: {', '.join(OPTION_CHOICES[key])})")
+        if key in POSITIVE_INT_OPTIONS and not (value is None and DEFAULT_OPTIONS[key] is None) and (
+                isinstance(value, bool) or not isinstance(value, int) or value <= 0):
+            raise ValueError(f"Valor inválido para {key}: {value!r} (se espera un entero positivo)")
+        if isinstance(DEFAULT_OPTIONS[key], bool) and not isinstance(value, bool):
+            raise ValueError(f"Valor inválido para {key}: {value!r} (se espera true o false)")
+        merged[key] = value
+    return merged
+
+def build_paths(video, options=None):
+    """
+    Rutas de entrada y salida de un video. `video` puede ser un nombre dentro de
+    01_DATA/raw (ej. "video_04.mp4") o una ruta completa. Los formatos de la serie
+    facial, del reporte y del dashboard salen de `options` (ver pipeline_options).
+    """
+    options = pipeline_options(options)
+    video_path = video if os.path.dirname(video) else os.path.join(RAW_DIR, video)
+    clean_name = os.path.splitext(os.path.basename(video_path))[0]
+    # Salidas Intermedias y Finales organizadas según tu estructura
+    return {
+        "video_path": video_path,
+        "clean_name": clean_name,
+        "audio_out": os.path.join(BASE, "01_DATA", "audio_clean", f"audio_{clean_name}.wav"),
+        "faces_out": os.path.join(BASE, "01_DATA", "series_temporales",
+                                  f"{clean_name}_faces.{options['series_format']}"),
+        "json_out": report_path(os.path.join(REPORTS_DIR, f"{clean_name}_FINAL.json"), options["report_format"]),
+        "img_out": os.path.join(BASE, "05_OUTPUTS", "visualizations", f"{clean_name}.{options['plot_format']}"),
+        "html_out": os.path.join(BASE, "05_OUTPUTS", "visualizations", f"{clean_name}_dashboard.html"),
+        "metrics_out": os.path.join(BASE, "05_OUTPUTS", "metrics", f"{clean_name}_metrics.json"),
+    }
+
+def setup_models():
+    """
+    Carga Whisper, RoBERTuito y DeepFace una sola vez por proceso. Lo usan el modo
+    lote y el servidor para precalentar; run() no lo necesita porque cada etapa
+    carga su modelo solo si no encuentra su artefacto en caché.
+    """
+    with _MODELS_LOCK:
+        ts.setup_pipelines()
+        fe.warmup_models()
+
+@contextmanager
+def timed_stage(name, profiler):
+    """
+    Mide la etapa `name` con el StageProfiler de la corrida (duración, pico de
+    memoria y, si está activado, cProfile) y etiqueta sus imports.
+    """
+    PROFILER.set_stage(name)
+    try:
+        with profiler.stage(name):
+            yield
+    finally:
+        PROFILER.set_stage("pipeline")
+        if name in profiler.timings:
+            log.info(f"Etapa '{name}' completada en {profiler.timings[name]:.2f}s")
+
+def run_audio_branch(paths, profiler, cancel_event, streaming_asr=False, cache=None, speech_regions=None):
+    """
+    Rama Audio/Texto: extracción con FFmpeg + ASR/NLP. Si recibe `speech_regions`
+    (un Future), corre el VAD, publica las regiones para la rama visual y transcribe
+    solo esas regiones.
+    """
+    try:
+        # Aseguramos que existan las carpetas de salida
+        create_output_directory(os.path.dirname(paths["audio_out"]))
+        with timed_stage("audio_extraction", profiler):
+            audio_ok = ts.extract_audio(paths["video_path"], paths["audio_out"], cache=cache)
+        if not audio_ok:
+            raise BranchError("Fallo en la extracción de audio.")
+        if cancel_event.is_set():
+            return []
+
+        regions = None
+        if speech_regions is not None:
+            with timed_stage("vad", profiler):
+                regions = vad.detect_speech_regions(paths["audio_out"])
+            speech_regions.set_result(regions)
+
+        stats = {}
+        with timed_stage("transcription", profiler):
+            # Según tu código, este método integra transcripción y emoción
+            transcription_data = ts.get_transcription_and_emotion(paths["audio_out"], cancel_event=cancel_event,
+                                                                  streaming=streaming_asr, cache=cache,
+                                                                  regions=regions, stats=stats)
+        profiler.count("transcription", chunks=stats.get("chunks", 0))
+        if not stats.get("cached"):
+            # Sub-etapas medidas dentro del transcriptor
+            profiler.record("asr", stats.get("asr_sec", 0.0), windows=stats.get("windows", 0))
+            profiler.record("nlp", stats.get("nlp_sec", 0.0), chunks=stats.get("chunks", 0))
+        return transcription_data
+    finally:
+        # Si la rama termina sin publicar las regiones (falla o cancelación), la rama
+        # visual no debe quedar esperando ni analizar el video completo
+        if speech_regions is not None and not speech_regions.done():
+            speech_regions.set_exception(BranchError("La rama de audio terminó sin regiones de voz."))
+
+def run_visual_branch(paths, profiler, cancel_event, cache=None, speech_regions=None, options=None):
+    """
+    Rama Visual: serie temporal de emociones faciales (DeepFace). Con VAD espera las
+    regiones de voz y solo analiza los frames dentro de ellas; si la rama de audio
+    falla antes de publicarlas, no analiza nada.
+    """
+    options = pipeline_options(options)
+    try:
+        spans = speech_regions.result() if speech_regions is not None else None
+    except BranchError:
+        # La rama de audio falló antes del VAD: se propaga su error, no uno de esta rama
+        return
+    if cancel_event.is_set():
         return
+    create_output_directory(os.path.dirname(paths["faces_out"]))
+    stats = {}
+    with timed_stage("face_analysis", profiler):
+        faces_ok = fe.extract_faces_from_video(paths["video_path"], paths["faces_out"], sample_rate=30,
+                                               batch_size=FACE_BATCH_SIZE, num_workers=FACE_WORKERS,
+                                               stats=stats, cancel_event=cancel_event, cache=cache, spans=spans,
+                                               sampling=options["face_sampling"],
+                                               budget_per_min=options["face_budget"],
+                                               tracking=options["face_tracking"])
+    if "frames" in stats:
+        # Sub-etapas medidas dentro del extractor (decodificación e inferencia se solapan)
+        profiler.count("face_analysis", frames=stats["frames"])
+        profiler.record("face_decode", stats["decode_sec"], frames=stats["frames"])
+        profiler.record("face_inference", stats["infer_sec"], faces=stats["faces"])
+    if not faces_ok and not cancel_event.is_set():
+        raise BranchError("Fallo en el análisis facial.")
+
+def run_branches(paths, profiler, serial=False, streaming_asr=False, cache=None, speech_regions=None, options=None):
+    """
+    Ejecuta las ramas de audio y visual, que no comparten datos hasta la sincronización
+    (salvo las regiones de voz del VAD, que la rama visual espera si están activadas).
+    En modo concurrente corren en hilos; si una falla, se cancela la otra y se propaga el error.
+    La cancelación se revisa entre chunks de NLP y entre frames decodificados: una
+    llamada a Whisper ya iniciada no se interrumpe, así que si falla la rama visual
+    el error se propaga cuando termina la transcripción en curso.
+    """
+    cancel_event = threading.Event()
+    if serial:
+        transcription_data = run_audio_branch(paths, profiler, cancel_event, streaming_asr, cache, speech_regions)
+        run_visual_branch(paths, profiler, cancel_event, cache, speech_regions, options)
+        return transcription_data
 
-    # 2. Inicializar Modelos de IA
-    ts.setup_pipelines(DEVICE)
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="rama") as pool:
+        audio_future = pool.submit(run_audio_branch, paths, profiler, cancel_event, streaming_asr, cache,
+                                   speech_regions)
+        visual_future = pool.submit(run_visual_branch, paths, profiler, cancel_event, cache, speech_regions, options)
+        done, _ = wait([audio_future, visual_future], return_when=FIRST_EXCEPTION)
+        failed = [f for f in done if f.exception() is not None]
+        if failed:
+            log.warning("Una rama falló: cancelando la rama hermana...")
+            cancel_event.set()
+            raise failed[0].exception()
+    return audio_future.result()
 
-    # 3. FASE AUDIO/TEXTO
-    transcription_data = []
-    # Aseguramos que existan las carpetas de salida
-    create_output_directory(os.path.dirname(AUDIO_OUT))
+def open_cache(cache_dir=CACHE_DIR, cache_max_gb=CACHE_MAX_GB):
+    return ArtifactCache(cache_dir, max_bytes=int(cache_max_gb * 1024 ** 3))
+
+def run(video=DEFAULT_VIDEO, serial=False, streaming_asr=False, cache=None, vad=False, cprofile_dir=None,
+        options=None, track_rss=True):
+    """
+    Procesa un video completo. Retorna el reporte final (dict) o None si falla.
+    Los modelos (y torch/deepface) se cargan solo en las etapas que no están en
+    caché, y solo la primera vez que se necesitan en el proceso.
+    Con `vad` solo se transcriben (y analizan facialmente) las regiones con voz.
+    Cada etapa queda medida (tiempo, memoria, contadores) en `global_metrics` y en
+    05_OUTPUTS/metrics/<video>_metrics.json; con `cprofile_dir` también en .prof.
+    `options` ajusta el muestreo facial, la fusión y los formatos de salida
+    (ver DEFAULT_OPTIONS y pipeline_options). Con otros videos corriendo en el mismo
+    proceso, `track_rss=False` omite la memoria por etapa (sería la de todos).
+    """
+    options = pipeline_options(options)
+    paths = build_paths(video, options)
+    start_time_pipeline = time.time()
+    profiler = StageProfiler(cprofile_dir=cprofile_dir, track_rss=track_rss)
+    mode = "serial" if serial else "concurrente"
+    log.info(f"=== INICIANDO PIPELINE MULTIMODAL: {os.path.basename(paths['video_path'])} (modo {mode}) ===")
     
-    if ts.extract_audio(VIDEO_PATH, AUDIO_OUT):
-        # Según tu código, este método integra transcripción y emoción
-        transcription_data = ts.get_transcription_and_emotion(AUDIO_OUT)
-    else:
-        log.error("Fallo en la extracción de audio. Abortando.")
-        return
+    # 1. Validación Inicial
+    if not validate_input_file(paths["video_path"]):
+        log.error(f"Archivo de video no encontrado: {paths['video_path']}")
+        return None
+
+    # 2-4. FASES AUDIO/TEXTO Y VISUAL (DeepFace)
+    # Cada etapa se recalcula solo si cambian sus entradas, parámetros o modelo
+    if cache is None:
+        cache = open_cache()
+    speech_regions = Future() if vad else None
+    try:
+        transcription_data = run_branches(paths, profiler, serial=serial, streaming_asr=streaming_asr,
+                                          cache=cache, speech_regions=speech_regions, options=options)
+    except BranchError as e:
+        log.error(f"{e} Abortando.")
+        write_metrics(profiler, paths, status="FAILED")
+        return None
 
-    # 4. FASE VISUAL (DeepFace)
-    create_output_directory(os.path.dirname(CSV_OUT))
-    fe.extract_faces_from_video(VIDEO_PATH, CSV_OUT, sample_rate=30)
+    report_final = None
+    plot_future = None
+    faces_out, json_out, img_out = paths["faces_out"], paths["json_out"], paths["img_out"]
 
-    # 5. FASE DE SINCRONIZACIÓN E INTELIGENCIA (PBI 4.1, 4.2 & 4.3)
-    if transcription_data and os.path.exists(CSV_OUT):
+    # 5-7. FUSIÓN, INSIGHTS Y REPORTE FINAL, evento por evento (PBI 4.1, 4.2 & 4.3)
+    if transcription_data and os.path.exists(faces_out):
         log.info("Sincronizando fuentes y generando estructura de contrato...")
-        
-        # Obtiene los eventos integrados con el historial y nuevas llaves
-        events = sy.synchronize_data(transcription_data, CSV_OUT)
+        header = {
+            "interview_id": f"INT-{paths['clean_name'].upper()}-{int(time.time())}",
+            "video_path": paths["video_path"],
+        }
+        create_output_directory(os.path.dirname(json_out))
 
-        if not events:
-            log.error("No se generaron eventos tras la sincronización.")
-            return
+        # Cada evento sale de la fusión, recibe su insight y se escribe de inmediato.
+        # Mientras corre la fusión solo se retiene su versión compacta (historia facial
+        # en RLE); las métricas globales (PBI 4.2) se acumulan en el escritor y van al
+        # final del reporte.
+        events = []
+        insights_sec = write_sec = 0.0
+        with ReportWriter(json_out, header, options["report_format"], options["report_history"]) as writer:
+            with timed_stage("synchronization", profiler):
+                for event in sy.iter_synchronize_data(transcription_data, faces_out,
+                                                      soft=options["face_fusion"] == "soft"):
+                    tick = time.perf_counter()
+                    # analyzer.generate_insights evalúa el score y redacta la frase
+                    event["temporal_insight"] = an.generate_insights(event)
+                    tock = time.perf_counter()
+                    writer.write_event(event)
+                    insights_sec += tock - tick
+                    write_sec += time.perf_counter() - tock
+                    events.append(rle_event(event))
+            profiler.count("synchronization", events=len(events))
 
-        # 6. CÁLCULO DE MÉTRICAS GLOBALES (PBI 4.2)
-        total_scores = [e['congruence_score'] for e in events if 'congruence_score' in e]
-        overall_score = sum(total_scores) / len(total_scores) if total_scores else 0.0
-        total_duration = events[-1]['end_time_sec'] if events else 0.0
-        
-        # 7. ENSAMBLAJE DEL REPORTE FINAL (Siguiendo Estructura de Contrato PBI 4.3)
-        report_final = {
-            "interview_id": f"INT-{CLEAN_NAME.upper()}-{int(time.time())}",
-            "video_path": VIDEO_PATH,
-            "global_metrics": {
+            if not events:
+                log.error("No se generaron eventos tras la sincronización.")
+                write_metrics(profiler, paths, status="FAILED")
+                return None
+
+            # Sub-etapas intercaladas con la fusión (incluidas en 'synchronization')
+            profiler.record("insights", insights_sec, events=len(events))
+            profiler.record("report_write", write_sec, events=len(events))
+            overall_score = writer.overall_score()
+            profile = profiler.summary()
+            global_metrics = {
                 "overall_congruence_score": round(overall_score, 2),
-                "total_duration_sec": round(total_duration, 2)
-            },
-            "events": events # Lista con transcribed_text, emotion_facial_history, etc.
-        }
+                "total_duration_sec": round(writer.end_time_sec, 2),
+                # Copia: las etapas posteriores (visualización, validación) no están en el archivo
+                "stage_timings_sec": dict(profiler.timings),
+                "stage_profile": profile["stages"],
+            }
+            if "peak_rss_mb" in profile:
+                global_metrics["peak_rss_mb"] = profile["peak_rss_mb"]
+            if speech_regions is not None and speech_regions.result() is not None:
+                regions = speech_regions.result()
+                global_metrics["speech_regions"] = len(regions)
+                global_metrics["speech_duration_sec"] = round(vad.speech_duration(regions), 2)
+            writer.finish(global_metrics)
 
-        # --- FASE DE INSIGHTS (PBI 4.3) ---
-        log.info("Generando insights narrativos para el reporte...")
-        for event in report_final["events"]:
-            # analyzer.generate_insights evalúa el score y redacta la frase
-            event["temporal_insight"] = an.generate_insights(event)
+        # Estructura de Contrato PBI 4.3 (lo que retorna run() y entrega el servidor):
+        # la historia facial vuelve a ser la lista por frame, como en el archivo.
+        report_final = {
+            **header,
+            "global_metrics": global_metrics,
+            "events": [expand_event(event) for event in events] # transcribed_text, emotion_facial_history, etc.
+        }
 
-        # Guardar JSON final en 05_OUTPUTS
-        create_output_directory(os.path.dirname(JSON_OUT))
-        with open(JSON_OUT, 'w', encoding='utf-8') as f:
-            json.dump(report_final, f, indent=4, ensure_ascii=False)
-        
-        log.info(f"Reporte Final guardado en: {JSON_OUT}")
+        log.info(f"Reporte Final guardado en: {json_out}")
         log.info(f"Métrica Overall de la Entrevista: {round(overall_score, 2)}")
 
         # 8. GENERACIÓN DE VISUALIZACIÓN
-        create_output_directory(os.path.dirname(IMG_OUT))
-        vi.generate_comparison_plot(events, IMG_OUT)
-        log.info(f"Visualización guardada en: {IMG_OUT}")
+        create_output_directory(os.path.dirname(img_out))
+        plot_options = {"fast": options["fast_plot"], **({"dpi": options["plot_dpi"]} if options["plot_dpi"] else {})}
+        if options["async_plot"]:
+            # El render sigue en segundo plano mientras corre la validación;
+            # se espera antes de escribir las métricas y retornar
+            plot_stats = {}
+            plot_future = vi.submit_comparison_plot(events, img_out, stats=plot_stats, **plot_options)
+            log.info(f"Visualización en segundo plano hacia: {img_out}")
+        else:
+            with timed_stage("visualization", profiler):
+                vi.generate_comparison_plot(events, img_out, **plot_options)
+            log.info(f"Visualización guardada en: {img_out}")
+        if options["html_dashboard"]:
+            with timed_stage("html_dashboard", profiler):
+                db.generate_html_dashboard(report_final, paths["html_out"], faces_path=faces_out)
 
         # 9. TCI4.6 - Validación de Robustez
         log.info("Ejecutando auditoría de métricas (TCI4.6)...")
-        manual_csv = os.path.join(BASE, "01_DATA", "validation_labels.csv")
         
-        if os.path.exists(manual_csv):
-            robustness_report = run_manual_validation(JSON_OUT, manual_csv)
+        if os.path.exists(MANUAL_CSV):
+            with timed_stage("validation", profiler):
+                robustness_report = run_manual_validation(json_out, MANUAL_CSV)
             if robustness_report:
                 log.info(f"EL MODELO TIENE UNA PRECISIÓN DEL {robustness_report['robustness_accuracy']}% RESPECTO AL HUMANO.")
         else:
-            log.warning(f"No se encontró archivo de validación manual en: {manual_csv}")
+            log.warning(f"No se encontró archivo de validación manual en: {MANUAL_CSV}")
+
+        if plot_future is not None:
+            # Propaga un error del render igual que el modo síncrono
+            plot_future.result()
+            profiler.record("visualization", plot_stats["seconds"])
+            log.info(f"Visualización guardada en: {img_out}")
 
     else:
         log.error("No se pudo completar la sincronización. Verifica archivos intermedios.")
 
+    write_metrics(profiler, paths, status="OK" if report_final else "FAILED")
     duration = time.time() - start_time_pipeline
     log.info(f"=== PIPELINE FINALIZADO EN {duration:.2f} SEGUNDOS ===")
+    return report_final
+
+def write_metrics(profiler, paths, status):
+    """
+    Archivo de métricas de la corrida (incluye las etapas posteriores al reporte:
+    visualización y validación): 05_OUTPUTS/metrics/<video>_metrics.json.
+    """
+    create_output_directory(os.path.dirname(paths["metrics_out"]))
+    data = profiler.write(paths["metrics_out"], video=paths["video_path"], status=status,
+                          timestamp=int(time.time()))
+    slowest = sorted(data["stages"].items(), key=lambda item: item[1].get("seconds", 0), reverse=True)[:3]
+    log.info("Etapas más costosas: " + ", ".join(f"{name} {entry.get('seconds', 0):.2f}s" for name, entry in slowest))
+    log.info(f"Métricas de la corrida: {paths['metrics_out']}")
+
+def run_remote(server_url, video=DEFAULT_VIDEO, serial=False, streaming_asr=False, vad=False, options=None):
+    """
+    Cliente ligero: envía el video (y sus `options`) al servidor de modelos
+    residentes y retorna el payload de _FINAL.json (o None si el trabajo falló en el servidor).
+    Lanza ServerUnavailable si el servidor no responde.
+    """
+    base_url = server_url.rstrip("/")
+    try:
+        urllib.request.urlopen(f"{base_url}/health", timeout=SERVER_HEALTH_TIMEOUT).close()
+    except (urllib.error.URLError, OSError) as e:
+        raise ServerUnavailable(f"Servidor no disponible en {base_url}: {e}")
+
+    payload = json.dumps({"video": os.path.abspath(build_paths(video)["video_path"]),
+                          "serial": serial, "streaming_asr": streaming_asr, "vad": vad,
+                          "options": pipeline_options(options)}).encode("utf-8")
+    req = urllib.request.Request(f"{base_url}/analyze", data=payload, method="POST",
+                                 headers={"Content-Type": "application/json"})
+    log.info(f"Enviando {os.path.basename(video)} al servidor de modelos: {base_url}")
+    try:
+        with urllib.request.urlopen(req) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        log.error(f"El servidor reportó un fallo ({e.code}): {e.read().decode('utf-8', 'replace')}")
+        return None
+    except (urllib.error.URLError, OSError) as e:
+        raise ServerUnavailable(f"Conexión perdida con {base_url}: {e}")
+
+def resolve_batch(pattern):
+    """Lista de videos de un directorio (todos los .mp4) o de un patrón glob."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.mp4")
+    return sorted(glob.glob(pattern))
+
+def run_batch(pattern, workers=2, serial=False, streaming_asr=False, cache=None, vad=False, options=None):
+    """
+    Modo lote: carga los modelos una sola vez y reparte los videos en un pool de hilos
+    que comparte esos modelos. Escribe un resumen con tiempos, fallos y congruencia global.
+    """
+    options = pipeline_options(options)
+    videos = resolve_batch(pattern)
+    if not videos:
+        log.error(f"No se encontraron videos para: {pattern}")
+        return None
+
+    start = time.time()
+    log.info(f"=== MODO LOTE: {len(videos)} videos con {workers} workers ===")
+    setup_models()
+    if cache is None:
+        cache = open_cache()
+
+    def process(video_path):
+        tick = time.time()
+        item = {"video": os.path.basename(video_path), "status": "FAILED", "error": None}
+        try:
+            report = run(video_path, serial=serial, streaming_asr=streaming_asr, cache=cache, vad=vad,
+                         options=options, track_rss=workers <= 1)
+            if report is not None:
+                item.update({
+                    "status": "OK",
+                    "json_path": build_paths(video_path, options)["json_out"],
+                    "overall_congruence_score": report["global_metrics"]["overall_congruence_score"],
+                    "total_duration_sec": report["global_metrics"]["total_duration_sec"],
+                    "stage_timings_sec": report["global_metrics"]["stage_timings_sec"],
+                })
+            else:
+                item["error"] = "El pipeline no generó reporte (ver log)."
+        except Exception as e:
+            log.error(f"Fallo procesando {video_path}: {e}")
+            item["error"] = str(e)
+        item["wall_time_sec"] = round(time.time() - tick, 2)
+        return item
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="video") as pool:
+        results = list(pool.map(process, videos))
+
+    ok = [r for r in results if r["status"] == "OK"]
+    # Congruencia global ponderada por la duración de cada entrevista
+    total_duration = sum(r["total_duration_sec"] for r in ok)
+    overall = (sum(r["overall_congruence_score"] * r["total_duration_sec"] for r in ok) / total_duration
+               if total_duration > 0 else 0.0)
+    summary = {
+        "batch_pattern": pattern,
+        "videos_total": len(results),
+        "videos_failed": len(results) - len(ok),
+        "overall_congruence_score": round(overall, 2),
+        "wall_time_sec": round(time.time() - start, 2),
+        "videos": results,
+    }
+
+    summary_path = os.path.join(REPORTS_DIR, f"batch_summary_{int(start)}.json")
+    create_output_directory(REPORTS_DIR)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=4, ensure_ascii=False)
+    log.info(f"=== LOTE FINALIZADO: {len(ok)}/{len(results)} videos OK en {summary['wall_time_sec']:.2f}s. "
+             f"Resumen: {summary_path} ===")
+    return summary
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pipeline multimodal de análisis de entrevistas.")
+    parser.add_argument("--video", default=DEFAULT_VIDEO,
+                        help="Video a procesar (nombre dentro de 01_DATA/raw o ruta completa).")
+    parser.add_argument("--batch", metavar="DIR_O_GLOB",
+                        help="Procesa todos los videos de una carpeta o patrón (ej. '01_DATA/raw/*.mp4').")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Videos procesados en paralelo en modo lote.")
+    parser.add_argument("--serial", action="store_true",
+                        help="Ejecuta las ramas de audio y visual una tras otra (sin concurrencia).")
+    parser.add_argument("--streaming-asr", action="store_true",
+                        help="Transcribe el audio por ventanas solapadas con memoria acotada (audios largos).")
+    parser.add_argument("--vad", action="store_true",
+                        help="Detecta las regiones con voz y solo transcribe/analiza esos tramos (omite silencios).")
+    parser.add_argument("--face-sampling", choices=OPTION_CHOICES["face_sampling"],
+                        default=DEFAULT_OPTIONS["face_sampling"],
+                        help="Muestreo facial fijo o adaptativo (más frames donde cambia la emoción).")
+    parser.add_argument("--face-budget", type=int, default=DEFAULT_OPTIONS["face_budget"],
+                        help="Tope de frames analizados por minuto de video en muestreo adaptativo.")
+    parser.add_argument("--face-tracking", action="store_true",
+                        help="Detecta el rostro una vez y lo sigue entre frames (re-detecta solo si se pierde).")
+    parser.add_argument("--series-format", choices=OPTION_CHOICES["series_format"],
+                        default=DEFAULT_OPTIONS["series_format"],
+                        help="Formato de la serie facial: CSV o .npy columnar (memory-map al sincronizar).")
+    parser.add_argument("--face-fusion", choices=OPTION_CHOICES["face_fusion"],
+                        default=DEFAULT_OPTIONS["face_fusion"],
+                        help="Votación facial por emoción dominante o con las probabilidades de cada frame.")
+    parser.add_argument("--report-format", choices=OPTION_CHOICES["report_format"],
+                        default=DEFAULT_OPTIONS["report_format"],
+                        help="Formato del reporte final: JSON indentado, compacto o NDJSON (un evento por línea).")
+    parser.add_argument("--report-history", choices=OPTION_CHOICES["report_history"],
+                        default=DEFAULT_OPTIONS["report_history"],
+                        help="emotion_facial_history como lista por frame o en corridas (RLE).")
+    parser.add_argument("--plot-format", choices=OPTION_CHOICES["plot_format"],
+                        default=DEFAULT_OPTIONS["plot_format"],
+                        help="Formato del dashboard de visualización.")
+    parser.add_argument("--plot-dpi", type=int, default=DEFAULT_OPTIONS["plot_dpi"],
+                        help="Resolución del dashboard (por defecto 300, o 100 con --fast-plot).")
+    parser.add_argument("--fast-plot", action="store_true",
+                        help="Dashboard rápido: resolución de pantalla, márgenes fijos y sin segundo render.")
+    parser.add_argument("--async-plot", action="store_true",
+                        help="Dibuja el dashboard en segundo plano sin bloquear la validación ni el retorno.")
+    parser.add_argument("--html-dashboard", action="store_true",
+                        help="Genera además un dashboard HTML interactivo con zoom hasta el frame.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="Carpeta de la caché de artefactos por contenido.")
+    parser.add_argument("--cache-max-gb", type=float, default=CACHE_MAX_GB,
+                        help="Tamaño máximo de la caché antes de desalojar (LRU).")
+    parser.add_argument("--server", default=SERVER_URL,
+                        help="URL del servidor de modelos (ej. http://127.0.0.1:8765). "
+                             "Si no responde, se procesa en este proceso.")
+    parser.add_argument("--cprofile", metavar="DIR",
+                        help="Ejecuta cada etapa bajo cProfile y guarda <etapa>.prof en DIR (snakeviz, pstats).")
+    parser.add_argument("--profile-imports", action="store_true",
+                        help="Al terminar, reporta los imports más lentos y en qué etapa ocurrieron.")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    args = parse_args()
+    # Las flags con el mismo nombre que una opción por video (--face-sampling -> face_sampling)
+    options = pipeline_options({key: getattr(args, key) for key in DEFAULT_OPTIONS})
+    cache = open_cache(args.cache_dir, args.cache_max_gb)
+    if args.batch:
+        run_batch(args.batch, workers=args.workers, serial=args.serial, streaming_asr=args.streaming_asr,
+                  cache=cache, vad=args.vad, options=options)
+    elif args.server:
+        try:
+            run_remote(args.server, args.video, serial=args.serial, streaming_asr=args.streaming_asr, vad=args.vad,
+                       options=options)
+        except ServerUnavailable as e:
+            log.warning(f"{e} Procesando en este proceso.")
+            run(args.video, serial=args.serial, streaming_asr=args.streaming_asr, cache=cache, vad=args.vad,
+                cprofile_dir=args.cprofile, options=options)
+    else:
+        run(args.video, serial=args.serial, streaming_asr=args.streaming_asr, cache=cache, vad=args.vad,
+            cprofile_dir=args.cprofile, options=options)
+    if args.profile_imports:
+        PROFILER.report(log)
@@ -0,0 +1,85 @@
+import wave
+import numpy as np
+
+# Ventanas de 30 s (contexto nativo de Whisper) con 10 s de solapamiento
+DEFAULT_WINDOW_SEC = 30.0
+DEFAULT_OVERLAP_SEC = 10.0
+
+
+def iter_audio_windows(audio_path, window_sec=DEFAULT_WINDOW_SEC, overlap_sec=DEFAULT_OVERLAP_SEC,
+                       start_sec=0.0, end_sec=None):
+    """
+    Lee un WAV PCM 16-bit por ventanas solapadas sin cargar el archivo completo.
+    Produce tuplas (offset_sec, samples_float32, sampling_rate, next_offset_sec);
+    next_offset_sec es None en la última ventana. `start_sec`/`end_sec` limitan el
+    ventaneo a un tramo del audio (los offsets siguen siendo absolutos).
+    """
+    if overlap_sec >= window_sec:
+        raise ValueError("El solapamiento debe ser menor que la ventana.")
+
+    with wave.open(audio_path, "rb") as wav:
+        sampling_rate = wav.getframerate()
+        channels = wav.getnchannels()
+        if wav.getsampwidth() != 2:
+            raise ValueError("Se esperaba audio PCM de 16 bits (pcm_s16le).")
+        total = wav.getnframes()
+        if end_sec is not None:
+            total = min(total, int(round(end_sec * sampling_rate)))
+        window = int(window_sec * sampling_rate)
+        step = int((window_sec - overlap_sec) * sampling_rate)
+
+        start = int(round(start_sec * sampling_rate))
+        while start < total:
+            wav.setpos(start)
+            raw = wav.readframes(min(window, total - start))
+            samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+            next_start = start + step
+            is_last = start + window >= total
+            yield (start / sampling_rate, samples, sampling_rate,
+                   None if is_last else next_start / sampling_rate)
+            if is_last:
+                break
+            start = next_start
+
+
+def iter_speech_windows(audio_path, regions, window_sec=DEFAULT_WINDOW_SEC, overlap_sec=DEFAULT_OVERLAP_SEC):
+    """
+    Ventanas solo sobre las regiones de voz (VAD). Cada región se ventanea por
+    separado: su última ventana marca next_offset como None, así el fragmento que
+    llega al final de la región se emite en vez de esperar a otra ventana.
+    """
+    for start_sec, end_sec in regions:
+        yield from iter_audio_windows(audio_path, window_sec, overlap_sec, start_sec, end_sec)
+
+
+def merge_window_chunks(chunks, offset_sec, window_end_sec, next_offset_sec, emitted_until):
+    """
+    Traslada los fragmentos de Whisper de una ventana a la línea de tiempo absoluta y
+    descarta los duplicados del solapamiento.
+
+    - Un fragmento ya cubierto por la ventana anterior (su punto medio cae antes de
+      `emitted_until`) se ignora.
+    - Un fragmento cortado por el borde de la ventana se deja para la siguiente si esta
+      contiene su inicio; si no, se emite recortado al final de la ventana.
+
+    Retorna (fragmentos_absolutos, nuevo_emitted_until).
+    """
+    merged = []
+    for chunk in chunks:
+        start, end = chunk["timestamp"]
+        start = offset_sec + (start or 0.0)
+        truncated = end is None or offset_sec + end >= window_end_sec - 0.05
+        end = window_end_sec if end is None else min(offset_sec + end, window_end_sec)
+
+        if (start + end) / 2 < emitted_until:
+            continue
+        if truncated and next_offset_sec is not None and start >= next_offset_sec:
+            # La siguiente ventana lo transcribe completo; lo anterior ya quedó cubierto
+            emitted_until = start
+            break
+
+        merged.append({"timestamp": (round(start, 2), round(end, 2)), "text": chunk["text"]})
+        emitted_until = end
+    return merged, emitted_until
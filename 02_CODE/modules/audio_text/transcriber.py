@@ -1,9 +1,11 @@
 import os
-import torch
-import ffmpeg
-from transformers import pipeline
+import threading
+import time
 from utils.logger import get_logger
 from utils.helpers import validate_input_file, create_output_directory
+from modules.audio_text.audio_windows import (
+    iter_audio_windows, iter_speech_windows, merge_window_chunks, DEFAULT_WINDOW_SEC, DEFAULT_OVERLAP_SEC
+)
 
 log = get_logger("Modulo_Transcripcion")
 
@@ -12,63 +14,234 @@ NLP_MODEL = "pysentimiento/robertuito-emotion-analysis"
 
 ASR_PIPE = None
 NLP_PIPE = None
+_PIPES_LOCK = threading.Lock()
 
-def setup_pipelines(device_str):
+# Textos por pasada de RoBERTuito
+NLP_BATCH_SIZE = 16
+# Ventanas de audio por pasada de Whisper en modo streaming
+ASR_BATCH_SIZE = 4
+ASR_GENERATE_KWARGS = {"language": "spanish"}
+# Parámetros de FFmpeg (forman parte de la llave de caché del audio)
+AUDIO_PARAMS = {"acodec": "pcm_s16le", "ar": "16000"}
+
+# Normalización de etiquetas de RoBERTuito al vocabulario de DeepFace
+# Regla: others es igual a neutral
+LABEL_MAP = {
+    "others": "neutral",
+    "joy": "happy",
+    "sadness": "sad",
+    "anger": "angry",
+}
+
+def get_device():
+    """'cuda' si hay GPU disponible, si no 'cpu'. Importa torch solo al llamarse."""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def setup_pipelines(device_str=None):
+    """
+    Carga Whisper y RoBERTuito una sola vez por proceso. torch y transformers se
+    importan aquí (y no al importar el módulo) para que una corrida con la
+    transcripción en caché no pague su costo de arranque.
+    """
     global ASR_PIPE, NLP_PIPE
-    dev = 0 if device_str == "cuda" and torch.cuda.is_available() else -1
-    
-    if ASR_PIPE is None:
-        log.info(f"Cargando Whisper en {device_str}...")
-        ASR_PIPE = pipeline("automatic-speech-recognition", model=ASR_MODEL, device=dev)
-    if NLP_PIPE is None:
-        log.info(f"Cargando RoBERTuito en {device_str}...")
-        NLP_PIPE = pipeline("text-classification", model=NLP_MODEL, device=dev)
-
-def extract_audio(video_path, audio_path):
-    if os.path.exists(audio_path):
+    with _PIPES_LOCK:
+        if ASR_PIPE is not None and NLP_PIPE is not None:
+            return
+        from transformers import pipeline
+        device_str = device_str or get_device()
+        dev = 0 if device_str == "cuda" else -1
+
+        if ASR_PIPE is None:
+            log.info(f"Cargando Whisper en {device_str}...")
+            ASR_PIPE = pipeline("automatic-speech-recognition", model=ASR_MODEL, device=dev)
+        if NLP_PIPE is None:
+            log.info(f"Cargando RoBERTuito en {device_str}...")
+            NLP_PIPE = pipeline("text-classification", model=NLP_MODEL, device=dev)
+
+def extract_audio(video_path, audio_path, cache=None):
+    key = None
+    if cache is not None:
+        # Caché por contenido: bytes del video + parámetros de FFmpeg
+        if not validate_input_file(video_path): return False
+        key = cache.make_key("audio", [video_path], AUDIO_PARAMS, "ffmpeg")
+        if cache.get(key, audio_path):
+            return True
+    elif os.path.exists(audio_path):
         log.info(f"Audio existente: {os.path.basename(audio_path)}. Saltando extracción.")
         return True
 
     if not validate_input_file(video_path): return False
     create_output_directory(os.path.dirname(audio_path))
     
+    import ffmpeg
+    # Se escribe a un temporal y se renombra: nunca queda un .wav a medio escribir
+    tmp_path = os.path.splitext(audio_path)[0] + ".partial.wav"
     try:
-        ffmpeg.input(video_path).output(audio_path, acodec='pcm_s16le', ar='16000').overwrite_output().run(capture_stdout=True, capture_stderr=True)
+        ffmpeg.input(video_path).output(tmp_path, **AUDIO_PARAMS).overwrite_output().run(capture_stdout=True, capture_stderr=True)
+        os.replace(tmp_path, audio_path)
         log.info("Audio extraído con FFmpeg.")
-        return True
     except ffmpeg.Error as e:
         log.error(f"FFmpeg falló: {e.stderr.decode() if e.stderr else 'Error desconocido'}")
         return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-def get_transcription_and_emotion(audio_path):
-    log.info("Procesando audio (ASR + NLP)...")
-    result = ASR_PIPE(audio_path, return_timestamps=True, generate_kwargs={"language": "spanish"})
-    
-    chunks = []
-    for chunk in result.get('chunks', []):
+    if key is not None:
+        cache.put(key, audio_path, "audio")
+    return True
+
+def classify_texts(texts, batch_size=NLP_BATCH_SIZE, cancel_event=None, timing=None):
+    """
+    Clasifica los textos con RoBERTuito en lotes con padding.
+    Los textos se agrupan por longitud para que cada lote desperdicie poco padding,
+    y los resultados se devuelven en el orden original. Retorna None si se cancela.
+    Si recibe `timing` (dict), acumula en "nlp_sec" el tiempo de inferencia.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    results = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        # El orquestador puede cancelar la rama si el análisis facial falló
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        bucket = order[start:start + batch_size]
+        tick = time.perf_counter()
+        outputs = NLP_PIPE([texts[i] for i in bucket], batch_size=len(bucket))
+        if timing is not None:
+            timing["nlp_sec"] = timing.get("nlp_sec", 0.0) + time.perf_counter() - tick
+        for i, output in zip(bucket, outputs):
+            results[i] = output
+    return results
+
+def iter_transcription_chunks(audio_path, window_sec=DEFAULT_WINDOW_SEC, overlap_sec=DEFAULT_OVERLAP_SEC,
+                              batch_size=ASR_BATCH_SIZE, cancel_event=None, regions=None, timing=None):
+    """
+    ASR en streaming: lee el WAV por ventanas solapadas, las transcribe en lotes con
+    Whisper y produce los fragmentos con timestamps absolutos a medida que salen.
+    La memoria depende del tamaño de ventana y lote, no de la duración del audio.
+    Con `regions` (salida del VAD) solo se transcriben las regiones de voz; los
+    timestamps siguen en la línea de tiempo original del audio.
+    Si recibe `timing` (dict), acumula en "asr_sec" el tiempo de Whisper.
+    """
+    emitted_until = 0.0
+
+    def transcribe_batch(windows):
+        nonlocal emitted_until
+        inputs = [{"raw": samples, "sampling_rate": sr} for _, samples, sr, _ in windows]
+        tick = time.perf_counter()
+        results = ASR_PIPE(inputs, batch_size=len(inputs), return_timestamps=True,
+                           generate_kwargs=ASR_GENERATE_KWARGS)
+        if timing is not None:
+            timing["asr_sec"] = timing.get("asr_sec", 0.0) + time.perf_counter() - tick
+            timing["windows"] = timing.get("windows", 0) + len(inputs)
+        merged_all = []
+        for (offset, samples, sr, next_offset), result in zip(windows, results):
+            window_end = offset + len(samples) / sr
+            merged, emitted_until = merge_window_chunks(result.get('chunks', []), offset, window_end,
+                                                        next_offset, emitted_until)
+            merged_all.extend(merged)
+        return merged_all
+
+    if regions is not None:
+        windows = iter_speech_windows(audio_path, regions, window_sec, overlap_sec)
+    else:
+        windows = iter_audio_windows(audio_path, window_sec, overlap_sec)
+    batch = []
+    for window in windows:
+        batch.append(window)
+        if len(batch) < batch_size:
+            continue
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        yield from transcribe_batch(batch)
+        batch = []
+    if batch and not (cancel_event is not None and cancel_event.is_set()):
+        yield from transcribe_batch(batch)
+
+def iter_transcription_and_emotion(audio_path, cancel_event=None, batch_size=NLP_BATCH_SIZE, timing=None,
+                                   **asr_kwargs):
+    """
+    Encadena el ASR en streaming con el NLP: clasifica los fragmentos en lotes de
+    `batch_size` en cuanto están disponibles y produce los segmentos en orden.
+    """
+    pending = []
+    for chunk in iter_transcription_chunks(audio_path, cancel_event=cancel_event, timing=timing, **asr_kwargs):
         text = chunk['text'].strip()
         if text:
-            raw_res = NLP_PIPE(text)[0]
-            label = raw_res['label']
-            
-            # Regla: others es igual a neutral
-            if label == "others":
-                label = "neutral"
-
-            if label == "joy":
-                label = "happy"
-
-            if label == "sadness":
-                label = "sad"
-
-            if label == "anger":
-                label = "angry"
-                
-            chunks.append({
-                'start_time': chunk['timestamp'][0], 
-                'end_time': chunk['timestamp'][1],
-                'text': text, 
-                'emotion': label, 
-                'confidence': raw_res['score']
-            })
-    return chunks
\ No newline at end of file
+            pending.append((chunk, text))
+        if len(pending) >= batch_size:
+            yield from _classify_segments(pending, batch_size, cancel_event, timing)
+            pending = []
+    yield from _classify_segments(pending, batch_size, cancel_event, timing)
+
+def get_transcription_and_emotion(audio_path, cancel_event=None, batch_size=NLP_BATCH_SIZE, streaming=False,
+                                  cache=None, regions=None, stats=None):
+    """
+    Transcribe y clasifica el audio. Con `regions` (regiones de voz del VAD) Whisper
+    solo procesa esos tramos; los silencios no pagan inferencia.
+    En modo `streaming` (y con `regions`) el audio se lee por ventanas, pero los
+    segmentos se juntan en una lista: se acota la memoria del audio, no la latencia.
+    Si recibe `stats` (dict), lo completa con asr_sec, nlp_sec, chunks y cached.
+    """
+    key = None
+    if cache is not None:
+        # Las ventanas del modo streaming cambian los fragmentos; el tamaño de lote no
+        params = {"streaming": streaming, "window_sec": DEFAULT_WINDOW_SEC, "overlap_sec": DEFAULT_OVERLAP_SEC,
+                  "generate_kwargs": ASR_GENERATE_KWARGS, "label_map": LABEL_MAP}
+        if regions is not None:
+            params["speech_regions"] = regions
+        key = cache.make_key("transcription", [audio_path], params, f"{ASR_MODEL}|{NLP_MODEL}")
+        cached = cache.get_json(key)
+        if cached is not None:
+            if stats is not None:
+                stats.update({"chunks": len(cached), "cached": True})
+            return cached
+
+    # Los modelos solo se cargan si la etapa no está en caché
+    setup_pipelines()
+    log.info("Procesando audio (ASR + NLP)...")
+    timing = {"asr_sec": 0.0, "nlp_sec": 0.0}
+    if regions is not None:
+        log.info(f"ASR solo sobre {len(regions)} regiones de voz (VAD).")
+        chunks = list(iter_transcription_and_emotion(audio_path, cancel_event, batch_size, timing, regions=regions))
+    elif streaming:
+        chunks = list(iter_transcription_and_emotion(audio_path, cancel_event, batch_size, timing))
+    else:
+        tick = time.perf_counter()
+        result = ASR_PIPE(audio_path, return_timestamps=True, generate_kwargs=ASR_GENERATE_KWARGS)
+        timing["asr_sec"] += time.perf_counter() - tick
+
+        # 1. Recolectar primero todos los fragmentos con texto
+        segments = []
+        for chunk in result.get('chunks', []):
+            text = chunk['text'].strip()
+            if text:
+                segments.append((chunk, text))
+
+        # 2. Clasificar todos los textos por lotes
+        chunks = list(_classify_segments(segments, batch_size, cancel_event, timing))
+
+    if cancel_event is not None and cancel_event.is_set():
+        log.warning("Transcripción cancelada.")
+        return []
+    log.info(f"NLP: {len(chunks)} fragmentos clasificados en lotes de {batch_size}.")
+    if stats is not None:
+        stats.update(timing, chunks=len(chunks), cached=False)
+    if key is not None:
+        cache.put_json(key, chunks, "transcription")
+    return chunks
+
+def _classify_segments(segments, batch_size, cancel_event, timing=None):
+    """Normaliza etiquetas y construye la salida en el orden de Whisper."""
+    predictions = classify_texts([text for _, text in segments], batch_size, cancel_event, timing)
+    if predictions is None:
+        return
+    for (chunk, text), raw_res in zip(segments, predictions):
+        yield {
+            'start_time': chunk['timestamp'][0], 
+            'end_time': chunk['timestamp'][1],
+            'text': text, 
+            'emotion': LABEL_MAP.get(raw_res['label'], raw_res['label']),
+            'confidence': raw_res['score']
+        }
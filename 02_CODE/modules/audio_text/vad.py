@@ -0,0 +1,116 @@
+import wave
+import numpy as np
+from utils.logger import get_logger
+
+log = get_logger("Modulo_VAD")
+
+# Detección de voz por energía: tramas de 30 ms comparadas contra el piso de ruido
+FRAME_SEC = 0.03
+# Percentil de energía que se toma como piso de ruido de la grabación
+NOISE_PERCENTILE = 10
+# Una trama es voz si supera el piso de ruido por este margen (dB)
+ENERGY_MARGIN_DB = 10.0
+# Energía mínima absoluta (dB FS) para considerar voz en grabaciones muy limpias
+MIN_SPEECH_DB = -50.0
+# Silencios más cortos que esto no separan regiones (pausas entre palabras)
+MIN_SILENCE_SEC = 0.6
+# Regiones más cortas que esto se descartan (clics, golpes)
+MIN_SPEECH_SEC = 0.25
+# Margen alrededor de cada región para no cortar inicios y finales de palabra
+PAD_SEC = 0.2
+# Tramas leídas por bloque (memoria acotada en audios largos)
+_BLOCK_FRAMES = 2000
+
+
+def frame_energies_db(audio_path, frame_sec=FRAME_SEC):
+    """
+    Energía RMS (dB FS) de cada trama de `frame_sec` segundos de un WAV PCM 16-bit.
+    Lee el archivo por bloques; retorna (energías, duración_sec).
+    """
+    with wave.open(audio_path, "rb") as wav:
+        sampling_rate = wav.getframerate()
+        channels = wav.getnchannels()
+        if wav.getsampwidth() != 2:
+            raise ValueError("Se esperaba audio PCM de 16 bits (pcm_s16le).")
+        duration = wav.getnframes() / sampling_rate
+        frame_len = max(1, int(frame_sec * sampling_rate))
+
+        energies = []
+        while True:
+            raw = wav.readframes(frame_len * _BLOCK_FRAMES)
+            if not raw:
+                break
+            samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+            n_frames = -(-len(samples) // frame_len)
+            padded = np.zeros(n_frames * frame_len, dtype=np.float32)
+            padded[:len(samples)] = samples
+            rms = np.sqrt(np.mean(padded.reshape(n_frames, frame_len) ** 2, axis=1))
+            energies.append(20 * np.log10(rms + 1e-10))
+
+    if not energies:
+        return np.zeros(0, dtype=np.float32), duration
+    return np.concatenate(energies), duration
+
+
+def regions_from_mask(speech_mask, frame_sec=FRAME_SEC, duration_sec=None, min_silence_sec=MIN_SILENCE_SEC,
+                      min_speech_sec=MIN_SPEECH_SEC, pad_sec=PAD_SEC):
+    """
+    Convierte una máscara de tramas con voz en regiones [inicio, fin] (segundos):
+    une las regiones separadas por silencios cortos, descarta las muy breves y
+    agrega un margen a cada lado.
+    """
+    mask = np.asarray(speech_mask, dtype=bool)
+    if duration_sec is None:
+        duration_sec = len(mask) * frame_sec
+    if not mask.any():
+        return []
+
+    # Flancos de subida/bajada de la máscara -> tramas [inicio, fin)
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * frame_sec
+    ends = np.flatnonzero(edges == -1) * frame_sec
+
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_silence_sec:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    padded = []
+    for start, end in regions:
+        if end - start < min_speech_sec:
+            continue
+        start, end = max(0.0, start - pad_sec), min(duration_sec, end + pad_sec)
+        if padded and start <= padded[-1][1]:
+            padded[-1][1] = end
+        else:
+            padded.append([start, end])
+    return [(round(float(start), 2), round(float(end), 2)) for start, end in padded]
+
+
+def detect_speech_regions(audio_path, frame_sec=FRAME_SEC, margin_db=ENERGY_MARGIN_DB, **region_kwargs):
+    """
+    VAD por energía sobre el WAV de `audio_clean`. El umbral se adapta a cada
+    grabación: piso de ruido (percentil bajo de energía) + `margin_db`.
+    Retorna la lista de regiones de voz [(inicio_sec, fin_sec), ...].
+    """
+    energies, duration = frame_energies_db(audio_path, frame_sec)
+    if len(energies) == 0:
+        return []
+    noise_floor = float(np.percentile(energies, NOISE_PERCENTILE))
+    threshold = max(noise_floor + margin_db, MIN_SPEECH_DB)
+    regions = regions_from_mask(energies > threshold, frame_sec, duration, **region_kwargs)
+
+    speech = speech_duration(regions)
+    ratio = speech / duration if duration > 0 else 0.0
+    log.info(f"VAD: {len(regions)} regiones de voz, {speech:.1f}s de {duration:.1f}s "
+             f"({ratio:.0%}); umbral {threshold:.1f} dB (piso {noise_floor:.1f} dB).")
+    return regions
+
+
+def speech_duration(regions):
+    """Segundos totales cubiertos por las regiones."""
+    return sum(end - start for start, end in regions)
@@ -0,0 +1,265 @@
+import base64
+import json
+import math
+import os
+import sys
+import zlib
+import numpy as np
+
+# Permite ejecutar el generador directamente (python dashboard.py --report ...)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.logger import get_logger
+from utils.emotion_codes import EMOTIONS, N_EMOTIONS, encode
+from utils.face_series import find_face_series, load_face_series
+from utils.report_writer import load_report
+
+log = get_logger("Dashboard_HTML")
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard_template.html")
+
+# Niveles de resumen (nombre, segundos por bin, segundos por tile; 0 = un solo tile).
+# El más grueso se decodifica al abrir; los demás, solo cuando el zoom los necesita.
+LEVELS = (("1min", 60.0, 0.0), ("10s", 10.0, 3600.0), ("1s", 1.0, 600.0))
+# Nivel más fino: cada frame de la serie facial y cada evento del reporte
+FRAME_TILE_SEC = 120.0
+DEFAULT_FRAME_INTERVAL = 0.5
+
+EMOTION_COLORS = {
+    "angry": "#d62728", "disgust": "#8c564b", "fear": "#9467bd", "happy": "#f2c14e",
+    "sad": "#1f77b4", "surprise": "#ff7f0e", "neutral": "#b0b0b0",
+}
+
+
+def step_integrals(starts, ends, values, edges):
+    """
+    Integral de una función escalonada (valor `values[i]` sobre [starts[i], ends[i]])
+    entre bordes consecutivos de `edges`. Los segmentos van ordenados y sin solaparse,
+    como los de la transcripción. O(E + B log E) con la integral acumulada, sin
+    comparar cada segmento con cada bin. Retorna (len(edges) - 1, K).
+    """
+    if len(starts) == 0:
+        return np.zeros((len(edges) - 1, values.shape[1]))
+    lengths = np.maximum(ends - starts, 0.0)
+    full = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values * lengths[:, None], axis=0)])
+    # Último segmento que empieza antes de cada borde: acumulado previo + su parte
+    k = np.searchsorted(starts, edges, side="right") - 1
+    kk = np.maximum(k, 0)
+    cumulative = full[kk] + values[kk] * np.clip(edges - starts[kk], 0.0, lengths[kk])[:, None]
+    cumulative[k < 0] = 0.0
+    return np.diff(cumulative, axis=0)
+
+
+def _event_columns(events):
+    """Eventos del reporte como arreglos ordenados por inicio."""
+    order = sorted(range(len(events)), key=lambda i: events[i]["start_time_sec"])
+    events = [events[i] for i in order]
+
+    def code(label):
+        try:
+            return encode(label)
+        except ValueError:
+            return -1
+
+    return events, {
+        "start": np.array([e["start_time_sec"] for e in events], dtype=float),
+        "end": np.array([e["end_time_sec"] for e in events], dtype=float),
+        "score": np.array([e.get("congruence_score", 0.0) for e in events], dtype=float),
+        "text": np.array([code(e.get("emotion_text_nlp")) for e in events], dtype=np.int64),
+        "face": np.array([code(e.get("emotion_facial_mode")) for e in events], dtype=np.int64),
+        "change": np.array([bool(e.get("is_change_point")) for e in events], dtype=bool),
+    }
+
+
+def _one_hot(codes):
+    out = np.zeros((len(codes), N_EMOTIONS))
+    valid = codes >= 0
+    out[np.flatnonzero(valid), codes[valid]] = 1.0
+    return out
+
+
+def summarize_level(ev, faces, duration, bin_sec):
+    """
+    Resumen de un nivel: por bin, histograma de emociones faciales (conteo de
+    frames o, sin serie facial, segundos por emoción del modo facial), segundos por
+    emoción del texto, congruencia media ponderada por tiempo y cambios detectados.
+    """
+    n_bins = max(1, math.ceil(duration / bin_sec))
+    edges = np.arange(n_bins + 1) * bin_sec
+    values = np.hstack([np.ones((len(ev["start"]), 1)), ev["score"][:, None], _one_hot(ev["text"]),
+                        _one_hot(ev["face"])])
+    integrals = step_integrals(ev["start"], ev["end"], values, edges)
+    covered = integrals[:, 0]
+    score = np.where(covered > 0, integrals[:, 1] / np.maximum(covered, 1e-12), np.nan)
+
+    if faces is not None and len(faces["timestamp_sec"]):
+        bins = np.minimum((np.asarray(faces["timestamp_sec"]) / bin_sec).astype(np.int64), n_bins - 1)
+        face = np.bincount(bins * N_EMOTIONS + np.asarray(faces["emotion"], dtype=np.int64),
+                           minlength=n_bins * N_EMOTIONS).reshape(n_bins, N_EMOTIONS)
+    else:
+        face = np.round(integrals[:, 2 + N_EMOTIONS:], 2)
+
+    change_bins = np.minimum((ev["start"][ev["change"]] / bin_sec).astype(np.int64), n_bins - 1)
+    return {
+        "face": face,
+        "text": np.round(integrals[:, 2:2 + N_EMOTIONS], 2),
+        "score": score,
+        "changes": np.bincount(change_bins, minlength=n_bins),
+    }
+
+
+def _bin_tiles(summary, bin_sec, tile_sec):
+    n_bins = len(summary["score"])
+    per_tile = n_bins if not tile_sec else max(1, int(round(tile_sec / bin_sec)))
+    for first in range(0, n_bins, per_tile):
+        part = slice(first, first + per_tile)
+        score = summary["score"][part]
+        yield {
+            "t0": first * bin_sec,
+            "n": len(score),
+            "face": _compact(summary["face"][part].ravel()),
+            "text": _compact(summary["text"][part].ravel()),
+            "score": [None if np.isnan(s) else round(float(s), 3) for s in score],
+            "changes": summary["changes"][part].tolist(),
+        }
+
+
+def _frame_tiles(events, ev, faces, duration):
+    timestamps = np.asarray(faces["timestamp_sec"]) if faces is not None else np.zeros(0)
+    for k in range(max(1, math.ceil(duration / FRAME_TILE_SEC))):
+        t0, t1 = k * FRAME_TILE_SEC, (k + 1) * FRAME_TILE_SEC
+        lo, hi = np.searchsorted(timestamps, [t0, t1], side="left")
+        # Eventos que tocan el tile (los que cruzan el borde van en ambos)
+        idx = np.flatnonzero((ev["start"] < t1) & (ev["end"] > t0))
+        tile = {"t0": t0, "t": [], "e": [], "c": []}
+        if hi > lo:
+            tile["t"] = np.round(timestamps[lo:hi], 3).tolist()
+            tile["e"] = np.asarray(faces["emotion"][lo:hi]).tolist()
+            # Frames sin confianza (NaN en el CSV) van como 0: JSON no admite NaN
+            tile["c"] = np.round(np.nan_to_num(np.asarray(faces["confidence"][lo:hi], dtype=float)), 1).tolist()
+        tile["ev"] = {
+            "s": ev["start"][idx].tolist(), "e": ev["end"][idx].tolist(),
+            "score": np.round(ev["score"][idx], 3).tolist(), "te": ev["text"][idx].tolist(),
+            "fe": ev["face"][idx].tolist(), "cp": ev["change"][idx].astype(int).tolist(),
+            "txt": [events[i].get("transcribed_text", "") for i in idx],
+        }
+        yield tile
+
+
+def _compact(values):
+    """Enteros como int y flotantes sin ceros de más (JSON más chico)."""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        return values.tolist()
+    return [int(v) if v == int(v) else float(v) for v in values.tolist()]
+
+
+def build_dashboard_data(report, faces=None):
+    """
+    Metadatos y tiles por nivel del dashboard. Retorna (meta, {id_tile: payload}).
+    `faces` son las columnas de la serie facial (utils.face_series) o None.
+    """
+    events, ev = _event_columns(report.get("events", []))
+    timestamps = np.asarray(faces["timestamp_sec"]) if faces is not None else np.zeros(0)
+    duration = max(float(ev["end"].max()) if len(ev["end"]) else 0.0,
+                   float(timestamps[-1]) if len(timestamps) else 0.0, 1.0)
+    frame_interval = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else DEFAULT_FRAME_INTERVAL
+
+    levels, tiles = [], {}
+    for name, bin_sec, tile_sec in LEVELS:
+        level_tiles = list(_bin_tiles(summarize_level(ev, faces, duration, bin_sec), bin_sec, tile_sec))
+        levels.append({"name": name, "kind": "bins", "bin_sec": bin_sec,
+                       "tile_sec": tile_sec or level_tiles[0]["n"] * bin_sec, "n_tiles": len(level_tiles)})
+        tiles.update({f"{name}-{k}": tile for k, tile in enumerate(level_tiles)})
+    frame_tiles = list(_frame_tiles(events, ev, faces, duration))
+    levels.append({"name": "frames", "kind": "frames", "bin_sec": max(frame_interval, 1e-3),
+                   "tile_sec": FRAME_TILE_SEC, "n_tiles": len(frame_tiles)})
+    tiles.update({f"frames-{k}": tile for k, tile in enumerate(frame_tiles)})
+
+    metrics = report.get("global_metrics", {})
+    meta = {
+        "title": report.get("interview_id", "Entrevista"),
+        "video_path": report.get("video_path", ""),
+        "duration": duration,
+        "overall_score": metrics.get("overall_congruence_score"),
+        "n_events": len(events),
+        "n_frames": int(len(timestamps)),
+        "frame_interval": frame_interval,
+        "emotions": list(EMOTIONS),
+        "colors": [EMOTION_COLORS[emotion] for emotion in EMOTIONS],
+        "levels": levels,
+    }
+    return meta, tiles
+
+
+def render_html(meta, tiles, compress=True):
+    """
+    HTML autocontenido: los metadatos van como JSON y cada tile en su propio
+    <script> sin ejecutar (zlib + base64 con `compress`). El navegador solo
+    decodifica los tiles del nivel y del tramo visibles.
+    """
+    meta = dict(meta, encoding="zlib" if compress else "json")
+    blocks = []
+    for tile_id, tile in tiles.items():
+        payload = json.dumps(tile, ensure_ascii=False, separators=(",", ":"))
+        if compress:
+            payload = base64.b64encode(zlib.compress(payload.encode("utf-8"), 9)).decode("ascii")
+        else:
+            payload = payload.replace("</", "<\\/")
+        blocks.append(f'<script type="application/octet-stream" id="tile-{tile_id}">{payload}</script>')
+
+    with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        template = f.read()
+    data = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+    title = meta["title"].replace("&", "&amp;").replace("<", "&lt;")
+    return (template.replace("__TITLE__", title)
+            .replace("__DASHBOARD_DATA__", data)
+            .replace("__DASHBOARD_TILES__", "\n".join(blocks)))
+
+
+def generate_html_dashboard(report, output_path, faces_path=None, compress=True):
+    """
+    Dashboard HTML interactivo de una entrevista (zoom hasta el frame) a partir del
+    reporte final (dict) y, si existe, de la serie facial (`.csv` o `.npy`).
+    """
+    faces = None
+    series_file = find_face_series(faces_path) if faces_path else None
+    if series_file:
+        faces = load_face_series(series_file)
+    else:
+        log.warning("Sin serie facial: el histograma del rostro usa el modo facial de cada evento.")
+
+    meta, tiles = build_dashboard_data(report, faces)
+    html = render_html(meta, tiles, compress)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = output_path + ".partial"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, output_path)
+    log.info(f"Dashboard HTML guardado en: {output_path} ({len(tiles)} tiles, {len(html) / 1024:.0f} KB)")
+    return output_path
+
+
+def default_faces_path(report_path, report):
+    """Serie facial del video del reporte en 01_DATA/series_temporales (csv o npy)."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    name = os.path.basename(report.get("video_path", "").replace("\\", "/"))
+    clean_name = os.path.splitext(name)[0] or os.path.basename(report_path).split("_FINAL")[0]
+    return os.path.join(root, "01_DATA", "series_temporales", f"{clean_name}_faces.csv")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Dashboard HTML interactivo de una entrevista.")
+    parser.add_argument("--report", required=True, help="Reporte _FINAL.json / _FINAL.ndjson.")
+    parser.add_argument("--faces", help="Serie facial (.csv o .npy). Por defecto la de 01_DATA/series_temporales.")
+    parser.add_argument("--out", help="Ruta del HTML (por defecto junto a las visualizaciones).")
+    parser.add_argument("--no-compress", action="store_true", help="Tiles como JSON plano (sin zlib).")
+    args = parser.parse_args()
+
+    report = load_report(args.report)
+    out = args.out or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))), "05_OUTPUTS", "visualizations",
+        os.path.basename(args.report).split("_FINAL")[0] + "_dashboard.html")
+    generate_html_dashboard(report, out, args.faces or default_faces_path(args.report, report),
+                            compress=not args.no_compress)
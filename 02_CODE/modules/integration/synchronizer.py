@@ -1,7 +1,12 @@
-import pandas as pd
-from collections import Counter
+import bisect
+import heapq
+import itertools
+import numpy as np
 from utils.logger import get_logger
-import os
+from utils.face_series import find_face_series, load_face_series, PROBABILITY_COLUMN
+from utils.emotion_codes import (
+    EMOTIONS, N_EMOTIONS, NEUTRAL, NO_OBSERVATION, encode, encode_series, decode, decode_series
+)
 
 log = get_logger("Modulo_Sincronizacion")
 
@@ -28,6 +33,11 @@ def calculate_congruence_score(emo_text, emo_face):
         return 0.3
     return 0.0
 
+# Matriz 7x7 precalculada: CONGRUENCE_MATRIX[texto, rostro] -> score
+CONGRUENCE_MATRIX = np.array(
+    [[calculate_congruence_score(t, f) for f in EMOTIONS] for t in EMOTIONS], dtype=np.float64
+)
+
 def update_hidden_state(observation, hidden_state, weight_current=0.7):
     """
     Simulación de una Celda GRU (Update Gate).
@@ -44,100 +54,286 @@ def update_hidden_state(observation, hidden_state, weight_current=0.7):
     # (En una red real esto es una función de activación, aquí es lógica probabilística)
     return observation
 
-def calculate_temporal_face_weighted(history, prev_h_face):
+def update_hidden_code(observation, hidden_state):
+    """Versión codificada de update_hidden_state (NO_OBSERVATION conserva la memoria)."""
+    return hidden_state if observation == NO_OBSERVATION else observation
+
+def calculate_temporal_face_weighted(history, prev_h_face, probabilities=None):
     """
     Procesa la serie temporal facial dando más peso a los frames finales 
     y a la inercia del estado anterior (Simulación de Memoria Recurrente).
+    Con `probabilities` (matriz n x 7, orden EMOTIONS) vota con probabilidades suaves.
     """
     if not history:
         return prev_h_face
-    
-    weights = {}
-    for i, emo in enumerate(history):
-        # El peso aumenta con el tiempo (los frames finales del segmento definen el futuro)
-        time_weight = 1 + (i / len(history))
-        # Bono de inercia: si el frame coincide con lo que veníamos sintiendo
-        memory_bonus = 1.3 if emo == prev_h_face else 1.0
-        
-        total_w = time_weight * memory_bonus
-        weights[emo] = weights.get(emo, 0) + total_w
-        
-    return max(weights, key=weights.get)
-
-def synchronize_data(transcription_data, csv_path):
+    return decode(weighted_face_code(encode_series(history), encode(prev_h_face), probabilities))
+
+def weighted_face_code(history_codes, prev_code, history_probs=None):
+    """
+    Votación ponderada sobre un arreglo int8 de códigos faciales:
+    peso temporal 1 + i/n (los frames finales definen el futuro) y bono de inercia
+    x1.3 si el frame coincide con el estado anterior, acumulado con np.bincount.
+
+    Con `history_probs` (n x 7) cada frame reparte su peso según su vector de
+    probabilidades en vez de votar solo por la emoción dominante; el bono de inercia
+    se aplica a la probabilidad del estado anterior. Con vectores one-hot el
+    resultado es idéntico a la votación dura.
+    """
+    n = len(history_codes)
+    if n == 0:
+        return prev_code
+    time_weight = 1 + np.arange(n) / n
+    if history_probs is not None:
+        weights = time_weight @ np.asarray(history_probs, dtype=np.float64)
+        if 0 <= prev_code < N_EMOTIONS:
+            weights[prev_code] *= 1.3
+    else:
+        memory_bonus = np.where(history_codes == prev_code, 1.3, 1.0)
+        weights = np.bincount(history_codes, weights=time_weight * memory_bonus, minlength=N_EMOTIONS)
+
+    winners = np.flatnonzero(weights == weights.max())
+    if len(winners) == 1:
+        return int(winners[0])
+    # Empate: gana la emoción que aparece primero en el historial
+    return int(min(winners, key=lambda code: np.argmax(history_codes == code)))
+
+def face_history_bounds(timestamps, starts, ends):
+    """
+    Join de intervalos sobre la serie facial ordenada: para cada segmento retorna
+    los índices [lo, hi) de los frames con start <= timestamp_sec <= end.
+    Usa búsqueda binaria (np.searchsorted), O((S + F) log F), en lugar de una
+    máscara booleana completa por segmento.
+    """
+    lo = np.searchsorted(timestamps, starts, side='left')
+    hi = np.searchsorted(timestamps, ends, side='right')
+    return lo, np.maximum(hi, lo)
+
+def fusion_step(history_codes, text_code, h_text, h_face, history_probs=None):
+    """
+    Un paso de la memoria recurrente para un segmento.
+    Retorna (nuevo_h_texto, nuevo_h_rostro, score, es_cambio).
+    """
+    # Rostro: procesado con pesos temporales; Texto: observación directa del NLP
+    obs_face = weighted_face_code(history_codes, h_face, history_probs)
+    new_h_text = update_hidden_code(text_code, h_text)
+    new_h_face = update_hidden_code(obs_face, h_face)
+    score = float(CONGRUENCE_MATRIX[new_h_text, new_h_face])
+    return new_h_text, new_h_face, score, new_h_text != h_text or new_h_face != h_face
+
+def fuse_series(face_codes, lo, hi, text_codes, h_text=NEUTRAL, h_face=NEUTRAL, face_probs=None):
+    """
+    Motor de fusión recurrente sobre arreglos (sin strings), pensado para re-puntuar
+    en lote entrevistas archivadas. Con `face_probs` (n x 7) la votación facial usa
+    probabilidades suaves.
+    Retorna (estados_texto int8, estados_rostro int8, scores float64, cambios bool).
+    """
+    n = len(text_codes)
+    text_states = np.empty(n, dtype=np.int8)
+    face_states = np.empty(n, dtype=np.int8)
+    scores = np.empty(n, dtype=np.float64)
+    changes = np.empty(n, dtype=bool)
+
+    for i in range(n):
+        probs = face_probs[lo[i]:hi[i]] if face_probs is not None else None
+        h_text, h_face, scores[i], changes[i] = fusion_step(face_codes[lo[i]:hi[i]], text_codes[i], h_text, h_face,
+                                                            probs)
+        text_states[i] = h_text
+        face_states[i] = h_face
+    return text_states, face_states, scores, changes
+
+def build_event(seg, history_codes, text_state, face_state, prev_text, prev_face, score):
+    """Construye el evento del contrato JSON (PBI 4.3); aquí vuelven los strings."""
+    change_reasons = []
+    if text_state != prev_text: change_reasons.append("Texto")
+    if face_state != prev_face: change_reasons.append("Rostro")
+    is_change = len(change_reasons) > 0
+
+    # Insight Dinámico según la memoria
+    if is_change:
+        insight = f"Transición Abrupta en: {', '.join(change_reasons)}"
+    else:
+        insight = "Estado Emocional Estable (Persistencia Temporal)"
+
+    return {
+        "start_time_sec": round(seg['start_time'], 2),
+        "end_time_sec": round(seg['end_time'], 2),
+        "transcribed_text": seg['text'],
+        "emotion_facial_mode": decode(face_state),   # Estado recurrente final
+        "emotion_text_nlp": decode(text_state),       # Estado recurrente final
+        "emotion_facial_history": decode_series(history_codes),
+        "congruence_score": score,
+        "temporal_insight": insight,
+        "is_change_point": is_change
+    }
+
+class StreamingSynchronizer:
+    """
+    Sincronizador incremental para análisis casi en tiempo real.
+
+    Guarda los estados ocultos (h_text, h_face) entre llamadas y acepta observaciones
+    faciales y segmentos de transcripción en cualquier intercalado. Un segmento se
+    emite en cuanto la marca de agua facial (timestamp hasta el cual la serie está
+    completa) alcanza su end_time. Se asume que cada fuente llega en orden temporal.
+    """
+
+    # Frames descartables acumulados antes de compactar el buffer
+    PRUNE_THRESHOLD = 1024
+
+    def __init__(self, h_text=NEUTRAL, h_face=NEUTRAL):
+        self.h_text = h_text
+        self.h_face = h_face
+        self.watermark = float("-inf")
+        self._face_ts = []
+        self._face_codes = []
+        self._pending = []              # heap (start_time, orden de llegada, segmento)
+        self._arrival = itertools.count()
+        self._last_start = float("-inf")
+
+    def add_face(self, timestamp, emotion):
+        """Agrega un frame facial; avanza la marca de agua hasta su timestamp."""
+        timestamp = float(timestamp)
+        if self._face_ts and timestamp < self._face_ts[-1]:
+            # Llegada tardía: se inserta en su posición para mantener el orden
+            pos = bisect.bisect_right(self._face_ts, timestamp)
+            self._face_ts.insert(pos, timestamp)
+            self._face_codes.insert(pos, encode_series([emotion])[0])
+        else:
+            self._face_ts.append(timestamp)
+            self._face_codes.append(encode_series([emotion])[0])
+        self.watermark = max(self.watermark, timestamp)
+
+    def add_faces(self, timestamps, emotions):
+        """Agrega varios frames faciales (p. ej. un lote del extractor)."""
+        for timestamp, emotion in zip(timestamps, emotions):
+            self.add_face(timestamp, emotion)
+
+    def advance_watermark(self, timestamp):
+        """Declara la serie facial completa hasta `timestamp` (p. ej. tramos sin rostro)."""
+        self.watermark = max(self.watermark, float(timestamp))
+
+    def add_segment(self, seg):
+        """Agrega un segmento de transcripción (mismo formato que transcriber)."""
+        heapq.heappush(self._pending, (seg['start_time'], next(self._arrival), seg))
+
+    def poll(self):
+        """Produce los eventos cuyos segmentos ya están cubiertos por la serie facial."""
+        while self._pending and self._pending[0][2]['end_time'] <= self.watermark:
+            _, _, seg = heapq.heappop(self._pending)
+            yield self._emit(seg)
+        self._prune()
+
+    def close(self):
+        """Fin de ambas fuentes: emite todos los segmentos pendientes."""
+        self.watermark = float("inf")
+        yield from self.poll()
+
+    def _emit(self, seg):
+        if seg['start_time'] < self._last_start:
+            log.warning(f"Segmento fuera de orden ({seg['start_time']}s); se procesa igualmente.")
+        self._last_start = max(self._last_start, seg['start_time'])
+
+        lo = bisect.bisect_left(self._face_ts, seg['start_time'])
+        hi = bisect.bisect_right(self._face_ts, seg['end_time'])
+        history = np.array(self._face_codes[lo:hi], dtype=np.int8)
+
+        prev_text, prev_face = self.h_text, self.h_face
+        self.h_text, self.h_face, score, _ = fusion_step(history, encode(seg['emotion']), prev_text, prev_face)
+        return build_event(seg, history, self.h_text, self.h_face, prev_text, prev_face, score)
+
+    def _prune(self):
+        """Descarta frames anteriores a cualquier segmento que aún pueda llegar."""
+        floor = self._last_start
+        if self._pending:
+            floor = min(floor, self._pending[0][0])
+        cut = bisect.bisect_left(self._face_ts, floor)
+        if cut >= self.PRUNE_THRESHOLD:
+            del self._face_ts[:cut]
+            del self._face_codes[:cut]
+
+def synchronize_data(transcription_data, csv_path, soft=False):
     """
     Sincronización Multimodal con Arquitectura de Memoria Recurrente (PBI 4.1, 4.2, 4.3).
+    `csv_path` puede ser la serie facial `.csv` o `.npy` (columnar, memory-mapped);
+    se lee solo ese archivo, no la misma serie en el otro formato. Con `soft` la votación
+    facial usa el vector de probabilidades guardado (si la serie lo trae).
+    """
+    return list(iter_synchronize_data(transcription_data, csv_path, soft))
+
+def iter_synchronize_data(transcription_data, csv_path, soft=False):
+    """
+    Igual que synchronize_data, pero produce los eventos uno a uno: la historia
+    facial de cada evento se arma recién cuando se pide, así que quien los escribe
+    en cuanto salen no retiene las historias de toda la entrevista.
     """
     log.info("-> Iniciando Fusión Multimodal Recurrente (Simulación GRU/LSTM)...")
-    
-    if not os.path.exists(csv_path):
-        log.error(f"No existe el CSV de rostros: {csv_path}")
-        return []
+
+    series_file = find_face_series(csv_path)
+    if series_file is None:
+        log.error(f"No existe la serie de rostros: {csv_path}")
+        return
     try:
-        df_faces = pd.read_csv(csv_path)
-        if df_faces.empty:
+        # Columnas ya ordenadas por tiempo y con la emoción codificada (int8)
+        faces = load_face_series(series_file)
+        if len(faces["timestamp_sec"]) == 0:
             log.warning("Serie temporal de rostros vacía. ¿Rostros no detectados?")
-            return []
+            return
     except Exception as e:
-        log.error(f"Error leyendo el CSV: {e}")
-        return []
-
-    integrated_events = []
-
-    # --- ESTADOS OCULTOS (Hidden States - La Memoria de la Red) ---
-    h_text = "neutral"
-    h_face = "neutral"
-
-    for seg in transcription_data:
-        # 1. FILTRADO DE SERIE TEMPORAL VISUAL
-        mask = (df_faces['timestamp_sec'] >= seg['start_time']) & (df_faces['timestamp_sec'] <= seg['end_time'])
-        face_history = df_faces.loc[mask, 'emotion'].tolist()
-        
-        # 2. CÁLCULO DE OBSERVACIONES ACTUALES
-        # Rostro: Procesado con pesos temporales (Serie de tiempo)
-        obs_face = calculate_temporal_face_weighted(face_history, h_face)
-        # Texto: Observación directa del NLP
-        obs_text = seg['emotion']
-
-        # 3. ACTUALIZACIÓN DE ESTADOS (GRU Update Gate Logic)
-        # El estado actual es una función de la observación y el estado anterior
-        new_h_text = update_hidden_state(obs_text, h_text)
-        new_h_face = update_hidden_state(obs_face, h_face)
-
-        # 4. DETECCIÓN DE CAMBIOS (PBI 4.1)
-        change_reasons = []
-        if new_h_text != h_text: change_reasons.append("Texto")
-        if new_h_face != h_face: change_reasons.append("Rostro")
-        
-        is_change = len(change_reasons) > 0
-        
-        # Insight Dinámico según la memoria
-        if is_change:
-            insight = f"Transición Abrupta en: {', '.join(change_reasons)}"
-        else:
-            insight = "Estado Emocional Estable (Persistencia Temporal)"
-
-        # 5. MÉTRICA DE CONGRUENCIA (PBI 4.2)
-        score = calculate_congruence_score(new_h_text, new_h_face)
-
-        # 6. CONSTRUCCIÓN DEL EVENTO (Estructura Contrato PBI 4.3)
-        event = {
-            "start_time_sec": round(seg['start_time'], 2),
-            "end_time_sec": round(seg['end_time'], 2),
-            "transcribed_text": seg['text'],
-            "emotion_facial_mode": new_h_face,   # Estado recurrente final
-            "emotion_text_nlp": new_h_text,       # Estado recurrente final
-            "emotion_facial_history": face_history,
-            "congruence_score": score,
-            "temporal_insight": insight,
-            "is_change_point": is_change
-        }
-        
-        integrated_events.append(event)
-        
-        # 7. PASO DE MEMORIA: Los estados actuales serán el pasado del siguiente segmento
-        h_text = new_h_text
-        h_face = new_h_face
-
-    log.info(f"Sincronización Recurrente finalizada: {len(integrated_events)} eventos.")
-    return integrated_events
\ No newline at end of file
+        log.error(f"Error leyendo la serie de rostros: {e}")
+        return
+
+    face_probs = None
+    if soft:
+        face_probs = faces.get(PROBABILITY_COLUMN)
+        if face_probs is None:
+            log.warning("La serie facial no trae probabilidades (prob_<emoción>); se usa la votación dura.")
+
+    yield from iter_synchronize_codes(transcription_data, faces["timestamp_sec"], faces["emotion"], face_probs)
+
+def synchronize_frames(transcription_data, df_faces):
+    """Fusión recurrente sobre una serie facial ya cargada en un DataFrame."""
+    df_faces = df_faces.dropna(subset=['timestamp_sec'])
+    return synchronize_series(transcription_data, df_faces['timestamp_sec'].to_numpy(),
+                              df_faces['emotion'].tolist())
+
+def synchronize_series(transcription_data, timestamps, emotions):
+    """Fusión recurrente sobre la serie facial como arreglo de timestamps + etiquetas."""
+    timestamps = np.asarray(timestamps, dtype=float)
+    face_codes = encode_series(emotions)
+    # La búsqueda binaria requiere la serie ordenada por tiempo (orden estable)
+    if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, face_codes = timestamps[order], face_codes[order]
+    return synchronize_codes(transcription_data, timestamps, face_codes)
+
+def synchronize_codes(transcription_data, timestamps, face_codes, face_probs=None):
+    """
+    Fusión recurrente sobre la serie facial ya codificada: `timestamps` ordenados y
+    `face_codes` int8 (opcionalmente `face_probs` n x 7 para la votación suave).
+    Acepta vistas memory-mapped: solo se leen los tramos que cubren los segmentos
+    de la transcripción.
+    """
+    return list(iter_synchronize_codes(transcription_data, timestamps, face_codes, face_probs))
+
+def iter_synchronize_codes(transcription_data, timestamps, face_codes, face_probs=None):
+    """
+    Versión generadora de synchronize_codes. Los estados y scores se calculan sobre
+    arreglos para toda la entrevista; cada evento (con su historia en strings) se
+    construye solo al pedirlo.
+    """
+    # 1. FILTRADO DE SERIE TEMPORAL VISUAL (join de intervalos)
+    starts = np.array([seg['start_time'] for seg in transcription_data], dtype=float)
+    ends = np.array([seg['end_time'] for seg in transcription_data], dtype=float)
+    lo, hi = face_history_bounds(timestamps, starts, ends)
+
+    # 2-5. ESTADOS OCULTOS, CAMBIOS (PBI 4.1) Y CONGRUENCIA (PBI 4.2) sobre arreglos
+    text_codes = np.array([encode(seg['emotion']) for seg in transcription_data], dtype=np.int8)
+    text_states, face_states, scores, _ = fuse_series(face_codes, lo, hi, text_codes, face_probs=face_probs)
+
+    # 6. CONSTRUCCIÓN DE EVENTOS (Estructura Contrato PBI 4.3), uno a uno
+    prev_text, prev_face = NEUTRAL, NEUTRAL
+    for i, seg in enumerate(transcription_data):
+        yield build_event(seg, face_codes[lo[i]:hi[i]], text_states[i], face_states[i],
+                          prev_text, prev_face, float(scores[i]))
+        prev_text, prev_face = text_states[i], face_states[i]
+
+    log.info(f"Sincronización Recurrente finalizada: {len(transcription_data)} eventos.")
@@ -1,66 +1,222 @@
-import pandas as pd
-import json
+import csv
+import glob
 import os
+import sys
+import numpy as np
+
+# Permite ejecutar la validación del corpus directamente (python validator.py ...)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
 from utils.logger import get_logger
+from utils.report_writer import load_report
 
 log = get_logger("Modulo_Validacion")
 
-def run_manual_validation(json_output_path, manual_csv_path):
+# Margen de error aceptado entre el score de la IA y el manual
+SCORE_TOLERANCE = 0.1
+# Reportes considerados en la validación del corpus completo
+REPORT_PATTERNS = ("*_FINAL.json", "*_FINAL.ndjson")
+
+
+def normalize_video_id(name):
+    """'01_DATA/raw/Video_04.mp4' -> 'video_04' (mismo id en etiquetas y reportes)."""
+    return os.path.splitext(os.path.basename(str(name).strip()))[0].lower()
+
+
+def video_id_of(report):
+    """Id del video de un reporte: nombre de `video_path` o, si falta, el de `interview_id`."""
+    if report.get("video_path"):
+        # Las rutas pueden venir de Windows (separador "\\")
+        return normalize_video_id(report["video_path"].replace("\\", "/"))
+    # "INT-VIDEO_04-1766159516" -> "video_04"
+    return report["interview_id"].replace("INT-", "", 1).rsplit("-", 1)[0].lower()
+
+
+def load_manual_labels(manual_csv_path):
+    """
+    Carga las etiquetas manuales una sola vez como índice de intervalos por video:
+    {video_id: {"start", "end", "congruence" (arreglos ordenados por inicio),
+    "emotion_face", "emotion_text" (listas)}}.
+    """
+    rows = {}
+    with open(manual_csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            rows.setdefault(normalize_video_id(row["video_id"]), []).append(row)
+
+    index = {}
+    for video_id, video_rows in rows.items():
+        video_rows.sort(key=lambda row: float(row["start_time_sec"]))
+        index[video_id] = {
+            "start": np.array([float(row["start_time_sec"]) for row in video_rows]),
+            "end": np.array([float(row["end_time_sec"]) for row in video_rows]),
+            "congruence": np.array([float(row["manual_congruence"]) for row in video_rows]),
+            "emotion_face": [row.get("manual_emotion_face", "") for row in video_rows],
+            "emotion_text": [row.get("manual_emotion_text", "") for row in video_rows],
+        }
+    return index
+
+
+def overlap_join(starts, ends, label_starts, label_ends):
+    """
+    Merge join de intervalos: pares (evento, etiqueta) que se solapan en el tiempo y
+    los segundos de solapamiento. Ambas listas van ordenadas por inicio; la búsqueda
+    binaria usa el máximo acumulado de los fines, así que también sirve si las
+    etiquetas se solapan entre sí. O((E + L) log L + pares).
+    Retorna (idx_eventos, idx_etiquetas, solapamiento_sec).
+    """
+    starts, ends = np.asarray(starts, dtype=float), np.asarray(ends, dtype=float)
+    label_starts, label_ends = np.asarray(label_starts, dtype=float), np.asarray(label_ends, dtype=float)
+    if len(starts) == 0 or len(label_starts) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+
+    # Candidatas: etiquetas que terminan después del inicio y empiezan antes del fin
+    lo = np.searchsorted(np.maximum.accumulate(label_ends), starts, side="right")
+    hi = np.searchsorted(label_starts, ends, side="left")
+    counts = np.maximum(hi - lo, 0)
+
+    event_idx = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    label_idx = lo[event_idx] + offsets
+
+    overlap = np.minimum(ends[event_idx], label_ends[label_idx]) - np.maximum(starts[event_idx],
+                                                                              label_starts[label_idx])
+    keep = overlap > 0
+    return event_idx[keep], label_idx[keep], overlap[keep]
+
+
+def compare_report(report, labels):
+    """
+    Acuerdo IA vs etiquetas manuales de un reporte, ponderado por el solapamiento
+    temporal de cada par (evento, etiqueta). `labels` es la entrada del video en
+    load_manual_labels (o None si el video no tiene etiquetas).
+    """
+    events = report.get("events", [])
+    if labels is None or not events:
+        return {"robustness_accuracy": 0, "segments_validated": 0, "overlap_sec": 0.0, "detailed_comparison": []}
+
+    starts = [event["start_time_sec"] for event in events]
+    ends = [event["end_time_sec"] for event in events]
+    order = np.argsort(starts, kind="stable")
+    ev_idx, lab_idx, overlap = overlap_join(np.take(starts, order), np.take(ends, order),
+                                            labels["start"], labels["end"])
+    ev_idx = order[ev_idx]
+
+    ai_scores = np.array([events[i]["congruence_score"] for i in ev_idx], dtype=float)
+    manual_scores = labels["congruence"][lab_idx]
+    correct = np.abs(ai_scores - manual_scores) <= SCORE_TOLERANCE + 1e-9
+    face_match = np.array([events[i].get("emotion_facial_mode") == labels["emotion_face"][j]
+                           for i, j in zip(ev_idx, lab_idx)], dtype=bool)
+    text_match = np.array([events[i].get("emotion_text_nlp") == labels["emotion_text"][j]
+                           for i, j in zip(ev_idx, lab_idx)], dtype=bool)
+
+    total = float(overlap.sum())
+
+    def weighted(mask):
+        return float(overlap[mask].sum() / total * 100) if total > 0 else 0
+
+    detailed = [
+        {"time": events[i]["start_time_sec"], "ai_score": events[i]["congruence_score"],
+         "manual_score": float(labels["congruence"][j]), "overlap_sec": round(float(ov), 2),
+         "status": "VALID" if ok else "INVALID"}
+        for i, j, ov, ok in zip(ev_idx, lab_idx, overlap, correct)
+    ]
+    return {
+        "robustness_accuracy": weighted(correct),
+        "face_emotion_accuracy": weighted(face_match),
+        "text_emotion_accuracy": weighted(text_match),
+        "segments_validated": int(len(np.unique(ev_idx))),
+        "overlap_sec": round(total, 2),
+        "detailed_comparison": detailed,
+    }
+
+
+def run_manual_validation(json_output_path, manual_csv_path, labels_index=None):
+    """
+    Valida un reporte contra las etiquetas manuales (TCI4.6). La precisión es el
+    porcentaje del tiempo solapado en que el score de la IA coincide con el manual
+    (±SCORE_TOLERANCE). `labels_index` permite reutilizar las etiquetas ya cargadas.
+    """
     log.info("--- INICIANDO VALIDACIÓN TCI4.6 (IA vs Etiquetas Manuales) ---")
-    
-    if not os.path.exists(json_output_path) or not os.path.exists(manual_csv_path):
+
+    if not os.path.exists(json_output_path) or (labels_index is None and not os.path.exists(manual_csv_path)):
         log.error("Faltan archivos para la validación.")
         return None
 
-    # 1. Cargar datos
-    with open(json_output_path, 'r', encoding='utf-8') as f:
-        ai_data = json.load(f)
-    
-    df_manual = pd.read_csv(manual_csv_path)
-    video_id = ai_data['interview_id'].replace("INT-", "").split("-")[0].lower()
-    
-    # Filtrar etiquetas manuales para este video específico
-    df_manual_video = df_manual[df_manual['video_id'].str.lower() == video_id]
-    
-    matches = 0
-    total_validated = 0
-    validation_results = []
-
-    # 2. Comparar segmento por segmento
-    for ai_event in ai_data['events']:
-        start = ai_event['start_time_sec']
-        
-        # Buscar el segmento manual más cercano en tiempo
-        manual_row = df_manual_video[
-            (df_manual_video['start_time_sec'] >= start - 0.5) & 
-            (df_manual_video['start_time_sec'] <= start + 0.5)
-        ]
-        
-        if not manual_row.empty:
-            total_validated += 1
-            m_row = manual_row.iloc[0]
-            
-            # Verificar si el score de la IA coincide con el manual
-            # (Damos un margen de error de 0.1 en el score)
-            is_correct = abs(ai_event['congruence_score'] - m_row['manual_congruence']) <= 0.1
-            
-            if is_correct:
-                matches += 1
-            
-            validation_results.append({
-                "time": start,
-                "ai_score": ai_event['congruence_score'],
-                "manual_score": m_row['manual_congruence'],
-                "status": "VALID" if is_correct else "INVALID"
-            })
-
-    # 3. Calcular Métrica de Robustez
-    accuracy = (matches / total_validated * 100) if total_validated > 0 else 0
-    
-    log.info(f"Validación Finalizada. Robustez del Modelo: {accuracy:.2f}%")
-    
-    return {
-        "robustness_accuracy": accuracy,
-        "segments_validated": total_validated,
-        "detailed_comparison": validation_results
-    }
\ No newline at end of file
+    # Acepta cualquier formato del reporte (json, compact, ndjson, historias RLE)
+    ai_data = load_report(json_output_path)
+    if labels_index is None:
+        labels_index = load_manual_labels(manual_csv_path)
+    video_id = video_id_of(ai_data)
+    if video_id not in labels_index:
+        log.warning(f"Sin etiquetas manuales para {video_id}.")
+
+    result = compare_report(ai_data, labels_index.get(video_id))
+    result["video_id"] = video_id
+    log.info(f"Validación Finalizada ({video_id}). Robustez del Modelo: {result['robustness_accuracy']:.2f}% "
+             f"sobre {result['overlap_sec']:.1f}s etiquetados.")
+    return result
+
+
+def validate_corpus(reports_dir, manual_csv_path):
+    """
+    Valida todos los reportes `*_FINAL.json` / `*_FINAL.ndjson` de `reports_dir`
+    contra las etiquetas (cargadas una sola vez). Retorna la precisión por video y la
+    agregada, ponderada por los segundos etiquetados de cada video.
+    """
+    labels_index = load_manual_labels(manual_csv_path)
+    paths = sorted(path for pattern in REPORT_PATTERNS for path in glob.glob(os.path.join(reports_dir, pattern)))
+
+    videos = []
+    for path in paths:
+        result = run_manual_validation(path, manual_csv_path, labels_index)
+        if result is None:
+            continue
+        result.pop("detailed_comparison")
+        result["report"] = os.path.basename(path)
+        videos.append(result)
+
+    labelled = [video for video in videos if video["overlap_sec"] > 0]
+    total = sum(video["overlap_sec"] for video in labelled)
+
+    def aggregate(key):
+        return round(sum(video[key] * video["overlap_sec"] for video in labelled) / total, 2) if total > 0 else 0
+
+    summary = {
+        "reports": len(videos),
+        "videos_labelled": len(labelled),
+        "overlap_sec": round(total, 2),
+        "robustness_accuracy": aggregate("robustness_accuracy"),
+        "face_emotion_accuracy": aggregate("face_emotion_accuracy"),
+        "text_emotion_accuracy": aggregate("text_emotion_accuracy"),
+        "videos": videos,
+    }
+    log.info(f"Corpus: {len(labelled)}/{len(videos)} reportes con etiquetas. "
+             f"Robustez agregada: {summary['robustness_accuracy']:.2f}%")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    parser = argparse.ArgumentParser(description="Validación de robustez sobre todo el corpus etiquetado.")
+    parser.add_argument("--reports", default=os.path.join(root, "05_OUTPUTS", "json_reports"),
+                        help="Carpeta con los reportes *_FINAL.json / *_FINAL.ndjson.")
+    parser.add_argument("--labels", default=os.path.join(root, "01_DATA", "validation_labels.csv"),
+                        help="CSV de etiquetas manuales.")
+    parser.add_argument("--out", help="Guarda el resumen en este JSON.")
+    parser.add_argument("--min-accuracy", type=float,
+                        help="Termina con código 1 si la robustez agregada queda bajo este porcentaje.")
+    args = parser.parse_args()
+
+    summary = validate_corpus(args.reports, args.labels)
+    for video in summary["videos"]:
+        log.info(f"  {video['video_id']}: {video['robustness_accuracy']:.2f}% "
+                 f"({video['segments_validated']} segmentos, {video['overlap_sec']:.1f}s)")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4, ensure_ascii=False)
+    if args.min_accuracy is not None and summary["robustness_accuracy"] < args.min_accuracy:
+        log.error(f"Robustez {summary['robustness_accuracy']:.2f}% bajo el mínimo {args.min_accuracy:.2f}%.")
+        sys.exit(1)
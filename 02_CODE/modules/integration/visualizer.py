@@ -1,63 +1,218 @@
-import matplotlib.pyplot as plt
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from utils.logger import get_logger
 
 log = get_logger("Visualizador_Avanzado")
 
-def generate_comparison_plot(integrated_data, output_path):
+# Formatos de salida admitidos (por la extensión de output_path)
+PLOT_FORMATS = ("png", "jpg", "svg", "pdf")
+PLOT_DPI = 300   # Calidad de impresión
+FAST_DPI = 100   # Modo rápido: resolución de pantalla
+FIGSIZE = (14, 10)
+# Fracción del ancho de la figura que ocupa el área de datos (márgenes fijos del modo rápido)
+AXES_LEFT, AXES_RIGHT = 0.07, 0.98
+# Sobre este número de cambios las etiquetas 'Δ Cambio' se reemplazan por una entrada en la leyenda
+MAX_CHANGE_LABELS = 40
+
+_PLOT_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def pixel_columns(dpi, figsize=FIGSIZE):
+    """Columnas de píxeles del área de datos: más eventos que esto no se distinguen."""
+    return max(1, int(figsize[0] * dpi * (AXES_RIGHT - AXES_LEFT)))
+
+
+def downsample_steps(times, labels, max_points):
+    """
+    Índices a dibujar de una serie escalonada (where='post'). Primero se quedan solo
+    los puntos donde la etiqueta cambia (sin pérdida: el escalón es el mismo); si aún
+    quedan más que `max_points`, uno por columna de píxel.
+    """
+    labels = np.asarray(labels, dtype=object)
+    keep = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]]) if len(labels) else np.zeros(0, dtype=np.int64)
+    if len(keep) > max_points:
+        times = np.asarray(times, dtype=float)
+        span = max(times[-1] - times[0], 1e-9)
+        pixel = ((times[keep] - times[0]) / span * (max_points - 1)).astype(np.int64)
+        keep = keep[np.r_[True, pixel[1:] != pixel[:-1]]]
+    return keep
+
+
+def downsample_bars(starts, ends, scores, max_bins):
+    """
+    Agrupa las barras de congruencia por columna de píxel. Cada grupo toma la altura
+    del score medio y el color del score mínimo, para que una contradicción aislada
+    siga visible. Retorna (inicios, anchos, alturas, mínimos).
+    """
+    starts, ends, scores = (np.asarray(a, dtype=float) for a in (starts, ends, scores))
+    if len(starts) <= max_bins:
+        return starts, ends - starts, scores, scores
+    span = max(ends.max() - starts[0], 1e-9)
+    pixel = ((starts - starts[0]) / span * max_bins).astype(np.int64)
+    first = np.flatnonzero(np.r_[True, pixel[1:] != pixel[:-1]])
+    counts = np.diff(np.r_[first, len(scores)])
+    bin_ends = np.maximum.reduceat(ends, first)
+    return (starts[first], bin_ends - starts[first], np.add.reduceat(scores, first) / counts,
+            np.minimum.reduceat(scores, first))
+
+
+def prepare_plot_data(integrated_data):
+    """Columnas que necesita el gráfico (se extraen antes de renderizar en segundo plano)."""
+    return {
+        "times": np.array([e['start_time_sec'] for e in integrated_data], dtype=float),
+        # Cada barra cubre su segmento; sin end_time_sec mide 2 s (como el gráfico original)
+        "ends": np.array([e.get('end_time_sec', e['start_time_sec'] + 2.0) for e in integrated_data], dtype=float),
+        "text": [e['emotion_text_nlp'] for e in integrated_data],
+        "face": [e['emotion_facial_mode'] for e in integrated_data],
+        "scores": np.array([e['congruence_score'] for e in integrated_data], dtype=float),
+        "changes": np.array([bool(e.get('is_change_point')) for e in integrated_data], dtype=bool),
+    }
+
+
+def generate_comparison_plot(integrated_data, output_path, dpi=PLOT_DPI, fast=False):
+    """
+    Dashboard multimodal (emociones texto vs rostro + congruencia). El formato sale
+    de la extensión de `output_path` (png, jpg, svg, pdf).
+    Los artistas van agrupados (una colección de líneas para los cambios y una de
+    polígonos para las barras) y las series más largas que el ancho en píxeles se
+    reducen sin perder cambios visibles. `fast=True` dibuja a FAST_DPI (si no se
+    pasa otro `dpi`) con márgenes fijos, sin el segundo render de bbox_inches='tight'.
+    """
     log.info(f"Generando Dashboard Multimodal mejorado...")
-    
+    if fast and dpi == PLOT_DPI:
+        dpi = FAST_DPI
+    start = time.perf_counter()
+    _render(prepare_plot_data(integrated_data), output_path, dpi, fast)
+    log.info(f"Dashboard profesional guardado en: {output_path} ({time.perf_counter() - start:.2f}s)")
+    return output_path
+
+
+def submit_comparison_plot(integrated_data, output_path, dpi=PLOT_DPI, fast=False, stats=None):
+    """
+    Igual que generate_comparison_plot, pero el render corre en un hilo de fondo y
+    sale del camino crítico del pipeline. Los datos se copian antes de retornar, así
+    que los eventos pueden seguir usándose. Retorna un Future con la ruta de salida;
+    si se pasa el dict `stats`, el hilo deja en `stats["seconds"]` la duración del render.
+    """
+    if fast and dpi == PLOT_DPI:
+        dpi = FAST_DPI
+    data = prepare_plot_data(integrated_data)
+
+    def task():
+        tick = time.perf_counter()
+        try:
+            _render(data, output_path, dpi, fast)
+        except Exception as e:
+            log.error(f"Error generando el dashboard en segundo plano: {e}")
+            raise
+        elapsed = time.perf_counter() - tick
+        if stats is not None:
+            stats["seconds"] = elapsed
+        log.info(f"Dashboard (segundo plano) guardado en: {output_path} ({elapsed:.2f}s)")
+        return output_path
+
+    return _plot_pool().submit(task)
+
+
+def _plot_pool():
+    global _PLOT_POOL
+    with _POOL_LOCK:
+        if _PLOT_POOL is None:
+            # Un solo hilo: los renders se encolan y no compiten con la inferencia
+            _PLOT_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grafico")
+        return _PLOT_POOL
+
+
+def _render(data, output_path, dpi, fast):
+    # matplotlib tarda ~1 s en importarse: solo se carga al dibujar.
+    # Figure + lienzo Agg explícito (sin pyplot): sin estado global ni backend
+    # interactivo, seguro en hilos (modo lote, servidor, render en segundo plano).
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import PolyCollection
+    from matplotlib.lines import Line2D
+
+    fmt = os.path.splitext(output_path)[1].lstrip(".").lower() or "png"
+    if fmt not in PLOT_FORMATS:
+        raise ValueError(f"Formato de gráfico no soportado: {fmt}")
+
     # 1. Preparación de datos
-    times = [e['start_time_sec'] for e in integrated_data]
-    text_emos = [e['emotion_text_nlp'] for e in integrated_data]
-    face_emos = [e['emotion_facial_mode'] for e in integrated_data]
-    scores = [e['congruence_score'] for e in integrated_data]
+    times, ends, scores = data["times"], data["ends"], data["scores"]
+    max_points = pixel_columns(dpi)
+    downsampled = len(times) > max_points
+    marker = {} if downsampled else {"text": {"marker": "o"}, "face": {"marker": "x"}}
 
     # Crear figura con dos subplots (70% para emociones, 30% para score)
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10), sharex=True, 
-                                   gridspec_kw={'height_ratios': [3, 1]})
+    fig = Figure(figsize=FIGSIZE)
+    FigureCanvasAgg(fig)
+    ax1, ax2 = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
 
     # --- SUBPLOT 1: EMOCIONES (TEXTO VS ROSTRO) ---
-    ax1.step(times, text_emos, where='post', label='Emoción Texto', 
-             marker='o', linewidth=2.5, color='#1f77b4', zorder=3)
-    ax1.step(times, face_emos, where='post', label='Emoción Rostro', 
-             marker='x', linewidth=2, color='#ff7f0e', linestyle='--', alpha=0.8, zorder=2)
-
-    # Añadir las líneas de "Cambio Abrupto" de forma discreta
-    for e in integrated_data:
-        if e.get('is_change_point'):
-            # Línea vertical muy suave
-            ax1.axvline(x=e['start_time_sec'], color='red', linestyle=':', alpha=0.3)
+    for key, label, style in (("text", 'Emoción Texto', dict(linewidth=2.5, color='#1f77b4', zorder=3)),
+                              ("face", 'Emoción Rostro', dict(linewidth=2, color='#ff7f0e', linestyle='--',
+                                                              alpha=0.8, zorder=2))):
+        idx = downsample_steps(times, data[key], max_points) if downsampled else np.arange(len(times))
+        x, y = times[idx], [data[key][i] for i in idx]
+        if downsampled and len(times):
+            # El último escalón se extiende hasta el final de la serie
+            x, y = np.r_[x, times[-1]], y + y[-1:]
+        ax1.step(x, y, where='post', label=label, **style, **marker.get(key, {}))
+
+    # Cambios abruptos: una sola colección de líneas verticales (no un axvline por cambio)
+    change_times = times[data["changes"]]
+    if downsampled and len(change_times):
+        # Una línea por columna de píxel
+        span = max(times[-1] - times[0], 1e-9)
+        pixel = np.unique(np.round((change_times - times[0]) / span * max_points))
+        change_times = times[0] + pixel * span / max_points
+    if len(change_times):
+        ax1.vlines(change_times, 0, 1, transform=ax1.get_xaxis_transform(), color='red', linestyle=':', alpha=0.3)
+        if len(change_times) <= MAX_CHANGE_LABELS:
             # Etiqueta en la parte superior, fuera del área de las curvas
-            ax1.text(e['start_time_sec'], ax1.get_ylim()[1], ' Δ Cambio', 
-                     color='red', fontsize=8, fontweight='bold', rotation=0, va='bottom')
+            top = ax1.get_ylim()[1]
+            for t in change_times:
+                ax1.text(t, top, ' Δ Cambio', color='red', fontsize=8, fontweight='bold', rotation=0, va='bottom')
 
     ax1.set_title("Análisis Emocional Multimodal (Simulación GRU)", fontsize=14, pad=20)
     ax1.set_ylabel("Categoría Emocional")
-    ax1.legend(loc='upper right', frameon=True)
+    handles, labels = ax1.get_legend_handles_labels()
+    if len(change_times) > MAX_CHANGE_LABELS:
+        handles.append(Line2D([], [], color='red', linestyle=':', alpha=0.6))
+        labels.append(f'Δ Cambio ({int(data["changes"].sum())})')
+    ax1.legend(handles, labels, loc='upper right', frameon=True)
     ax1.grid(True, linestyle='--', alpha=0.4)
 
     # --- SUBPLOT 2: SCORE DE CONGRUENCIA (MÉTRICA 4.2) ---
-    # Usamos barras para mostrar el acuerdo en cada intervalo
-    colors = ['green' if s >= 0.7 else 'orange' if s >= 0.3 else 'red' for s in scores]
-    ax2.bar(times, scores, width=2.0, align='edge', color=colors, alpha=0.6, label='Nivel de Acuerdo')
-    
+    # Barras en una sola colección de polígonos; cada barra cubre su intervalo
+    bar_x, bar_w, bar_s, bar_min = downsample_bars(times, ends, scores, max_points)
+    colors = np.where(bar_min >= 0.7, 'green', np.where(bar_min >= 0.3, 'orange', 'red'))
+    verts = np.stack([np.c_[bar_x, np.zeros_like(bar_x)], np.c_[bar_x, bar_s],
+                      np.c_[bar_x + bar_w, bar_s], np.c_[bar_x + bar_w, np.zeros_like(bar_x)]], axis=1)
+    ax2.add_collection(PolyCollection(verts, facecolors=colors, edgecolors='none', alpha=0.6,
+                                      label='Nivel de Acuerdo'))
+    if len(bar_x):
+        ax2.set_xlim(min(bar_x[0], times[0]), max((bar_x + bar_w)[-1], times[-1]))
+
     ax2.set_ylim(0, 1.1)
     ax2.set_ylabel("Congruencia")
     ax2.set_xlabel("Segundos del Video")
     ax2.grid(True, axis='y', linestyle=':', alpha=0.5)
-    
-    # Añadir una línea de meta para el score global si quieres
-    avg_score = sum(scores) / len(scores) if scores else 0
+
+    # Línea de meta con el score global
+    avg_score = float(scores.mean()) if len(scores) else 0
     ax2.axhline(avg_score, color='blue', linestyle='--', alpha=0.5, label=f'Promedio: {avg_score:.2f}')
     ax2.legend(loc='upper right', fontsize='small')
 
-    # Ajustar diseño
-    plt.tight_layout()
-    
     # Crear carpeta si no existe y guardar
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    log.info(f"Dashboard profesional guardado en: {output_path}")
\ No newline at end of file
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if fast:
+        # Márgenes fijos: un solo render (tight_layout y bbox 'tight' dibujan la figura de nuevo)
+        fig.subplots_adjust(left=AXES_LEFT, right=AXES_RIGHT, top=0.93, bottom=0.07, hspace=0.08)
+        fig.savefig(output_path, dpi=dpi, format=fmt)
+    else:
+        fig.tight_layout()
+        fig.savefig(output_path, dpi=dpi, format=fmt, bbox_inches='tight')
@@ -0,0 +1,159 @@
+import math
+import numpy as np
+from utils.logger import get_logger
+from modules.visual.frame_sampler import estimate_gop_size, SEEK_GOP_FACTOR
+
+log = get_logger("Modulo_Muestreo_Adaptativo")
+
+# Paso inicial: un frame cada 2 s a 30 fps (la mitad de frames que el muestreo fijo)
+DEFAULT_COARSE_STEP = 60
+# Resolución máxima de la bisección (~0.25 s a 30 fps)
+DEFAULT_MIN_STEP = 8
+# Tope de frames analizados por minuto de video (el muestreo fijo a 30 usa 60)
+DEFAULT_BUDGET_PER_MIN = 60
+# Diferencia media de miniaturas (0-1) a partir de la cual se considera que la escena cambió
+DEFAULT_DIFF_THRESHOLD = 0.06
+# Tamaño de la miniatura en escala de grises usada como señal barata
+SIGNATURE_SIZE = (32, 32)
+
+
+def frame_signature(frame_bgr):
+    """Miniatura en gris normalizada (0-1): señal barata de cambio entre frames."""
+    import cv2
+    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+
+
+def adaptive_sample(n_frames, read_frames, classify, signature, coarse_step=DEFAULT_COARSE_STEP,
+                    min_step=DEFAULT_MIN_STEP, max_samples=None, diff_threshold=DEFAULT_DIFF_THRESHOLD,
+                    cancel_event=None, keep=None):
+    """
+    Muestreo adaptativo por bisección.
+
+    1. Pasada gruesa cada `coarse_step` frames.
+    2. Un intervalo entre dos muestras "cambia" si las etiquetas difieren o si la
+       diferencia de sus firmas supera `diff_threshold`.
+    3. Cada ronda evalúa el punto medio de los intervalos que cambiaron (los de mayor
+       diferencia primero) hasta llegar a `min_step` o agotar `max_samples`.
+
+    `read_frames(indices)` entrega los frames de índices crecientes (o menos, si el
+    video se acaba), `classify(frames)`
+    retorna [(etiqueta, confianza, ...) | None] por frame y `signature(frame)` un arreglo.
+    `keep(frame_idx)` opcional restringe las muestras (p. ej. a las regiones de voz).
+    Retorna (muestras, info): muestras = [(frame_idx, etiqueta, confianza, ...)] ordenadas,
+    solo de frames con etiqueta (los campos extra de `classify` se conservan).
+    """
+    labels, signatures = {}, {}
+
+    def evaluate(indices):
+        # read_frames puede entregar menos frames si el video termina antes de lo declarado
+        frames = read_frames(indices)
+        for idx, frame, result in zip(indices, frames, classify(frames)):
+            labels[idx] = result
+            signatures[idx] = signature(frame)
+        return indices[:len(frames)]
+
+    def change_strength(a, b):
+        la, lb = labels[a], labels[b]
+        label_change = la is not None and lb is not None and la[0] != lb[0]
+        diff = float(np.mean(np.abs(signatures[a] - signatures[b])))
+        if label_change or diff > diff_threshold:
+            return diff + (1.0 if label_change else 0.0)
+        return None
+
+    def changed_intervals(points):
+        intervals = []
+        for a, b in zip(points, points[1:]):
+            if b - a <= min_step:
+                continue
+            strength = change_strength(a, b)
+            if strength is not None:
+                intervals.append((strength, a, b))
+        return intervals
+
+    coarse = [idx for idx in range(0, n_frames, coarse_step) if keep is None or keep(idx)]
+    if max_samples is not None:
+        coarse = coarse[:max_samples]
+    coarse = evaluate(coarse)
+    intervals = changed_intervals(coarse)
+
+    rounds = 0
+    while intervals:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        remaining = max_samples - len(labels) if max_samples is not None else len(intervals)
+        if remaining <= 0:
+            break
+        # Con presupuesto limitado se refinan primero los cambios más marcados
+        intervals.sort(key=lambda item: item[0], reverse=True)
+        chosen = sorted(intervals[:remaining], key=lambda item: item[1])
+        midpoints = [(a + b) // 2 for _, a, b in chosen]
+        evaluate([mid for mid in midpoints if keep is None or keep(mid)])
+        rounds += 1
+        intervals = []
+        for (_, a, b), mid in zip(chosen, midpoints):
+            if mid in labels:
+                intervals.extend(changed_intervals([a, mid, b]))
+
+    samples = [(idx, *result) for idx, result in sorted(labels.items()) if result is not None]
+    info = {"coarse": len(coarse), "refined": len(labels) - len(coarse), "rounds": rounds}
+    return samples, info
+
+
+class FrameReader:
+    """
+    Lectura de frames por índice con OpenCV. Los índices se piden en orden creciente:
+    los saltos cortos avanzan con grab() y los largos (varios GOPs) usan seek.
+    """
+
+    def __init__(self, video_path, gop_size=None):
+        import cv2
+        self._cv2 = cv2
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise IOError(f"No se pudo abrir el video con OpenCV: {video_path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.n_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        gop_size = gop_size if gop_size is not None else estimate_gop_size(video_path)
+        self._seek_threshold = SEEK_GOP_FACTOR * max(gop_size, 1)
+        self._position = 0  # próximo frame que entregaría grab()
+
+    def read(self, indices):
+        """Frames de `indices` (crecientes); se detiene en el primer frame ilegible."""
+        frames = []
+        for idx in indices:
+            gap = idx - self._position
+            if gap < 0 or gap > self._seek_threshold:
+                self.cap.set(self._cv2.CAP_PROP_POS_FRAMES, idx)
+            else:
+                for _ in range(gap):
+                    self.cap.grab()
+            ret, frame = self.cap.read()
+            if not ret:
+                # CAP_PROP_FRAME_COUNT puede sobrestimar la duración: se corta aquí
+                log.warning(f"No se pudo leer el frame {idx}; fin del video.")
+                self._position = idx
+                break
+            frames.append(frame)
+            self._position = idx + 1
+        return frames
+
+    def release(self):
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def budget_for(n_frames, fps, budget_per_min=DEFAULT_BUDGET_PER_MIN):
+    """Máximo de frames a analizar para un video de `n_frames` frames."""
+    minutes = n_frames / fps / 60 if fps > 0 else 0
+    return max(1, math.ceil(minutes * budget_per_min))
+
+
+def coarse_step_for(n_frames, max_samples, coarse_step=DEFAULT_COARSE_STEP):
+    """Agranda el paso grueso si la pasada inicial por sí sola excedería el presupuesto."""
+    return max(coarse_step, math.ceil(n_frames / max_samples))
@@ -0,0 +1,108 @@
+import threading
+import numpy as np
+from utils.logger import get_logger
+
+log = get_logger("Modulo_Emocion_Lotes")
+
+# Orden de salida del modelo de emociones de DeepFace
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+# Tamaño de entrada que DeepFace.analyze usa antes del modelo de emociones
+FACE_TARGET_SIZE = (224, 224)
+
+# deepface (y TensorFlow detrás) se importa dentro de las funciones: importar este
+# módulo no carga el modelo si la serie facial ya está en caché.
+
+_EMOTION_MODEL = None
+_MODEL_LOCK = threading.Lock()
+
+
+def get_emotion_model():
+    """Construye una sola vez el modelo de emociones de DeepFace y lo reutiliza."""
+    global _EMOTION_MODEL
+    from deepface import DeepFace
+    # Varios workers (o videos en lote) pueden pedir el modelo a la vez
+    with _MODEL_LOCK:
+        if _EMOTION_MODEL is None:
+            log.info("Cargando modelo de emociones de DeepFace...")
+            _EMOTION_MODEL = DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+    return _EMOTION_MODEL
+
+
+def warmup_models(detector_backend="opencv"):
+    """Carga por adelantado el detector y el modelo de emociones (una vez por proceso)."""
+    from deepface import DeepFace
+    DeepFace.build_model(model_name=detector_backend, task="face_detector")
+    get_emotion_model()
+
+
+def detect_face(frame_bgr, detector_backend="opencv"):
+    """
+    Detecta y alinea el primer rostro del frame (igual que DeepFace.analyze) y lo
+    devuelve en BGR normalizado con tamaño FACE_TARGET_SIZE, listo para apilar en un lote.
+    Retorna None si el recorte está vacío.
+    """
+    face, _ = detect_face_with_box(frame_bgr, detector_backend)
+    return face
+
+
+def detect_face_with_box(frame_bgr, detector_backend="opencv"):
+    """
+    Como detect_face, pero también retorna la caja (x, y, w, h) del rostro. La caja es
+    None si el detector no encontró rostro (DeepFace devuelve entonces el frame completo).
+    """
+    from deepface import DeepFace
+    faces = DeepFace.extract_faces(frame_bgr, detector_backend=detector_backend,
+                                   enforce_detection=False, align=True)
+    if not faces:
+        return None, None
+    face = faces[0]["face"]
+    if face.shape[0] == 0 or face.shape[1] == 0:
+        return None, None
+    box = None
+    area = faces[0].get("facial_area") or {}
+    if faces[0].get("confidence", 0) > 0 and area.get("w") and area.get("h"):
+        box = (int(area["x"]), int(area["y"]), int(area["w"]), int(area["h"]))
+    # extract_faces entrega RGB; el modelo de emociones espera BGR
+    return prepare_face(face[:, :, ::-1]), box
+
+
+def prepare_face(face_bgr):
+    """Recorte BGR normalizado (0-1) -> entrada del modelo de emociones (FACE_TARGET_SIZE)."""
+    from deepface.modules import preprocessing
+    return preprocessing.resize_image(img=face_bgr, target_size=FACE_TARGET_SIZE)[0]
+
+
+def predict_emotions(faces):
+    """
+    Ejecuta el modelo de emociones sobre un lote de rostros en una sola pasada.
+    Retorna una matriz (N, 7) con porcentajes por emoción (misma escala que DeepFace.analyze).
+    """
+    if len(faces) == 0:
+        return np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32)
+    batch = np.stack(faces)
+    predictions = np.atleast_2d(get_emotion_model().predict(batch))
+    return 100 * predictions / predictions.sum(axis=1, keepdims=True)
+
+
+def labels_from_predictions(probabilities):
+    """Emoción dominante y su confianza por fila: [(emotion, confidence), ...]."""
+    labels = []
+    for probs in probabilities:
+        best = int(np.argmax(probs))
+        labels.append((EMOTION_LABELS[best], float(probs[best])))
+    return labels
+
+
+def rows_from_predictions(timestamps, probabilities):
+    """
+    Convierte la salida del lote en filas de la serie (timestamp_sec, emotion, confidence)
+    más el vector completo prob_<emoción> en escala 0-1, para poder re-fusionar con
+    probabilidades suaves sin volver a ejecutar la CNN.
+    """
+    rows = []
+    for timestamp, probs, (emotion, confidence) in zip(timestamps, probabilities,
+                                                       labels_from_predictions(probabilities)):
+        row = {"timestamp_sec": timestamp, "emotion": emotion, "confidence": confidence}
+        row.update({f"prob_{label}": round(float(p) / 100, 4) for label, p in zip(EMOTION_LABELS, probs)})
+        rows.append(row)
+    return rows
@@ -1,8 +1,8 @@
 import json
 from collections import Counter
 import os
-import pandas as pd
 import sys
+import numpy as np
 
 # --- AJUSTE DE IMPORTACIONES ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,6 +10,8 @@ sys.path.append(os.path.join(current_dir, "..", ".."))
 
 from utils.logger import get_logger
 from utils.helpers import validate_input_file, create_output_directory
+from utils.face_series import find_face_series, load_face_series, PROBABILITY_COLUMN, PROB_COLUMNS
+from utils.emotion_codes import EMOTIONS, N_EMOTIONS, decode_series, encode_series, unknown_labels
 
 # --- CONFIGURACIÓN ---
 log = get_logger("CNN_Consolidacion")
@@ -28,11 +30,42 @@ OUTPUT_CNN_PATH = os.path.join(ROOT_DIR, "05_OUTPUTS", "json_reports", "face_ana
 
 # --- LÓGICA CENTRAL PBI 2.4 ---
 
-def consolidate_emotions_by_segment(timeseries_data_list: list, start_time: float, end_time: float) -> dict:
+def consolidate_segments(columns: dict, segments: list, soft: bool = False) -> list:
+    """
+    Consolidación en lote (PBI 2.4): moda, confianza e historia de todos los
+    segmentos en una sola pasada sobre la serie facial. `columns` es la serie
+    columnar ordenada por tiempo (utils.face_series.load_face_series: emoción como
+    código int8) y `segments` los segmentos de la transcripción (start_time,
+    end_time). Cada segmento toma los frames con start <= timestamp_sec < end,
+    ubicados por búsqueda binaria: O((S + F) log F) en lugar de recorrer la serie
+    completa por segmento.
+    """
+    timestamps = np.asarray(columns['timestamp_sec'], dtype=np.float64)
+    starts = [seg['start_time'] for seg in segments]
+    ends = [seg['end_time'] for seg in segments]
+    lo = np.searchsorted(timestamps, np.asarray(starts, dtype=np.float64), side='left')
+    hi = np.maximum(np.searchsorted(timestamps, np.asarray(ends, dtype=np.float64), side='left'), lo)
+
+    probabilities = columns.get(PROBABILITY_COLUMN) if soft else None
+    if soft and probabilities is None:
+        log.warning("La serie facial no trae probabilidades (prob_<emoción>); se usa la votación dura.")
+    results = _consolidate_bounds(np.asarray(columns['emotion']), probabilities, lo, hi, starts, ends)
+
+    empty = int(np.count_nonzero(hi == lo))
+    log.info(f"Consolidación: {len(segments)} segmentos sobre {len(timestamps)} frames ({empty} sin rostro).")
+    return results
+
+def consolidate_emotions_by_segment(timeseries_data_list: list, start_time: float, end_time: float,
+                                    soft: bool = False) -> dict:
     """
     Implementa la lógica de votación (Moda) para un segmento de tiempo. (Criterio 2)
+    Con `soft=True` y frames con vector prob_<emoción>, gana la emoción de mayor
+    probabilidad media y la confianza es esa probabilidad media.
+    Para muchos segmentos usar consolidate_segments (una sola pasada).
+    La moda se toma sobre las etiquetas tal como vienen (un alias como 'sadness' no
+    se reescribe); las etiquetas fuera del vocabulario cuentan como neutral, igual
+    que en la serie en lote (utils.face_series).
     """
-    
     # 1. Filtrar los frames del segmento de tiempo
     segment_frames = [
         frame for frame in timeseries_data_list 
@@ -47,8 +80,21 @@ def consolidate_emotions_by_segment(timeseries_data_list: list, start_time: floa
             'emotion_facial_history': []
         }
 
+    labels = [frame['emotion'] for frame in segment_frames]
+    unknown = unknown_labels(labels)
+    if unknown:
+        log.warning(f"Etiquetas fuera del vocabulario (se cuentan como neutral): {', '.join(sorted(map(str, unknown)))}")
+        labels = ['neutral' if label in unknown else label for label in labels]
+
+    if soft and all(all(col in frame for col in PROB_COLUMNS) for frame in segment_frames):
+        probabilities = np.array([[float(frame[col]) for col in PROB_COLUMNS] for frame in segment_frames])
+        result = _consolidate_bounds(encode_series(labels), probabilities, [0], [len(labels)],
+                                     [start_time], [end_time])[0]
+        result['emotion_facial_history'] = labels
+        return result
+
     # 2. Votación: Contar frecuencias de emociones
-    emotion_counts = Counter([frame['emotion'] for frame in segment_frames])
+    emotion_counts = Counter(labels)
     
     # 3. Determinar la emoción dominante (la Moda)
     dominant_emotion, count = emotion_counts.most_common(1)[0]
@@ -57,8 +103,6 @@ def consolidate_emotions_by_segment(timeseries_data_list: list, start_time: floa
     total_frames = len(segment_frames)
     average_confidence_simplified = count / total_frames if total_frames > 0 else 0.0
 
-    log.info(f"Segmento [{start_time:.2f}s - {end_time:.2f}s] -> Dominante: {dominant_emotion.upper()} ({count}/{total_frames} frames)")
-    
     return {
         # Campos requeridos para la integración (Día 3)
         'start_time_sec': start_time,
@@ -66,9 +110,74 @@ def consolidate_emotions_by_segment(timeseries_data_list: list, start_time: floa
         'emotion_facial_mode': dominant_emotion,
         'confidence_facial_mode': average_confidence_simplified,
         # Historia requerida para Análisis Temporal Avanzado (PBI 4.1)
-        'emotion_facial_history': [frame['emotion'] for frame in segment_frames] 
+        'emotion_facial_history': labels
     }
 
+def _consolidate_bounds(codes, probabilities, lo, hi, starts, ends):
+    """
+    Núcleo de la consolidación: frames [lo, hi) de cada segmento sobre arreglos.
+    Los conteos por emoción salen de sumas acumuladas (conteo = acumulado[hi] -
+    acumulado[lo]) y, con `probabilities`, las probabilidades medias igual.
+    """
+    n_frames = len(codes)
+    lo, hi = np.asarray(lo, dtype=np.int64), np.asarray(hi, dtype=np.int64)
+    totals = hi - lo
+
+    # 2. Votación: frecuencia de cada emoción por segmento
+    cumulative = np.zeros((n_frames + 1, N_EMOTIONS), dtype=np.int32)
+    cumulative[np.arange(1, n_frames + 1), codes] = 1
+    np.cumsum(cumulative, axis=0, out=cumulative)
+    counts = cumulative[hi] - cumulative[lo]
+    top = counts.max(axis=1)
+    dominant = counts.argmax(axis=1)
+    # Empate: gana la emoción que aparece primero en el segmento (como Counter.most_common)
+    for i in np.flatnonzero((np.count_nonzero(counts == top[:, None], axis=1) > 1) & (totals > 0)):
+        tied = counts[i] == top[i]
+        dominant[i] = next(code for code in codes[lo[i]:hi[i]] if tied[code])
+
+    mean_probs = None
+    if probabilities is not None:
+        # Votación suave: promedio de los vectores de probabilidad del segmento
+        prob_cumulative = np.zeros((n_frames + 1, N_EMOTIONS), dtype=np.float64)
+        np.cumsum(probabilities, axis=0, dtype=np.float64, out=prob_cumulative[1:])
+        mean_probs = (prob_cumulative[hi] - prob_cumulative[lo]) / np.maximum(totals, 1)[:, None]
+
+    results = []
+    for i, (start_time, end_time) in enumerate(zip(starts, ends)):
+        if totals[i] == 0:
+            # Si no hay frames, asumimos neutralidad
+            results.append({
+                'emotion_facial_mode': 'neutral',
+                'confidence_facial_mode': 0.0,
+                'emotion_facial_history': []
+            })
+            continue
+
+        history = decode_series(codes[lo[i]:hi[i]])
+        if mean_probs is not None:
+            best = int(np.argmax(mean_probs[i]))
+            results.append({
+                'start_time_sec': start_time,
+                'end_time_sec': end_time,
+                'emotion_facial_mode': EMOTIONS[best],
+                'confidence_facial_mode': float(mean_probs[i, best]),
+                'emotion_facial_probabilities': dict(zip(EMOTIONS, mean_probs[i].tolist())),
+                'emotion_facial_history': history
+            })
+            continue
+
+        # 3-4. Moda y Confianza Simplificada: porcentaje de frames que votaron por la moda
+        results.append({
+            # Campos requeridos para la integración (Día 3)
+            'start_time_sec': start_time,
+            'end_time_sec': end_time,
+            'emotion_facial_mode': EMOTIONS[dominant[i]],
+            'confidence_facial_mode': int(top[i]) / int(totals[i]),
+            # Historia requerida para Análisis Temporal Avanzado (PBI 4.1)
+            'emotion_facial_history': history
+        })
+    return results
+
 # --- FUNCIÓN PRINCIPAL DE EJECUCIÓN DEL MÓDULO ---
 
 def main_cnn_module_run():
@@ -77,8 +186,11 @@ def main_cnn_module_run():
     
     # Criterio 1: Leer la serie temporal (CSV)
     # 1. Validación de Inputs con Helper
-    if not validate_input_file(INPUT_TIMESERIES_PATH_CSV):
-        log.error("Falta el archivo CSV de series temporales. Ejecuta primero 'face_extractor.py'.")
+    # La serie puede estar en CSV o en .npy columnar (utils.face_series); sin opciones
+    # de corrida se acepta cualquiera de los dos, con aviso en el log
+    timeseries_path = find_face_series(INPUT_TIMESERIES_PATH_CSV, any_format=True) or INPUT_TIMESERIES_PATH_CSV
+    if not validate_input_file(timeseries_path):
+        log.error("Falta el archivo de series temporales. Ejecuta primero 'face_extractor.py'.")
         return
         
     if not validate_input_file(INPUT_AUDIO_TEXT_PATH):
@@ -87,9 +199,9 @@ def main_cnn_module_run():
         
     # 2. Carga de Datos
     try:
-        df_timeseries = pd.read_csv(INPUT_TIMESERIES_PATH_CSV)
-        timeseries_data_list = df_timeseries.to_dict('records')
-        log.info(f"Serie temporal cargada: {len(timeseries_data_list)} registros.")
+        # Columnas ordenadas por tiempo (emoción como código int8)
+        timeseries = load_face_series(timeseries_path)
+        log.info(f"Serie temporal cargada: {len(timeseries['timestamp_sec'])} registros.")
         
         with open(INPUT_AUDIO_TEXT_PATH, 'r', encoding='utf-8') as f:
             audio_text_data = json.load(f)
@@ -100,15 +212,8 @@ def main_cnn_module_run():
         log.error(f"Error leyendo archivos de entrada: {e}")
         return
         
-    # 3. Procesamiento (Consolidación)
-    consolidated_results = []
-    for segment in segments:
-        consolidated_data = consolidate_emotions_by_segment(
-            timeseries_data_list, 
-            segment['start_time'], 
-            segment['end_time']
-        )
-        consolidated_results.append(consolidated_data)
+    # 3. Procesamiento (Consolidación de todos los segmentos en una pasada)
+    consolidated_results = consolidate_segments(timeseries, segments)
     
     # 4. Generación de Salida
     output_data = {
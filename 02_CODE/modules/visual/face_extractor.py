@@ -1,49 +1,292 @@
 import os
-import cv2
-import pandas as pd
-from deepface import DeepFace
+import queue
+import threading
+import time
 from utils.logger import get_logger
 from utils.helpers import validate_input_file, create_output_directory
+from utils.face_series import write_face_series, FORMAT_CSV
+from modules.visual.frame_sampler import iter_sampled_frames
+from modules.visual.adaptive_sampler import (
+    FrameReader, adaptive_sample, budget_for, coarse_step_for, frame_signature,
+    DEFAULT_BUDGET_PER_MIN, DEFAULT_COARSE_STEP, DEFAULT_MIN_STEP
+)
+from modules.visual.face_tracker import FaceTracker
+from modules.visual.emotion_batch import (
+    detect_face, predict_emotions, labels_from_predictions, rows_from_predictions, warmup_models
+)
 
 log = get_logger("Modulo_DeepFace")
 
-def extract_faces_from_video(video_path, csv_path, sample_rate=30):
-    if os.path.exists(csv_path):
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_NUM_WORKERS = 1
+# Frames decodificados que pueden esperar en la cola (backpressure del decodificador)
+DEFAULT_QUEUE_SIZE = 64
+# Identificador del modelo para la llave de caché (detector + clasificador)
+MODEL_ID = "deepface-emotion|opencv|640x480"
+
+SAMPLING_FIXED = "fixed"
+SAMPLING_ADAPTIVE = "adaptive"
+
+_END_OF_STREAM = None
+
+def extract_faces_from_video(video_path, csv_path, sample_rate=30, strategy="auto",
+                             batch_size=DEFAULT_BATCH_SIZE, num_workers=DEFAULT_NUM_WORKERS,
+                             queue_size=DEFAULT_QUEUE_SIZE, stats=None, cancel_event=None, cache=None, spans=None,
+                             sampling=SAMPLING_FIXED, budget_per_min=DEFAULT_BUDGET_PER_MIN, tracking=False):
+    """
+    Serie temporal de emociones faciales del video en `csv_path` (`.csv`, o `.npy`
+    columnar según la extensión; ver utils.face_series). Con `spans`
+    (regiones de voz del VAD) solo se analizan los frames dentro de esos tramos.
+    `sampling="adaptive"` reemplaza el paso fijo `sample_rate` por el muestreo
+    adaptativo (grueso + bisección en los cambios) con tope `budget_per_min`.
+    Con `tracking` el rostro se sigue entre frames y solo se vuelve a detectar
+    cuando el seguimiento pierde confianza.
+    """
+    key = None
+    if cache is not None:
+        # Caché por contenido: bytes del video + parámetros de muestreo (+ tramos) + modelo
+        if not validate_input_file(video_path): return False
+        params = {"sample_rate": sample_rate}
+        if sampling != SAMPLING_FIXED:
+            params.update({"sampling": sampling, "budget_per_min": budget_per_min,
+                           "coarse_step": DEFAULT_COARSE_STEP, "min_step": DEFAULT_MIN_STEP})
+        if spans is not None:
+            params["spans"] = spans
+        if tracking:
+            params["tracking"] = True
+        # Las series guardan el vector completo de probabilidades (prob_<emoción>)
+        params["probabilities"] = True
+        series_format = os.path.splitext(csv_path)[1].lstrip(".")
+        if series_format != FORMAT_CSV:
+            params["format"] = series_format
+        key = cache.make_key("faces", [video_path], params, MODEL_ID)
+        if cache.get(key, csv_path):
+            if stats is not None:
+                stats["cached"] = True
+            return True
+    elif os.path.exists(csv_path):
         log.info(f"Serie temporal encontrada: {os.path.basename(csv_path)}. Saltando.")
         return True
 
     if not validate_input_file(video_path): return False
     create_output_directory(os.path.dirname(csv_path))
 
-    log.info("Iniciando análisis facial frame a frame...")
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    # Los modelos solo se cargan si la etapa no está en caché
+    warmup_models()
+    start = time.perf_counter()
+    # cancel_event lo activa el orquestador si la rama hermana falla
+    cancel_event = cancel_event if cancel_event is not None else threading.Event()
+    timing = {"frames": 0, "decode_sec": 0.0, "infer_sec": 0.0}
+    errors = []
+    trackers = []
 
-    frame_count = 0
-    data = []  
-    
-    while True:
-        # En lugar de leer cada frame, saltamos directamente al que nos interesa
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count) 
-        ret, frame = cap.read()
-        if not ret: break
+    def make_locator():
+        """Función frame -> rostro de cada worker: detector directo o un seguidor propio."""
+        if not tracking:
+            return detect_face
+        tracker = FaceTracker()
+        trackers.append(tracker)
+        return tracker.locate
 
-        try:
+    if sampling == SAMPLING_ADAPTIVE:
+        data = _extract_adaptive(video_path, spans, batch_size, budget_per_min, cancel_event, timing, errors,
+                                 make_locator)
+    else:
+        data = _extract_fixed(video_path, sample_rate, strategy, spans, batch_size, num_workers, queue_size,
+                              cancel_event, timing, errors, make_locator)
+
+    if errors:
+        log.error(f"Fallo en la decodificación del video: {errors[0]}")
+        return False
+    if cancel_event.is_set():
+        log.warning("Análisis facial cancelado. No se escribe la serie temporal.")
+        return False
+
+    # Los workers terminan en cualquier orden: se restaura el orden temporal
+    data.sort(key=lambda row: row["timestamp_sec"])
+    # Escritura atómica: temporal + renombrado
+    base, ext = os.path.splitext(csv_path)
+    tmp_path = base + ".partial" + ext
+    write_face_series(data, tmp_path)
+    os.replace(tmp_path, csv_path)
+    if key is not None:
+        cache.put(key, csv_path, "faces")
+
+    elapsed = time.perf_counter() - start
+    frames_read = timing["frames"]
+    fps = frames_read / elapsed if elapsed > 0 else 0.0
+    log.info(f"Rendimiento visual: {frames_read} frames en {elapsed:.2f}s ({fps:.2f} frames/s). "
+             f"Decodificación: {timing['decode_sec']:.2f}s, Inferencia: {timing['infer_sec']:.2f}s.")
+    tracking_stats = {name: sum(t.stats[name] for t in trackers) for name in ("detections", "tracked", "recovered")}
+    if trackers:
+        log.info(f"Seguimiento de rostro: {tracking_stats['detections']} detecciones, "
+                 f"{tracking_stats['tracked']} frames seguidos sin detector, "
+                 f"{tracking_stats['recovered']} recuperados tras fallar el detector.")
+    if stats is not None:
+        stats.update({"frames": frames_read, "faces": len(data), "seconds": elapsed, "frames_per_sec": fps,
+                      "decode_sec": timing["decode_sec"], "infer_sec": timing["infer_sec"]})
+        if trackers:
+            stats.update(tracking_stats)
+    log.info(f"Análisis facial completado. Serie en: {csv_path}")
+    return True
+
+def _extract_fixed(video_path, sample_rate, strategy, spans, batch_size, num_workers, queue_size, cancel_event,
+                   timing, errors, make_locator):
+    """Muestreo fijo cada `sample_rate` frames con productor/consumidor."""
+    log.info(f"Iniciando análisis facial (batch_size={batch_size}, workers={num_workers}, cola={queue_size})...")
+    # Productor/consumidor: un hilo decodifica mientras los workers infieren
+    frames_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    results_lock = threading.Lock()
+    data = []
+
+    decoder = threading.Thread(
+        target=_decode_frames,
+        args=(video_path, sample_rate, strategy, spans, frames_queue, stop_event, cancel_event, num_workers, timing,
+              errors),
+        name="face-decoder", daemon=True
+    )
+    workers = [
+        threading.Thread(
+            target=_infer_frames,
+            args=(frames_queue, stop_event, cancel_event, batch_size, data, results_lock, timing, make_locator()),
+            name=f"face-worker-{i}", daemon=True
+        )
+        for i in range(num_workers)
+    ]
+    decoder.start()
+    for worker in workers:
+        worker.start()
+    decoder.join()
+    for worker in workers:
+        worker.join()
+    return data
+
+def _extract_adaptive(video_path, spans, batch_size, budget_per_min, cancel_event, timing, errors, make_locator):
+    """
+    Muestreo adaptativo: pasada gruesa y bisección donde cambia la emoción o la
+    escena, con tope de frames por minuto. Las rondas se clasifican por lotes.
+    """
+    import cv2
+    locate = make_locator()
+
+    def classify(frames):
+        tick = time.perf_counter()
+        results = [None] * len(frames)
+        found = []  # (posición, rostro)
+        for i, frame in enumerate(frames):
+            try:
+                face = locate(cv2.resize(frame, (640, 480)))
+                if face is not None:
+                    found.append((i, face))
+            except Exception as e:
+                log.warning(f"Frame no procesable: {e}")
+        for start in range(0, len(found), batch_size):
+            chunk = found[start:start + batch_size]
+            try:
+                probabilities = predict_emotions([face for _, face in chunk])
+            except Exception as e:
+                log.warning(f"Lote de rostros no procesable: {e}")
+                continue
+            for (i, _), probs, (label, confidence) in zip(chunk, probabilities,
+                                                          labels_from_predictions(probabilities)):
+                results[i] = (label, confidence, probs)
+        timing["infer_sec"] += time.perf_counter() - tick
+        return results
+
+    try:
+        with FrameReader(video_path) as reader:
+            def read_frames(indices):
+                tick = time.perf_counter()
+                frames = reader.read(indices)
+                timing["decode_sec"] += time.perf_counter() - tick
+                timing["frames"] += len(frames)
+                return frames
+
+            max_samples = budget_for(reader.n_frames, reader.fps, budget_per_min)
+            coarse_step = coarse_step_for(reader.n_frames, max_samples)
+            keep = None
+            if spans is not None:
+                bounds = [(start * reader.fps, end * reader.fps) for start, end in spans]
+                keep = lambda idx: any(lo <= idx <= hi for lo, hi in bounds)
+            log.info(f"Iniciando análisis facial adaptativo (paso grueso={coarse_step}, "
+                     f"mínimo={DEFAULT_MIN_STEP}, tope={max_samples} frames)...")
+            samples, info = adaptive_sample(reader.n_frames, read_frames, classify, frame_signature,
+                                            coarse_step=coarse_step, max_samples=max_samples,
+                                            cancel_event=cancel_event, keep=keep)
+            fps = reader.fps
+    except Exception as e:
+        errors.append(e)
+        return []
+
+    log.info(f"Muestreo adaptativo: {info['coarse']} frames gruesos + {info['refined']} refinados "
+             f"en {info['rounds']} rondas.")
+    return rows_from_predictions([round(idx / fps, 2) for idx, _, _, _ in samples],
+                                 [probs for _, _, _, probs in samples])
+
+def _decode_frames(video_path, sample_rate, strategy, spans, frames_queue, stop_event, cancel_event, num_workers, timing,
+                   errors):
+    """Productor: decodifica y redimensiona frames; put() bloquea si la cola está llena."""
+    import cv2
+    try:
+        frames = iter_sampled_frames(video_path, sample_rate, strategy, spans=spans)
+        while not (stop_event.is_set() or cancel_event.is_set()):
+            tick = time.perf_counter()
+            item = next(frames, _END_OF_STREAM)
+            if item is _END_OF_STREAM:
+                break
+            frame_count, timestamp, frame = item
             small_frame = cv2.resize(frame, (640, 480))
-            result = DeepFace.analyze(small_frame, actions=['emotion'], enforce_detection=False, detector_backend='opencv', silent=True)
-            if result:
-                res = result[0]
-                data.append({
-                    "timestamp_sec": round(frame_count / fps, 2),
-                    "emotion": res['dominant_emotion'],
-                    "confidence": res['emotion'][res['dominant_emotion']]
-            })
+            timing["decode_sec"] += time.perf_counter() - tick
+            timing["frames"] += 1
+            frames_queue.put((frame_count, timestamp, small_frame))
+    except Exception as e:
+        errors.append(e)
+        stop_event.set()
+    finally:
+        # Una marca de fin por worker para que todos terminen
+        for _ in range(num_workers):
+            frames_queue.put(_END_OF_STREAM)
+
+def _infer_frames(frames_queue, stop_event, cancel_event, batch_size, data, results_lock, timing, locate=detect_face):
+    """Consumidor: detecta el rostro de cada frame y clasifica los recortes por lotes."""
+    pending = []  # (frame_count, timestamp, rostro) a la espera de completar el lote
+    while True:
+        item = frames_queue.get()
+        if item is _END_OF_STREAM:
+            break
+        if stop_event.is_set() or cancel_event.is_set():
+            continue
+        frame_count, timestamp, small_frame = item
+        tick = time.perf_counter()
+        try:
+            face = locate(small_frame)
+            if face is not None:
+                pending.append((frame_count, timestamp, face))
         except Exception as e:
             log.warning(f"Frame {frame_count} no procesable: {e}")
 
-        frame_count += sample_rate
-    
-    cap.release()
-    pd.DataFrame(data).to_csv(csv_path, index=False)
-    log.info(f"Análisis facial completado. CSV en: {csv_path}")
-    return True
\ No newline at end of file
+        if len(pending) >= batch_size:
+            rows = _flush_batch(pending)
+            pending = []
+            with results_lock:
+                data.extend(rows)
+        with results_lock:
+            timing["infer_sec"] += time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    rows = _flush_batch(pending)
+    with results_lock:
+        data.extend(rows)
+        timing["infer_sec"] += time.perf_counter() - tick
+
+def _flush_batch(pending):
+    """Clasifica en una sola pasada los rostros acumulados y retorna sus filas."""
+    if not pending:
+        return []
+    try:
+        probabilities = predict_emotions([face for _, _, face in pending])
+    except Exception as e:
+        log.warning(f"Lote de frames {pending[0][0]}-{pending[-1][0]} no procesable: {e}")
+        return []
+    return rows_from_predictions([timestamp for _, timestamp, _ in pending], probabilities)
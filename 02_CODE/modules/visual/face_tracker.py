@@ -0,0 +1,105 @@
+import numpy as np
+from utils.logger import get_logger
+
+log = get_logger("Modulo_Seguimiento_Rostro")
+
+# Correlación normalizada mínima para aceptar la caja seguida sin volver a detectar
+MATCH_THRESHOLD = 0.6
+# La búsqueda se limita a la caja anterior agrandada en esta fracción por lado
+SEARCH_MARGIN = 0.5
+# Se vuelve a detectar cada tantos frames seguidos para corregir la deriva
+REDETECT_EVERY = 15
+
+
+class FaceTracker:
+    """
+    Seguimiento del rostro entre frames muestreados: detecta una vez, sigue la caja
+    con template matching (cv2.matchTemplate en gris, solo cerca de la caja anterior)
+    y vuelve a detectar cuando la correlación cae bajo `match_threshold` o cada
+    `redetect_every` frames. El recorte seguido va directo al clasificador.
+
+    `detect(frame)` retorna (rostro_preparado, caja | None) y `prepare(recorte_bgr_0_1)`
+    la entrada del modelo; por defecto son los de emotion_batch (DeepFace).
+    """
+
+    def __init__(self, detect=None, prepare=None, match_threshold=MATCH_THRESHOLD,
+                 search_margin=SEARCH_MARGIN, redetect_every=REDETECT_EVERY):
+        if detect is None or prepare is None:
+            from modules.visual.emotion_batch import detect_face_with_box, prepare_face
+            detect = detect or detect_face_with_box
+            prepare = prepare or prepare_face
+        self.detect = detect
+        self.prepare = prepare
+        self.match_threshold = match_threshold
+        self.search_margin = search_margin
+        self.redetect_every = redetect_every
+        self.box = None
+        self.template = None
+        self.since_detection = 0
+        self.stats = {"detections": 0, "tracked": 0, "recovered": 0}
+
+    def locate(self, frame_bgr):
+        """Rostro del frame listo para el modelo de emociones, o None."""
+        import cv2
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+
+        match_box, score = self._match(gray) if self.template is not None else (None, 0.0)
+        tracked = match_box is not None and score >= self.match_threshold
+        if tracked and self.since_detection < self.redetect_every:
+            self.stats["tracked"] += 1
+            return self._follow(frame_bgr, gray, match_box)
+
+        self.stats["detections"] += 1
+        try:
+            face, box = self.detect(frame_bgr)
+        except Exception as e:
+            if not tracked:
+                raise
+            log.debug(f"Detección fallida, se conserva el seguimiento: {e}")
+            face, box = None, None
+        if box is not None:
+            self._anchor(gray, box)
+            return face
+        if tracked:
+            # El detector no encontró el rostro pero el seguimiento sigue siendo confiable
+            self.stats["recovered"] += 1
+            return self._follow(frame_bgr, gray, match_box)
+        # Sin rostro: se pierde el seguimiento y se usa lo que devolvió el detector
+        self.box, self.template = None, None
+        return face
+
+    def _follow(self, frame_bgr, gray, box):
+        x, y, w, h = box
+        self.box = box
+        self.since_detection += 1
+        crop = frame_bgr[y:y + h, x:x + w].astype(np.float32) / 255.0
+        return self.prepare(crop)
+
+    def _anchor(self, gray, box):
+        x, y, w, h = self._clip(box, gray.shape)
+        if w < 2 or h < 2:
+            self.box, self.template = None, None
+            return
+        self.box = (x, y, w, h)
+        self.template = gray[y:y + h, x:x + w].copy()
+        self.since_detection = 0
+
+    def _match(self, gray):
+        """Mejor posición de la plantilla cerca de la caja anterior: (caja, correlación)."""
+        import cv2
+        x, y, w, h = self.box
+        mx, my = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(gray.shape[1], x + w + mx), min(gray.shape[0], y + h + my)
+        region = gray[y0:y1, x0:x1]
+        if region.shape[0] < h or region.shape[1] < w:
+            return None, 0.0
+        scores = cv2.matchTemplate(region, self.template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (bx, by) = cv2.minMaxLoc(scores)
+        return (x0 + bx, y0 + by, w, h), float(best)
+
+    @staticmethod
+    def _clip(box, shape):
+        x, y, w, h = box
+        x, y = max(0, x), max(0, y)
+        return x, y, min(w, shape[1] - x), min(h, shape[0] - y)
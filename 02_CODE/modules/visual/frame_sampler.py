@@ -0,0 +1,137 @@
+from utils.logger import get_logger
+
+log = get_logger("Modulo_Muestreo_Frames")
+
+# GOP por defecto de x264 (keyint=250) cuando no se puede medir el video
+DEFAULT_GOP_SIZE = 250
+# Frames que se inspeccionan con ffprobe para estimar el GOP
+GOP_PROBE_FRAMES = 300
+# Un seek solo compensa si salta al menos este número de GOPs completos
+SEEK_GOP_FACTOR = 2
+
+STRATEGY_SEQUENTIAL = "sequential"
+STRATEGY_SEEK = "seek"
+
+
+def estimate_gop_size(video_path, probe_frames=GOP_PROBE_FRAMES):
+    """
+    Estima la distancia media entre keyframes (GOP) leyendo las cabeceras de los
+    primeros frames con ffprobe. Si ffprobe no está disponible retorna DEFAULT_GOP_SIZE.
+    """
+    try:
+        import ffmpeg
+        info = ffmpeg.probe(video_path, select_streams="v:0", show_entries="frame=key_frame",
+                            read_intervals=f"%+#{probe_frames}")
+    except Exception as e:
+        log.warning(f"No se pudo estimar el GOP ({e}). Usando {DEFAULT_GOP_SIZE}.")
+        return DEFAULT_GOP_SIZE
+
+    frames = info.get("frames", [])
+    keyframes = [i for i, fr in enumerate(frames) if int(fr.get("key_frame", 0)) == 1]
+    if len(keyframes) < 2:
+        # Un solo keyframe en la ventana: el GOP es al menos del tamaño inspeccionado
+        return max(len(frames), 1) if frames else DEFAULT_GOP_SIZE
+
+    distances = [b - a for a, b in zip(keyframes, keyframes[1:])]
+    return max(1, round(sum(distances) / len(distances)))
+
+
+def choose_strategy(sample_rate, gop_size):
+    """
+    Decide cómo llegar al siguiente frame muestreado:
+    - 'seek': cap.set() salta al keyframe y decodifica hasta el objetivo. Solo gana
+      cuando el salto supera varios GOPs, porque cada seek vuelve a decodificar el GOP.
+    - 'sequential': grab() decodifica hacia adelante sin convertir a BGR los frames
+      descartados; retrieve() solo se llama en los frames muestreados.
+    """
+    if sample_rate >= SEEK_GOP_FACTOR * max(gop_size, 1):
+        return STRATEGY_SEEK
+    return STRATEGY_SEQUENTIAL
+
+
+def iter_sampled_frames(video_path, sample_rate=30, strategy="auto", gop_size=None, spans=None):
+    """
+    Generador de frames muestreados cada `sample_rate` frames.
+    Produce tuplas (frame_idx, timestamp_sec, frame_bgr) en orden temporal.
+    Con `spans` [(inicio_sec, fin_sec), ...] (p. ej. regiones de voz del VAD) solo
+    se entregan los frames muestreados que caen dentro de algún tramo.
+    """
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        log.error(f"No se pudo abrir el video con OpenCV: {video_path}")
+        return
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if strategy == "auto":
+        if gop_size is None:
+            gop_size = estimate_gop_size(video_path)
+        strategy = choose_strategy(sample_rate, gop_size)
+    log.info(f"Muestreo de frames: estrategia '{strategy}' (sample_rate={sample_rate}, GOP={gop_size}).")
+
+    keep = _span_filter(spans, fps) if spans is not None else None
+    try:
+        if strategy == STRATEGY_SEEK:
+            frames = _iter_seek(cap, sample_rate, keep)
+        else:
+            frames = _iter_sequential(cap, sample_rate, keep)
+        for frame_idx, frame in frames:
+            yield frame_idx, round(frame_idx / fps, 2), frame
+    finally:
+        cap.release()
+
+
+def _span_filter(spans, fps):
+    """
+    Predicado frame_idx -> bool para índices crecientes: True si el frame cae en
+    algún tramo. Avanza un puntero sobre los tramos ordenados (O(1) amortizado).
+    Retorna None cuando ya pasaron todos los tramos (no hace falta seguir leyendo).
+    """
+    bounds = sorted((start * fps, end * fps) for start, end in spans)
+    position = 0
+
+    def keep(frame_idx):
+        nonlocal position
+        while position < len(bounds) and frame_idx > bounds[position][1]:
+            position += 1
+        if position == len(bounds):
+            return None
+        return frame_idx >= bounds[position][0]
+
+    return keep
+
+
+def _iter_sequential(cap, sample_rate, keep=None):
+    """Decodifica una sola vez hacia adelante; solo convierte los frames muestreados."""
+    frame_idx = 0
+    while cap.grab():
+        if frame_idx % sample_rate == 0:
+            wanted = True if keep is None else keep(frame_idx)
+            if wanted is None:
+                break
+            if wanted:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                yield frame_idx, frame
+        frame_idx += 1
+
+
+def _iter_seek(cap, sample_rate, keep=None):
+    """Salta directamente a cada frame muestreado (comportamiento original)."""
+    import cv2
+    frame_idx = 0
+    while True:
+        wanted = True if keep is None else keep(frame_idx)
+        if wanted is None:
+            break
+        if not wanted:
+            # Fuera de los tramos: no se decodifica nada
+            frame_idx += sample_rate
+            continue
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame_idx, frame
+        frame_idx += sample_rate
@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import uuid
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, jsonify, request
+
+# main_pipeline configura las rutas de importación y expone run()/setup_models()
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(CURRENT_DIR)
+import main_pipeline as mp
+from utils.logger import get_logger
+
+log = get_logger("Servidor_Modelos")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+JOB_STATUSES = ("queued", "running", "done", "failed")
+# Retención de trabajos terminados (consultables en /jobs/<job_id>)
+JOB_TTL_SEC = 3600
+MAX_FINISHED_JOBS = 1000
+
+
+class DuplicateJob(RuntimeError):
+    """Ya hay un trabajo en cola o en curso que escribe las mismas salidas."""
+
+    def __init__(self, job_id):
+        super().__init__(f"El video ya se está procesando en el trabajo {job_id}.")
+        self.job_id = job_id
+
+
+class JobManager:
+    """
+    Cola de trabajos del servidor: los modelos ya están cargados en el proceso y cada
+    trabajo ejecuta main_pipeline.run() en uno de `workers` hilos. Las solicitudes que
+    exceden los workers esperan en la cola del pool.
+    Un trabajo terminado guarda la ruta de su reporte (no el payload) y se descarta
+    pasados `ttl_sec` o cuando hay más de `max_finished` terminados, así que la
+    memoria del servidor no crece con los trabajos atendidos.
+    Las salidas (audio, serie facial, reporte y sus .partial) se nombran por video, así
+    que no se aceptan dos trabajos a la vez del mismo video: `submit` lanza DuplicateJob.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, cache=None, ttl_sec=JOB_TTL_SEC, max_finished=MAX_FINISHED_JOBS):
+        self.workers = workers
+        self.cache = cache if cache is not None else mp.open_cache()
+        self.ttl_sec = ttl_sec
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._finished = OrderedDict()  # job_id -> finished_at, en orden de término
+        self._counts = dict.fromkeys(JOB_STATUSES, 0)
+        self._active = {}  # nombre de las salidas del video -> job_id en cola o en curso
+        self._lock = threading.Lock()
+
+    def submit(self, video, serial=False, streaming_asr=False, vad=False, options=None):
+        job_id = uuid.uuid4().hex[:12]
+        output_name = mp.build_paths(video)["clean_name"]
+        with self._lock:
+            self._evict()
+            if output_name in self._active:
+                raise DuplicateJob(self._active[output_name])
+            self._active[output_name] = job_id
+            self._jobs[job_id] = {"job_id": job_id, "video": video, "status": "queued",
+                                  "submitted_at": time.time(), "json_path": None, "error": None}
+            self._counts["queued"] += 1
+        future = self._pool.submit(self._run_job, job_id, video, serial, streaming_asr, vad, options)
+        return job_id, future
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def counts(self):
+        """Trabajos por estado (contadores incrementales; los descartados no cuentan)."""
+        with self._lock:
+            self._evict()
+            return dict(self._counts)
+
+    def _run_job(self, job_id, video, serial, streaming_asr, vad, options):
+        self._update(job_id, status="running", started_at=time.time())
+        try:
+            # Con varios workers la memoria del proceso es la de todos los trabajos en curso
+            report = mp.run(video, serial=serial, streaming_asr=streaming_asr, cache=self.cache, vad=vad,
+                            options=options, track_rss=self.workers <= 1)
+        except Exception as e:
+            log.error(f"Trabajo {job_id} falló: {e}")
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            return None
+        if report is None:
+            self._update(job_id, status="failed", error="El pipeline no generó reporte (ver log).",
+                         finished_at=time.time())
+        else:
+            self._update(job_id, status="done", json_path=mp.build_paths(video, options)["json_out"],
+                         finished_at=time.time())
+        return report
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            if "status" in fields:
+                self._counts[job["status"]] -= 1
+                self._counts[fields["status"]] += 1
+            job.update(fields)
+            if "finished_at" in fields:
+                self._active.pop(mp.build_paths(job["video"])["clean_name"], None)
+                self._finished[job_id] = fields["finished_at"]
+                self._evict()
+
+    def _evict(self):
+        """Descarta los trabajos terminados más antiguos (vencidos o sobre el tope)."""
+        deadline = time.time() - self.ttl_sec
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at >= deadline and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[job_id]
+            self._counts[self._jobs.pop(job_id)["status"]] -= 1
+
+
+def create_app(workers=DEFAULT_WORKERS):
+    """Crea la app Flask y carga los modelos una sola vez (compatible con gunicorn)."""
+    log.info("Cargando modelos residentes (Whisper, RoBERTuito, DeepFace)...")
+    mp.setup_models()
+    manager = JobManager(workers=workers)
+    app = Flask(__name__)
+
+    def job_args():
+        body = request.get_json(silent=True) or {}
+        video = body.get("video")
+        if not video:
+            return None, (jsonify({"error": "Falta el campo 'video'."}), 400)
+        try:
+            # Mismas opciones por video que la CLI (p. ej. el muestreo facial)
+            options = mp.pipeline_options(body.get("options"))
+        except (ValueError, TypeError, AttributeError) as e:
+            return None, (jsonify({"error": f"Opciones inválidas: {e}"}), 400)
+        return (video, bool(body.get("serial", False)), bool(body.get("streaming_asr", False)),
+                bool(body.get("vad", False)), options), None
+
+    @app.get("/health")
+    def health():
+        return jsonify({"status": "ok", "workers": manager.workers, "jobs": manager.counts()})
+
+    @app.post("/jobs")
+    def submit_job():
+        args, error = job_args()
+        if error:
+            return error
+        try:
+            job_id, _ = manager.submit(*args)
+        except DuplicateJob as e:
+            return jsonify({"error": str(e), "job_id": e.job_id}), 409
+        return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+    @app.get("/jobs/<job_id>")
+    def job_status(job_id):
+        job = manager.get(job_id)
+        if job is None:
+            return jsonify({"error": "Trabajo no encontrado."}), 404
+        return jsonify(job)
+
+    @app.post("/analyze")
+    def analyze():
+        """Síncrono: espera el trabajo y devuelve el payload de _FINAL.json."""
+        args, error = job_args()
+        if error:
+            return error
+        try:
+            job_id, future = manager.submit(*args)
+        except DuplicateJob as e:
+            return jsonify({"error": str(e), "job_id": e.job_id}), 409
+        report = future.result()
+        if report is None:
+            return jsonify(manager.get(job_id)), 500
+        return jsonify(report)
+
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servidor local con los modelos del pipeline residentes en memoria.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Trabajos que se procesan a la vez; el resto espera en cola.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    create_app(workers=args.workers).run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,147 @@
+import unittest
+import sys
+import os
+import wave
+import tempfile
+import shutil
+import threading
+from concurrent.futures import Future
+from unittest import mock
+import numpy as np
+
+# --- CONFIGURACIÓN DE RUTAS ---
+# Agregamos la ruta 02_CODE al sistema para poder importar los módulos
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from modules.audio_text.audio_windows import iter_audio_windows, iter_speech_windows, merge_window_chunks
+from modules.audio_text.vad import detect_speech_regions, regions_from_mask
+
+class TestAudioTextModule(unittest.TestCase):
+
+    def setUp(self):
+        print("\n[TEST] Iniciando prueba de Módulo Audio/Texto...")
+        # WAV sintético de 70 s a 100 Hz (suficiente para probar el ventaneo)
+        self.sampling_rate = 100
+        fd, self.wav_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        samples = (np.arange(70 * self.sampling_rate) % 100).astype(np.int16)
+        with wave.open(self.wav_path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sampling_rate)
+            wav.writeframes(samples.tobytes())
+
+    def tearDown(self):
+        os.remove(self.wav_path)
+
+    def test_overlapping_windows(self):
+        """
+        Las ventanas de 30 s con 10 s de solapamiento avanzan de 20 en 20 s
+        y la última marca next_offset como None.
+        """
+        windows = list(iter_audio_windows(self.wav_path, window_sec=30, overlap_sec=10))
+        offsets = [w[0] for w in windows]
+        self.assertEqual(offsets, [0.0, 20.0, 40.0])
+        self.assertEqual(windows[-1][3], None)
+        self.assertEqual(len(windows[0][1]), 30 * self.sampling_rate)
+
+    def test_merge_skips_overlap_duplicates(self):
+        """
+        Un fragmento cortado por el borde se deja a la siguiente ventana y
+        el duplicado del solapamiento no se emite dos veces.
+        """
+        first = [
+            {"timestamp": (0.0, 12.0), "text": "Hola"},
+            {"timestamp": (12.0, 18.0), "text": "¿Cómo estás?"},
+            {"timestamp": (22.0, None), "text": "Bien, gra"},
+        ]
+        merged, until = merge_window_chunks(first, 0.0, 30.0, 20.0, 0.0)
+        self.assertEqual([c["text"] for c in merged], ["Hola", "¿Cómo estás?"])
+        self.assertEqual(until, 22.0)
+
+        second = [
+            {"timestamp": (0.0, 1.5), "text": "tás?"},
+            {"timestamp": (2.0, 5.0), "text": "Bien, gracias."},
+        ]
+        merged, until = merge_window_chunks(second, 20.0, 50.0, None, until)
+        self.assertEqual(merged, [{"timestamp": (22.0, 25.0), "text": "Bien, gracias."}])
+
+    def test_vad_detects_speech_regions(self):
+        """
+        El VAD por energía encuentra los tramos con señal sobre un fondo de ruido
+        leve, con margen alrededor y en la línea de tiempo original.
+        """
+        sampling_rate = 16000
+        rng = np.random.default_rng(0)
+        audio = rng.normal(0, 0.001, 12 * sampling_rate)
+        t = np.arange(sampling_rate * 2) / sampling_rate
+        for start in (2, 7):  # "voz" en [2, 4) y [7, 9)
+            audio[start * sampling_rate:(start + 2) * sampling_rate] += 0.3 * np.sin(2 * np.pi * 220 * t)
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            with wave.open(path, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(sampling_rate)
+                wav.writeframes((audio * 32767).astype(np.int16).tobytes())
+            regions = detect_speech_regions(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(len(regions), 2)
+        for (start, end), expected in zip(regions, (2.0, 7.0)):
+            self.assertAlmostEqual(start, expected - 0.2, delta=0.05)
+            self.assertAlmostEqual(end, expected + 2.2, delta=0.05)
+
+    def test_vad_merges_short_pauses(self):
+        """
+        Las pausas cortas no cortan la región y los golpes aislados se descartan.
+        """
+        mask = np.zeros(200, dtype=bool)  # tramas de 0.03 s
+        mask[10:40] = True   # 0.3 - 1.2 s
+        mask[50:90] = True   # pausa de 0.3 s -> misma región
+        mask[150:152] = True  # golpe de 0.06 s -> descartado
+        self.assertEqual(regions_from_mask(mask, 0.03, pad_sec=0.0), [(0.3, 2.7)])
+
+    def test_speech_windows_stay_inside_regions(self):
+        """
+        Con regiones de voz solo se leen esas muestras y los offsets son absolutos.
+        """
+        windows = list(iter_speech_windows(self.wav_path, [(5.0, 12.0), (35.0, 75.0)],
+                                           window_sec=30, overlap_sec=10))
+        self.assertEqual([w[0] for w in windows], [5.0, 35.0, 55.0])
+        self.assertEqual(len(windows[0][1]), 7 * self.sampling_rate)
+        self.assertEqual([w[3] for w in windows], [None, 55.0, None])
+        # El audio dura 70 s: la última ventana se recorta al final del archivo
+        self.assertEqual(len(windows[2][1]), 15 * self.sampling_rate)
+
+    def test_vad_failure_stops_visual_branch(self):
+        """
+        Si el VAD falla, la rama visual (que espera sus regiones) no analiza el video
+        completo y el pipeline propaga el error del VAD, en modo concurrente y serial.
+        """
+        import main_pipeline as mp
+        tmp_dir = tempfile.mkdtemp()
+        paths = {"video_path": os.path.join(tmp_dir, "video.mp4"), "audio_out": os.path.join(tmp_dir, "audio.wav"),
+                 "faces_out": os.path.join(tmp_dir, "faces.csv")}
+        face_calls = []
+        try:
+            with mock.patch.object(mp.ts, "extract_audio", lambda *a, **k: True), \
+                    mock.patch.object(mp.vad, "detect_speech_regions", side_effect=RuntimeError("VAD roto")), \
+                    mock.patch.object(mp.fe, "extract_faces_from_video", lambda *a, **k: face_calls.append(a)):
+                profiler = mp.StageProfiler(track_rss=False)
+                cancel_event, speech_regions = threading.Event(), Future()
+                with self.assertRaisesRegex(RuntimeError, "VAD roto"):
+                    mp.run_audio_branch(paths, profiler, cancel_event, speech_regions=speech_regions)
+                # Aunque la cancelación todavía no llegue, la rama visual no sigue sin regiones
+                mp.run_visual_branch(paths, profiler, cancel_event, speech_regions=speech_regions)
+                for serial in (False, True):
+                    with self.assertRaisesRegex(RuntimeError, "VAD roto"):
+                        mp.run_branches(paths, profiler, serial=serial, speech_regions=Future())
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(face_calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,321 @@
+import unittest
+import sys
+import os
+import tempfile
+import pandas as pd
+import numpy as np
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import zlib
+import base64
+
+# --- CONFIGURACIÓN DE RUTAS ---
+# Agregamos la ruta 02_CODE al sistema para poder importar los módulos
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from modules.integration.synchronizer import (
+    synchronize_frames, synchronize_data, synchronize_codes, iter_synchronize_codes, StreamingSynchronizer, calculate_temporal_face_weighted, calculate_congruence_score, CONGRUENCE_MATRIX
+)
+from modules.integration.validator import overlap_join, run_manual_validation
+from modules.integration.visualizer import (
+    downsample_steps, downsample_bars, submit_comparison_plot, generate_comparison_plot
+)
+from modules.integration.dashboard import step_integrals, build_dashboard_data, render_html
+from utils.emotion_codes import EMOTIONS, encode, encode_series, decode_series
+from utils.report_writer import rle_event, expand_event
+
+class TestFusionModule(unittest.TestCase):
+
+    def setUp(self):
+        print("\n[TEST] Iniciando prueba de Fusión Multimodal...")
+        # Serie facial dummy (un frame cada 0.5 s)
+        self.df_faces = pd.DataFrame({
+            'timestamp_sec': [0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5],
+            'emotion': ['happy', 'happy', 'neutral', 'sad', 'sad', 'sad', 'angry', 'neutral'],
+            'confidence': [90.0] * 8,
+        })
+        self.segments = [
+            {'start_time': 0.0, 'end_time': 1.0, 'text': 'Hola', 'emotion': 'happy'},
+            {'start_time': 1.0, 'end_time': 2.6, 'text': 'Me fue mal', 'emotion': 'sad'},
+            {'start_time': 5.0, 'end_time': 6.0, 'text': 'Fin', 'emotion': 'neutral'},
+        ]
+
+    def test_interval_join_matches_mask(self):
+        """
+        PBI 4.1: El join por búsqueda binaria produce el mismo historial que la
+        máscara booleana original (bordes inclusivos en ambos extremos).
+        """
+        events = synchronize_frames(self.segments, self.df_faces)
+        for seg, event in zip(self.segments, events):
+            mask = (self.df_faces['timestamp_sec'] >= seg['start_time']) & (self.df_faces['timestamp_sec'] <= seg['end_time'])
+            self.assertEqual(event['emotion_facial_history'], self.df_faces.loc[mask, 'emotion'].tolist())
+        self.assertEqual(events[2]['emotion_facial_history'], [])
+
+    def test_csv_reader_matches_dataframe(self):
+        """
+        synchronize_data lee el CSV sin pandas y produce los mismos eventos que la
+        fusión sobre el DataFrame (filas desordenadas y sin timestamp incluidas).
+        """
+        df_faces = pd.concat([self.df_faces.iloc[::-1],
+                              pd.DataFrame({'timestamp_sec': [None], 'emotion': ['fear'], 'confidence': [50.0]})])
+        fd, csv_path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        try:
+            df_faces.to_csv(csv_path, index=False)
+            self.assertEqual(synchronize_data(self.segments, csv_path),
+                             synchronize_frames(self.segments, df_faces))
+        finally:
+            os.remove(csv_path)
+
+    def test_event_stream_matches_list_and_compacts_history(self):
+        """
+        PBI 4.3 (reporte evento por evento): la fusión produce los eventos uno a uno,
+        iguales a los de la lista completa, y la copia en RLE que retiene el pipeline
+        vuelve a la forma del contrato.
+        """
+        timestamps = self.df_faces['timestamp_sec'].to_numpy()
+        codes = encode_series(self.df_faces['emotion'])
+        stream = iter_synchronize_codes(self.segments, timestamps, codes)
+        first = next(stream)
+        self.assertEqual([first] + list(stream), synchronize_codes(self.segments, timestamps, codes))
+
+        compact = rle_event(first)
+        self.assertNotIn('emotion_facial_history', compact)
+        self.assertEqual(list(compact), [k.replace('emotion_facial_history', 'emotion_facial_history_rle')
+                                         for k in first])
+        restored = expand_event(compact)
+        self.assertEqual(restored, first)
+        self.assertEqual(list(restored), list(first))
+
+    def test_recurrent_states_and_score(self):
+        """
+        PBI 4.2: Los estados recurrentes y el score de congruencia siguen la lógica GRU.
+        """
+        events = synchronize_frames(self.segments, self.df_faces)
+        self.assertEqual(events[0]['emotion_facial_mode'], 'happy')
+        self.assertEqual(events[1]['emotion_facial_mode'], 'sad')
+        self.assertEqual(events[1]['congruence_score'], 1.0)
+        # Sin frames en el segmento, el rostro conserva su estado anterior
+        self.assertEqual(events[2]['emotion_facial_mode'], 'sad')
+        self.assertEqual(events[2]['congruence_score'], 0.3)
+        self.assertTrue(events[1]['is_change_point'])
+
+    def test_streaming_synchronizer_matches_batch(self):
+        """
+        El sincronizador incremental emite un evento en cuanto la serie facial cubre
+        el final del segmento, con el mismo resultado que la fusión por lotes.
+        """
+        sync = StreamingSynchronizer()
+        sync.add_segment(self.segments[0])
+        sync.add_faces(self.df_faces['timestamp_sec'][:2], self.df_faces['emotion'][:2])
+        # La serie aún no llega a 1.0 s: el primer segmento queda pendiente
+        self.assertEqual(list(sync.poll()), [])
+
+        sync.add_faces(self.df_faces['timestamp_sec'][2:], self.df_faces['emotion'][2:])
+        sync.add_segment(self.segments[1])
+        streamed = list(sync.poll())
+        self.assertEqual(len(streamed), 2)
+
+        sync.add_segment(self.segments[2])
+        streamed.extend(sync.close())
+        self.assertEqual(streamed, synchronize_frames(self.segments, self.df_faces))
+
+    def test_emotion_codes_roundtrip(self):
+        """
+        Las emociones viajan como int8 y vuelven a strings al serializar.
+        """
+        labels = ['happy', 'sad', 'neutral', 'angry']
+        codes = encode_series(labels)
+        self.assertEqual(str(codes.dtype), 'int8')
+        self.assertEqual(decode_series(codes), labels)
+        self.assertEqual(encode('joy'), encode('happy'))
+
+    def test_congruence_matrix_matches_valence_rules(self):
+        """
+        PBI 4.2: La matriz 7x7 precalculada coincide con la regla de valencia.
+        """
+        for i, emo_text in enumerate(EMOTIONS):
+            for j, emo_face in enumerate(EMOTIONS):
+                self.assertEqual(CONGRUENCE_MATRIX[i, j], calculate_congruence_score(emo_text, emo_face))
+
+    def test_weighted_face_tie_keeps_first_seen(self):
+        """
+        Pesos 1.0 + 1.75 == 1.25 + 1.5: ante un empate gana la emoción que aparece primero.
+        """
+        history = ['sad', 'fear', 'fear', 'sad']
+        self.assertEqual(calculate_temporal_face_weighted(history, 'neutral'), 'sad')
+        # El bono de inercia rompe el empate a favor del estado anterior
+        self.assertEqual(calculate_temporal_face_weighted(history, 'fear'), 'fear')
+
+    def test_soft_face_vote_uses_probabilities(self):
+        """
+        Con vectores one-hot la votación suave coincide con la dura; con probabilidades
+        reales un 'happy' dudoso pierde frente a un 'sad' seguro.
+        """
+        history = ['sad', 'fear', 'fear', 'sad']
+        one_hot = np.eye(len(EMOTIONS))[[EMOTIONS.index(e) for e in history]]
+        for prev in ('neutral', 'fear'):
+            self.assertEqual(calculate_temporal_face_weighted(history, prev, one_hot),
+                             calculate_temporal_face_weighted(history, prev))
+
+        history = ['happy', 'happy', 'sad']
+        probs = np.zeros((3, len(EMOTIONS)))
+        probs[:2, EMOTIONS.index('happy')], probs[:2, EMOTIONS.index('sad')] = 0.4, 0.35
+        probs[2, EMOTIONS.index('sad')] = 0.95
+        self.assertEqual(calculate_temporal_face_weighted(history, 'neutral'), 'happy')
+        self.assertEqual(calculate_temporal_face_weighted(history, 'neutral', probs), 'sad')
+
+    def test_plot_downsampling_keeps_changes_and_worst_score(self):
+        """
+        Dashboard rápido: la serie escalonada conserva todos sus cambios, las barras
+        agrupadas conservan la peor congruencia y el render en segundo plano escribe
+        el archivo en el formato pedido.
+        """
+        times = np.arange(10.0)
+        labels = ['happy'] * 4 + ['sad'] * 3 + ['happy'] * 3
+        self.assertEqual(downsample_steps(times, labels, 100).tolist(), [0, 4, 7])
+
+        scores = np.array([1.0, 1.0, 0.0, 1.0, 1.0, 1.0, 0.7, 1.0, 1.0, 1.0])
+        x, width, height, worst = downsample_bars(times, times + 1, scores, 2)
+        self.assertEqual(x.tolist(), [0.0, 5.0])
+        self.assertEqual(worst.tolist(), [0.0, 0.7])
+        self.assertAlmostEqual(height[0], 0.8)
+
+        events = [{'start_time_sec': t, 'end_time_sec': t + 1, 'emotion_text_nlp': l, 'emotion_facial_mode': l,
+                   'congruence_score': s, 'is_change_point': bool(i in (4, 7))}
+                  for i, (t, l, s) in enumerate(zip(times, labels, scores))]
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            out = os.path.join(tmp_dir, "dashboard.svg")
+            stats = {}
+            self.assertEqual(submit_comparison_plot(events, out, fast=True, stats=stats).result(timeout=60), out)
+            self.assertGreater(stats["seconds"], 0)
+            with open(out, encoding="utf-8") as f:
+                self.assertIn("<svg", f.read(2000))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_concurrent_plots_do_not_share_state(self):
+        """
+        Modo lote: varios videos dibujan su dashboard a la vez desde hilos distintos.
+        Cada imagen debe ser idéntica a la que sale dibujándola sola (sin figuras
+        compartidas entre hilos).
+        """
+        labels = ['happy', 'sad', 'neutral', 'angry']
+
+        def events_for(seed):
+            rng = np.random.default_rng(seed)
+            return [{'start_time_sec': float(i), 'end_time_sec': i + 1.0,
+                     'emotion_text_nlp': labels[rng.integers(4)], 'emotion_facial_mode': labels[rng.integers(4)],
+                     'congruence_score': float(rng.random()), 'is_change_point': bool(rng.random() < 0.2)}
+                    for i in range(30)]
+
+        def read(path):
+            with open(path, 'rb') as f:
+                return f.read()
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            expected = [read(generate_comparison_plot(events_for(seed), os.path.join(tmp_dir, f"ref_{seed}.png"),
+                                                      dpi=40))
+                        for seed in range(3)]
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                outputs = list(pool.map(lambda k: generate_comparison_plot(
+                    events_for(k % 3), os.path.join(tmp_dir, f"video_{k}.png"), dpi=40), range(8)))
+            for k, path in enumerate(outputs):
+                self.assertEqual(read(path), expected[k % 3])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_dashboard_levels_and_tiles(self):
+        """
+        Dashboard HTML: la integral por bins coincide con la fuerza bruta y cada nivel
+        resume la misma entrevista (frames por emoción) en tiles comprimidos.
+        """
+        rng = np.random.default_rng(0)
+        # Segmentos ordenados, sin solaparse y con silencios entre ellos
+        bounds = np.cumsum(rng.uniform(0.5, 3.0, 41))
+        starts, ends = bounds[:-1] + 0.2, bounds[1:]
+        values = rng.random((40, 2))
+        edges = np.arange(0.0, ends[-1] + 10.0, 7.0)
+        brute = np.array([[sum(v[j] * max(0.0, min(e, b) - max(s, a)) for s, e, v in zip(starts, ends, values))
+                           for j in range(2)] for a, b in zip(edges[:-1], edges[1:])])
+        np.testing.assert_allclose(step_integrals(starts, ends, values, edges), brute, atol=1e-9)
+
+        labels = ['happy'] * 70 + ['sad'] * 50
+        faces = {"timestamp_sec": np.arange(120) * 0.5, "emotion": encode_series(labels),
+                 "confidence": np.full(120, 90.0)}
+        events = [{'start_time_sec': 0.0, 'end_time_sec': 30.0, 'emotion_text_nlp': 'happy',
+                   'emotion_facial_mode': 'happy', 'congruence_score': 1.0, 'transcribed_text': 'bien </script>'},
+                  {'start_time_sec': 30.0, 'end_time_sec': 60.0, 'emotion_text_nlp': 'happy',
+                   'emotion_facial_mode': 'sad', 'congruence_score': 0.2, 'is_change_point': True}]
+        meta, tiles = build_dashboard_data({"interview_id": "INT-TEST", "events": events}, faces)
+        self.assertEqual([level["name"] for level in meta["levels"]], ["1min", "10s", "1s", "frames"])
+
+        coarse = tiles["1min-0"]
+        face = np.array(coarse["face"]).reshape(coarse["n"], len(EMOTIONS))
+        self.assertEqual(face[0, encode('happy')], 70)
+        self.assertEqual(face[0, encode('sad')], 50)
+        self.assertAlmostEqual(coarse["score"][0], 0.6)
+        self.assertEqual(coarse["changes"], [1])
+        self.assertEqual(tiles["frames-0"]["e"], encode_series(labels).tolist())
+
+        html = render_html(meta, tiles)
+        self.assertNotIn("bien </script>", html)
+        payload = html.split('id="tile-1min-0">')[1].split("</script>")[0]
+        self.assertEqual(json.loads(zlib.decompress(base64.b64decode(payload))), coarse)
+
+    def test_overlap_join_matches_brute_force(self):
+        """
+        TCI4.6: el merge join de intervalos encuentra los mismos pares (y solapamientos)
+        que comparar todos contra todos, incluso con etiquetas solapadas.
+        """
+        rng = np.random.default_rng(0)
+        starts = np.sort(rng.uniform(0, 100, 40))
+        ends = starts + rng.uniform(0.5, 8, 40)
+        l_starts = np.sort(rng.uniform(0, 100, 25))
+        l_ends = l_starts + rng.uniform(0.5, 15, 25)
+
+        ev, lab, overlap = overlap_join(starts, ends, l_starts, l_ends)
+        expected = {(i, j): min(ends[i], l_ends[j]) - max(starts[i], l_starts[j])
+                    for i in range(40) for j in range(25)
+                    if min(ends[i], l_ends[j]) - max(starts[i], l_starts[j]) > 0}
+        self.assertEqual(set(zip(ev.tolist(), lab.tolist())), set(expected))
+        for i, j, ov in zip(ev, lab, overlap):
+            self.assertAlmostEqual(ov, expected[(i, j)])
+
+    def test_manual_validation_weights_by_overlap(self):
+        """
+        TCI4.6: los ids de las etiquetas ('video_01.mp4') coinciden con el reporte y
+        segmentos con bordes corridos se validan ponderados por el tiempo solapado.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            labels = os.path.join(tmp_dir, "labels.csv")
+            with open(labels, "w", encoding="utf-8") as f:
+                f.write("video_id,start_time_sec,end_time_sec,manual_emotion_face,manual_emotion_text,manual_congruence\n"
+                        "video_01.mp4,0.0,10.0,happy,happy,1.0\n"
+                        "video_01.mp4,10.0,20.0,sad,happy,0.0\n")
+            report = os.path.join(tmp_dir, "video_01_FINAL.json")
+            events = [  # Inicio corrido 0.8 s: el validador anterior (±0.5 s) lo ignoraba
+                {"start_time_sec": 0.8, "end_time_sec": 9.0, "congruence_score": 1.0,
+                 "emotion_facial_mode": "happy", "emotion_text_nlp": "happy"},
+                {"start_time_sec": 9.0, "end_time_sec": 19.0, "congruence_score": 1.0,
+                 "emotion_facial_mode": "sad", "emotion_text_nlp": "happy"},
+            ]
+            with open(report, "w", encoding="utf-8") as f:
+                json.dump({"interview_id": "INT-VIDEO_01-1", "video_path": "C:\\data\\video_01.mp4",
+                           "events": events, "global_metrics": {}}, f)
+
+            result = run_manual_validation(report, labels)
+            self.assertEqual(result["video_id"], "video_01")
+            self.assertEqual(result["segments_validated"], 2)
+            # Correcto: 8.2 s (evento 1) + 1 s (evento 2 sobre la etiqueta 1) de 18.2 s solapados
+            self.assertAlmostEqual(result["robustness_accuracy"], 9.2 / 18.2 * 100)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
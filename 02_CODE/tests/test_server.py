@@ -0,0 +1,125 @@
+import unittest
+import sys
+import os
+import time
+import threading
+import importlib.util
+from functools import partial
+from unittest import mock
+
+# --- CONFIGURACIÓN DE RUTAS ---
+# Agregamos la ruta 02_CODE al sistema para poder importar los módulos
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+HAS_FLASK = importlib.util.find_spec("flask") is not None
+
+
+@unittest.skipUnless(HAS_FLASK, "Flask no está instalado")
+class TestModelServer(unittest.TestCase):
+    """
+    Endpoints del servidor de modelos con el cliente de pruebas de Flask. La carga
+    de modelos y main_pipeline.run() se reemplazan por versiones en memoria.
+    """
+
+    def setUp(self):
+        import server
+        import main_pipeline as mp
+        self.server, self.mp = server, mp
+        self.calls = []
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        for name, fake in (("setup_models", lambda: None), ("open_cache", lambda *a, **k: None),
+                           ("run", self.fake_run)):
+            patcher = mock.patch.object(mp, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = server.create_app(workers=2).test_client()
+
+    def fake_run(self, video, **kwargs):
+        self.calls.append((video, kwargs))
+        name = os.path.basename(video)
+        if name.startswith("lento"):
+            self.release.wait(5)
+        if name.startswith("error"):
+            raise RuntimeError("DeepFace no respondió")
+        if name.startswith("vacio"):
+            return None
+        return {"interview_id": f"INT-{name}", "global_metrics": {}, "events": []}
+
+    def wait_job(self, job_id):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            job = self.client.get(f"/jobs/{job_id}").get_json()
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(0.01)
+        self.fail(f"El trabajo {job_id} no terminó")
+
+    def test_jobs_report_status_and_report_path(self):
+        response = self.client.post("/jobs", json={"video": "video_01.mp4", "options": {"report_format": "ndjson"}})
+        self.assertEqual(response.status_code, 202)
+        job = self.wait_job(response.get_json()["job_id"])
+        self.assertEqual(job["status"], "done")
+        self.assertTrue(job["json_path"].endswith("video_01_FINAL.ndjson"))
+        # run() recibe las opciones completas (con los valores por defecto)
+        self.assertEqual(self.calls[0][1]["options"], self.mp.pipeline_options({"report_format": "ndjson"}))
+
+        self.assertEqual(self.client.get("/jobs/no-existe").status_code, 404)
+        health = self.client.get("/health").get_json()
+        self.assertEqual(health["jobs"], {"queued": 0, "running": 0, "done": 1, "failed": 0})
+
+    def test_analyze_returns_report_or_failed_job(self):
+        response = self.client.post("/analyze", json={"video": "video_01.mp4"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["interview_id"], "INT-video_01.mp4")
+
+        for video, error in (("vacio.mp4", "El pipeline no generó reporte (ver log)."),
+                             ("error.mp4", "DeepFace no respondió")):
+            response = self.client.post("/analyze", json={"video": video})
+            self.assertEqual(response.status_code, 500)
+            self.assertEqual((response.get_json()["status"], response.get_json()["error"]), ("failed", error))
+
+    def test_invalid_requests_are_rejected(self):
+        for body in ({}, {"video": ""}, {"video": "video_01.mp4", "options": {"face_sampling": "random"}},
+                     {"video": "video_01.mp4", "options": {"face_samplng": "adaptive"}},
+                     {"video": "video_01.mp4", "options": {"face_budget": "60"}},
+                     {"video": "video_01.mp4", "options": "adaptive"}):
+            for endpoint in ("/jobs", "/analyze"):
+                self.assertEqual(self.client.post(endpoint, json=body).status_code, 400, (endpoint, body))
+        self.assertEqual(self.calls, [])
+
+    def test_duplicate_in_flight_video_is_rejected(self):
+        first = self.client.post("/jobs", json={"video": "lento.mp4"}).get_json()["job_id"]
+        # Misma carpeta de salidas aunque la ruta o las opciones cambien
+        for endpoint, body in (("/jobs", {"video": "lento.mp4"}),
+                               ("/jobs", {"video": "/otra/carpeta/lento.mp4", "options": {"face_fusion": "soft"}}),
+                               ("/analyze", {"video": "lento.mp4"})):
+            response = self.client.post(endpoint, json=body)
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.get_json()["job_id"], first)
+        # Otro video no espera al primero
+        other = self.client.post("/jobs", json={"video": "video_02.mp4"})
+        self.assertEqual(self.wait_job(other.get_json()["job_id"])["status"], "done")
+
+        self.release.set()
+        self.assertEqual(self.wait_job(first)["status"], "done")
+        again = self.client.post("/jobs", json={"video": "lento.mp4"})
+        self.assertEqual(again.status_code, 202)
+        self.assertEqual(self.wait_job(again.get_json()["job_id"])["status"], "done")
+
+    def test_finished_jobs_are_evicted(self):
+        with mock.patch.object(self.server, "JobManager", partial(self.server.JobManager, max_finished=2)):
+            self.client = self.server.create_app(workers=1).test_client()
+        job_ids = []
+        for name in ("video_01.mp4", "video_02.mp4", "video_03.mp4"):
+            job_ids.append(self.client.post("/jobs", json={"video": name}).get_json()["job_id"])
+            self.wait_job(job_ids[-1])
+        # Solo se conservan los dos últimos terminados
+        self.assertEqual([self.client.get(f"/jobs/{job_id}").status_code for job_id in job_ids], [404, 200, 200])
+        self.assertEqual(self.client.get("/health").get_json()["jobs"],
+                         {"queued": 0, "running": 0, "done": 2, "failed": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
 import unittest
 import os
 import sys
+import numpy as np
+import json
+import threading
+import time
 
 # Ajustar path para importar módulos hermanos
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -9,6 +13,16 @@ from utils.logger import get_logger
 # Asegúrate de importar tus funciones reales aquí. 
 # Si aún no tienes la lógica final encapsulada, usa estas pruebas para definir cómo DEBEN ser las funciones.
 from utils.helpers import validate_input_file, get_video_properties, format_timestamp
+from utils.artifact_cache import ArtifactCache
+from utils.profiling import StageProfiler
+from utils.report_writer import ReportWriter, load_report, report_path, REPORT_FORMATS, HISTORY_RLE
+from utils.face_series import (
+    write_face_series, load_face_series, find_face_series, slice_by_time, series_to_records, convert_csv_to_npy,
+    PROB_COLUMNS
+)
+import tempfile
+import subprocess
+import shutil
 
 class TestDay2Deliverables(unittest.TestCase):
 
@@ -82,5 +96,236 @@ class TestDay2Deliverables(unittest.TestCase):
         
         self.log.info("Pruebas de Helpers (Funciones Reales): OK")
 
+    def test_artifact_cache_content_addressed(self):
+        """
+        La caché se indexa por contenido: un video regrabado con el mismo nombre
+        o un cambio de parámetros invalida el artefacto.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            cache = ArtifactCache(os.path.join(tmp_dir, "cache"))
+            video = os.path.join(tmp_dir, "video_04.mp4")
+            artifact = os.path.join(tmp_dir, "video_04_faces.csv")
+            with open(video, 'wb') as f:
+                f.write(b"grabacion original")
+            with open(artifact, 'w') as f:
+                f.write("timestamp_sec,emotion,confidence\n0.0,happy,90.0\n")
+
+            key = cache.make_key("faces", [video], {"sample_rate": 30}, "deepface")
+            cache.put(key, artifact, "faces")
+
+            restored = os.path.join(tmp_dir, "restored.csv")
+            self.assertTrue(cache.get(key, restored))
+            with open(restored) as f:
+                self.assertIn("happy", f.read())
+
+            # Otro sample_rate -> otra llave
+            self.assertNotEqual(key, cache.make_key("faces", [video], {"sample_rate": 15}, "deepface"))
+            # Video regrabado con el mismo nombre -> otra llave
+            with open(video, 'wb') as f:
+                f.write(b"grabacion nueva, otro contenido")
+            new_key = cache.make_key("faces", [video], {"sample_rate": 30}, "deepface")
+            self.assertNotEqual(key, new_key)
+            self.assertFalse(cache.get(new_key, restored))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_artifact_cache_lru_eviction(self):
+        """
+        Al superar el tamaño máximo se desaloja el artefacto usado hace más tiempo.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            cache = ArtifactCache(os.path.join(tmp_dir, "cache"), max_bytes=250)
+            keys = []
+            for i in range(3):
+                path = os.path.join(tmp_dir, f"a{i}.bin")
+                with open(path, 'wb') as f:
+                    f.write(bytes(100))
+                keys.append(f"{i:064d}")
+                if i == 2:
+                    # Se usa el primero para que el menos reciente sea el segundo
+                    cache.get(keys[0], os.path.join(tmp_dir, "out.bin"))
+                cache.put(keys[-1], path, "test")
+
+            self.assertLessEqual(cache.total_bytes(), 250)
+            self.assertTrue(cache.get(keys[0], os.path.join(tmp_dir, "out.bin")))
+            self.assertFalse(cache.get(keys[1], os.path.join(tmp_dir, "out.bin")))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_pipeline_import_is_lightweight(self):
+        """
+        Importar main_pipeline no debe cargar torch, deepface, matplotlib, cv2 ni pandas:
+        cada etapa los importa solo si se ejecuta (corridas en caché arrancan rápido).
+        """
+        code_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        heavy = ["torch", "transformers", "deepface", "tensorflow", "matplotlib", "cv2", "pandas", "ffmpeg"]
+        script = ("import sys, main_pipeline; "
+                  f"print(','.join(m for m in {heavy!r} if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", script], cwd=code_dir,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_pipeline_options_validate_values(self):
+        """
+        Las opciones por video viajan como dict (CLI, lote y servidor): se completan
+        con los valores por defecto y se rechazan llaves, valores o tipos inválidos.
+        """
+        import main_pipeline as mp
+        options = mp.pipeline_options({"face_sampling": "adaptive"}, face_budget=45)
+        self.assertEqual((options["face_sampling"], options["face_budget"]), ("adaptive", 45))
+        self.assertEqual(options["face_tracking"], mp.DEFAULT_OPTIONS["face_tracking"])
+        self.assertEqual(mp.pipeline_options(), mp.DEFAULT_OPTIONS)
+        self.assertEqual(mp.pipeline_options(plot_dpi=None)["plot_dpi"], None)
+        paths = mp.build_paths("video_01.mp4", {"series_format": "npy", "report_format": "ndjson",
+                                                "plot_format": "svg"})
+        self.assertTrue(paths["img_out"].endswith("video_01.svg"))
+        self.assertTrue(paths["faces_out"].endswith("video_01_faces.npy"))
+        self.assertTrue(paths["json_out"].endswith("video_01_FINAL.ndjson"))
+        self.assertTrue(mp.build_paths("video_01.mp4")["json_out"].endswith("video_01_FINAL.json"))
+        for bad in ({"face_samplng": "adaptive"}, {"face_sampling": "random"},
+                    {"face_budget": "60"}, {"face_budget": 0}, {"face_budget": True},
+                    {"face_tracking": "yes"}, {"series_format": "parquet"},
+                    {"face_fusion": "average"}, {"report_history": "gzip"},
+                    {"plot_format": "gif"}, {"plot_dpi": "300"}, {"plot_dpi": 0}, {"fast_plot": 1}):
+            with self.assertRaises(ValueError):
+                mp.pipeline_options(bad)
+
+    def test_face_series_npy_matches_csv(self):
+        """
+        La serie facial .npy (columnar) se abre con memory-map, se corta por tiempo
+        con búsqueda binaria y contiene lo mismo que el CSV convertido. Al buscarla
+        no se cae en silencio al otro formato.
+        """
+        rows = [{"timestamp_sec": 2.0, "emotion": "sad", "confidence": 0.7},
+                {"timestamp_sec": 0.0, "emotion": "happy", "confidence": 0.9},
+                {"timestamp_sec": 1.0, "emotion": "neutral", "confidence": 0.5}]
+        for row in rows:
+            row.update({col: 0.0 for col in PROB_COLUMNS})
+            row[f"prob_{row['emotion']}"] = row["confidence"]
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            csv_path = os.path.join(tmp_dir, "video_faces.csv")
+            npy_path = os.path.join(tmp_dir, "video_faces.npy")
+            write_face_series(rows, csv_path)
+            write_face_series(rows, npy_path)
+
+            faces = load_face_series(npy_path)
+            self.assertEqual(list(faces["timestamp_sec"]), [0.0, 1.0, 2.0])
+            # Vector completo de probabilidades en float16 (n x 7)
+            self.assertEqual(faces["probabilities"].shape, (3, len(PROB_COLUMNS)))
+            self.assertEqual(faces["probabilities"].dtype, np.float16)
+            window = slice_by_time(faces, 0.5, 2.0)
+            self.assertEqual([r["emotion"] for r in series_to_records(window)], ["neutral", "sad"])
+
+            converted = load_face_series(convert_csv_to_npy(csv_path, os.path.join(tmp_dir, "conv.npy")))
+            self.assertEqual(series_to_records(converted), series_to_records(load_face_series(csv_path)))
+            self.assertEqual(series_to_records(converted), series_to_records(faces))
+            del faces, window, converted  # libera los memory-maps antes de borrar
+
+            # Se usa el formato pedido aunque el otro sea más reciente (con aviso);
+            # el otro formato solo se acepta si se pide explícitamente
+            os.utime(npy_path, (time.time() + 5, time.time() + 5))
+            with self.assertLogs("Utils_Serie_Facial", "WARNING"):
+                self.assertEqual(find_face_series(csv_path), csv_path)
+            os.remove(csv_path)
+            self.assertIsNone(find_face_series(csv_path))
+            with self.assertLogs("Utils_Serie_Facial", "WARNING"):
+                self.assertEqual(find_face_series(csv_path, any_format=True), npy_path)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_report_writer_formats_roundtrip(self):
+        """
+        El reporte escrito evento por evento (json, compact, ndjson, con o sin RLE)
+        se lee igual que el contrato _FINAL.json; el JSON indentado coincide con json.dump.
+        """
+        header = {"interview_id": "INT-VIDEO_01-1", "video_path": "video_01.mp4"}
+        events = [
+            {"start_time_sec": 0.0, "end_time_sec": 2.0, "transcribed_text": "hola",
+             "emotion_facial_history": ["happy", "happy", "sad"], "congruence_score": 1.0},
+            {"start_time_sec": 2.0, "end_time_sec": 5.5, "transcribed_text": "",
+             "emotion_facial_history": [], "congruence_score": 0.3},
+        ]
+        metrics = {"overall_congruence_score": 0.65, "total_duration_sec": 5.5}
+        expected = {**header, "events": events, "global_metrics": metrics}
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for report_format in REPORT_FORMATS:
+                for history in ("list", HISTORY_RLE):
+                    path = report_path(os.path.join(tmp_dir, f"{report_format}_{history}_FINAL.json"), report_format)
+                    with ReportWriter(path, header, report_format, history) as writer:
+                        for event in events:
+                            writer.write_event(dict(event))
+                        self.assertAlmostEqual(writer.overall_score(), 0.65)
+                        writer.finish(metrics)
+                    self.assertEqual(load_report(path), expected, f"{report_format}/{history}")
+
+            with open(os.path.join(tmp_dir, "json_list_FINAL.json"), encoding="utf-8") as f:
+                self.assertEqual(f.read(), json.dumps(expected, indent=4, ensure_ascii=False))
+
+            # Un evento sin congruence_score no baja el promedio
+            with ReportWriter(os.path.join(tmp_dir, "unscored_FINAL.json"), header) as writer:
+                for event in events + [{"start_time_sec": 5.5, "end_time_sec": 6.0, "transcribed_text": "..."}]:
+                    writer.write_event(event)
+                self.assertAlmostEqual(writer.overall_score(), 0.65)
+                self.assertEqual(writer.end_time_sec, 6.0)
+                writer.finish(metrics)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_stage_profiler_records_stages_and_counters(self):
+        """
+        Cada etapa registra duración y memoria; los contadores se convierten en tasas
+        y el archivo de métricas (JSON) se puede leer de vuelta. Funciona con etapas
+        concurrentes y con volcados de cProfile.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            profiler = StageProfiler(cprofile_dir=os.path.join(tmp_dir, "prof"))
+
+            @profiler.wrap("synchronization")
+            def fuse():
+                time.sleep(0.05)
+
+            def branch(name):
+                with profiler.stage(name):
+                    time.sleep(0.05)
+
+            threads = [threading.Thread(target=branch, args=(name,)) for name in ("transcription", "face_analysis")]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            fuse()
+            profiler.count("synchronization", events=10)
+            profiler.record("face_inference", 2.0, faces=50)
+
+            summary = profiler.summary()
+            self.assertEqual(set(profiler.timings), {"transcription", "face_analysis", "synchronization"})
+            self.assertGreaterEqual(profiler.timings["synchronization"], 0.05)
+            self.assertEqual(summary["stages"]["face_inference"]["faces_per_sec"], 25.0)
+            self.assertIn("events_per_sec", summary["stages"]["synchronization"])
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, "prof", "synchronization.prof")))
+
+            metrics_path = os.path.join(tmp_dir, "video_metrics.json")
+            profiler.write(metrics_path, status="OK")
+            with open(metrics_path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.assertEqual(data["status"], "OK")
+            self.assertEqual(data["stages"]["synchronization"]["events"], 10)
+
+            # Varios videos por proceso: solo tiempos y contadores, sin memoria mezclada
+            shared = StageProfiler(track_rss=False)
+            with shared.stage("transcription"):
+                time.sleep(0.01)
+            summary = shared.summary()
+            self.assertEqual(set(summary["stages"]["transcription"]), {"seconds"})
+            self.assertNotIn("peak_rss_mb", summary)
+        finally:
+            shutil.rmtree(tmp_dir)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -11,7 +11,10 @@ sys.path.append(BASE_DIR)
 
 # Importamos la función de lógica pura de emotion_cnn
 # Nota: Asegúrate de que tu archivo emotion_cnn.py tenga esta función accesible
-from modules.visual.emotion_cnn import consolidate_emotions_by_segment
+from modules.visual.emotion_cnn import consolidate_emotions_by_segment, consolidate_segments
+from modules.visual.frame_sampler import choose_strategy, STRATEGY_SEQUENTIAL, STRATEGY_SEEK
+from modules.visual.adaptive_sampler import adaptive_sample
+from modules.visual.face_tracker import FaceTracker
 
 class TestVisualModule(unittest.TestCase):
 
@@ -54,6 +57,90 @@ class TestVisualModule(unittest.TestCase):
         self.assertEqual(result['emotion_facial_mode'], 'neutral')
         self.assertEqual(result['confidence_facial_mode'], 0.0)
 
+    def test_bulk_consolidation_matches_single_segment(self):
+        """
+        PBI 2.4: la consolidación en lote da lo mismo que segmento por segmento,
+        incluidos los segmentos vacíos y los empates (gana la emoción que aparece primero).
+        """
+        from utils.face_series import rows_to_columns
+        timeseries = self.dummy_timeseries + [
+            {'frame': 75, 'timestamp_sec': 6.0, 'emotion': 'sad', 'confidence': 70.0},
+            {'frame': 90, 'timestamp_sec': 7.0, 'emotion': 'happy', 'confidence': 70.0},
+        ]
+        segments = [{'start_time': 0.0, 'end_time': 3.0}, {'start_time': 3.0, 'end_time': 5.0},
+                    {'start_time': 5.0, 'end_time': 5.0}, {'start_time': 5.5, 'end_time': 7.5},
+                    {'start_time': 10.0, 'end_time': 20.0}]
+
+        bulk = consolidate_segments(rows_to_columns(timeseries), segments)
+        single = [consolidate_emotions_by_segment(timeseries, s['start_time'], s['end_time']) for s in segments]
+        self.assertEqual(bulk, single)
+        # 'sad' y 'happy' empatan en [3, 5): gana 'sad', que aparece primero
+        self.assertEqual(bulk[1]['emotion_facial_mode'], 'sad')
+        self.assertEqual(bulk[2]['emotion_facial_history'], [])
+
+    def test_consolidation_keeps_raw_labels_and_neutralizes_unknown(self):
+        """
+        PBI 2.4: el segmento suelto vota sobre las etiquetas tal como vienen (un alias
+        no se reescribe) y, como la consolidación en lote, cuenta las etiquetas fuera
+        del vocabulario como neutral (con aviso) en lugar de fallar.
+        """
+        from utils.face_series import rows_to_columns
+        aliased = [{'timestamp_sec': float(t), 'emotion': label, 'confidence': 80.0}
+                   for t, label in enumerate(['sadness', 'sadness', 'happy'])]
+        result = consolidate_emotions_by_segment(aliased, 0.0, 3.0)
+        self.assertEqual(result['emotion_facial_mode'], 'sadness')
+        self.assertEqual(result['emotion_facial_history'], ['sadness', 'sadness', 'happy'])
+
+        odd = [{'timestamp_sec': float(t), 'emotion': label, 'confidence': 80.0}
+               for t, label in enumerate(['unknown', 'happy', '', 'unknown', 'happy'])]
+        segments = [{'start_time': 0.0, 'end_time': 5.0}, {'start_time': 0.0, 'end_time': 3.0}]
+        with self.assertLogs('CNN_Consolidacion', 'WARNING'):
+            single = [consolidate_emotions_by_segment(odd, s['start_time'], s['end_time']) for s in segments]
+        with self.assertLogs('Utils_Serie_Facial', 'WARNING'):
+            bulk = consolidate_segments(rows_to_columns(odd), segments)
+        self.assertEqual(bulk, single)
+        self.assertEqual((single[0]['emotion_facial_mode'], single[0]['confidence_facial_mode']), ('neutral', 0.6))
+        self.assertEqual(single[1]['emotion_facial_history'], ['neutral', 'happy', 'neutral'])
+
+    def test_soft_consolidation_uses_probabilities(self):
+        """
+        Fusión suave: con el vector prob_<emoción> por frame gana la emoción de mayor
+        probabilidad media aunque pierda la votación por frames, igual segmento por
+        segmento y en lote. Sin probabilidades se vuelve a la moda.
+        """
+        from utils.face_series import rows_to_columns, PROB_COLUMNS
+        # Valores exactos en float16 (así guarda la serie el vector de probabilidades)
+        leaning_happy = {'happy': 0.5, 'sad': 0.375, 'neutral': 0.125}
+        series = []
+        for t, (emotion, probs) in enumerate([('happy', leaning_happy)] * 3 + [('sad', {'sad': 1.0})]):
+            row = {'frame': 15 * t, 'timestamp_sec': float(t), 'emotion': emotion,
+                   'confidence': 100 * max(probs.values())}
+            row.update({col: probs.get(col[len('prob_'):], 0.0) for col in PROB_COLUMNS})
+            series.append(row)
+
+        soft = consolidate_emotions_by_segment(series, 0.0, 4.0, soft=True)
+        # 3 de 4 frames votan 'happy', pero la probabilidad media de 'sad' es mayor
+        self.assertEqual(soft['emotion_facial_mode'], 'sad')
+        self.assertAlmostEqual(soft['confidence_facial_mode'], 0.53125)
+        self.assertAlmostEqual(soft['emotion_facial_probabilities']['happy'], 0.375)
+        self.assertAlmostEqual(sum(soft['emotion_facial_probabilities'].values()), 1.0)
+        self.assertEqual(soft['emotion_facial_history'], ['happy', 'happy', 'happy', 'sad'])
+        hard = consolidate_emotions_by_segment(series, 0.0, 4.0)
+        self.assertEqual((hard['emotion_facial_mode'], hard['confidence_facial_mode']), ('happy', 0.75))
+        self.assertNotIn('emotion_facial_probabilities', hard)
+
+        segments = [{'start_time': 0.0, 'end_time': 4.0}, {'start_time': 0.0, 'end_time': 2.0},
+                    {'start_time': 8.0, 'end_time': 9.0}]
+        bulk = consolidate_segments(rows_to_columns(series), segments, soft=True)
+        self.assertEqual(bulk, [consolidate_emotions_by_segment(series, s['start_time'], s['end_time'], soft=True)
+                                for s in segments])
+        self.assertEqual(bulk[1]['emotion_facial_mode'], 'happy')
+
+        # Serie sin vector de probabilidades: soft=True usa la votación dura
+        plain = [{key: value for key, value in row.items() if not key.startswith('prob_')} for row in series]
+        self.assertEqual(consolidate_emotions_by_segment(plain, 0.0, 4.0, soft=True), hard)
+        self.assertEqual(consolidate_segments(rows_to_columns(plain), segments[:1], soft=True), [hard])
+
     def test_csv_structure_compliance(self):
         """
         PBI 2.1: Valida que el archivo CSV generado (si existe) tenga las columnas obligatorias.
@@ -82,5 +169,70 @@ class TestVisualModule(unittest.TestCase):
         except Exception as e:
             self.fail(f"El archivo CSV está corrupto o ilegible: {e}")
 
+    def test_frame_sampling_strategy(self):
+        """
+        PBI 4.4: El seek solo se usa cuando el salto entre muestras supera varios GOPs.
+        """
+        self.assertEqual(choose_strategy(30, 250), STRATEGY_SEQUENTIAL)
+        self.assertEqual(choose_strategy(600, 250), STRATEGY_SEEK)
+        # Video intra-frame (cada frame es keyframe): el seek es barato
+        self.assertEqual(choose_strategy(30, 1), STRATEGY_SEEK)
+
+    def test_adaptive_sampling_refines_transitions(self):
+        """
+        El muestreo adaptativo ubica los cambios de emoción con resolución fina sin
+        gastar frames en los tramos estables, y respeta el tope de frames.
+        """
+        import numpy as np
+        transitions = (130, 410)
+        label_at = lambda idx: "happy" if idx < transitions[0] else "sad" if idx < transitions[1] else "neutral"
+        read_frames = lambda indices: list(indices)  # el "frame" es su propio índice
+        classify = lambda frames: [(label_at(idx), 90.0) for idx in frames]
+        signature = lambda frame: np.zeros(1)  # sin cambios de escena: solo cuentan las etiquetas
+
+        samples, info = adaptive_sample(600, read_frames, classify, signature, coarse_step=60, min_step=8)
+        indices = [idx for idx, _, _ in samples]
+        for t in transitions:
+            before = max(idx for idx in indices if idx < t)
+            after = min(idx for idx in indices if idx >= t)
+            self.assertLessEqual(after - before, 8)
+        # Tramo estable (entre 180 y 360): solo las muestras gruesas
+        self.assertEqual([idx for idx in indices if 180 < idx < 360], [240, 300])
+        self.assertEqual(info["coarse"], 10)
+
+        limited, _ = adaptive_sample(600, read_frames, classify, signature, coarse_step=60, min_step=8,
+                                     max_samples=14)
+        self.assertEqual(len(limited), 14)
+
+    def test_face_tracker_skips_detection_while_confident(self):
+        """
+        El seguidor detecta una sola vez mientras el rostro se mueve poco y vuelve a
+        detectar cuando el contenido de la caja cambia por completo.
+        """
+        import numpy as np
+        rng = np.random.default_rng(0)
+        face = rng.integers(0, 255, (60, 50, 3), dtype=np.uint8)
+        calls = []
+
+        def fake_detect(frame):
+            calls.append(frame)
+            return "rostro_detectado", (100, 80, 50, 60)
+
+        def frame_with_face(dx, patch=face):
+            frame = np.full((240, 320, 3), 128, dtype=np.uint8)
+            frame[80:140, 100 + dx:150 + dx] = patch
+            return frame
+
+        tracker = FaceTracker(detect=fake_detect, prepare=lambda crop: crop.shape, redetect_every=100)
+        self.assertEqual(tracker.locate(frame_with_face(0)), "rostro_detectado")
+        for dx in (3, 6, 9):
+            self.assertEqual(tracker.locate(frame_with_face(dx)), (60, 50, 3))
+        self.assertEqual(tracker.box, (109, 80, 50, 60))
+        self.assertEqual(len(calls), 1)
+
+        other = rng.integers(0, 255, (60, 50, 3), dtype=np.uint8)
+        self.assertEqual(tracker.locate(frame_with_face(9, other)), "rostro_detectado")
+        self.assertEqual(tracker.stats, {"detections": 2, "tracked": 3, "recovered": 0})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
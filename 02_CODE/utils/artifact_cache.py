@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from utils.logger import get_logger
+
+log = get_logger("Utils_Cache")
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3  # 5 GB
+MANIFEST_VERSION = 1
+_HASH_BLOCK = 1024 * 1024
+
+
+def atomic_copy(src_path, dest_path):
+    """
+    Copia `src_path` a `dest_path` de forma atómica: escribe un temporal en la misma
+    carpeta y lo renombra con os.replace, así nunca queda un archivo a medio escribir.
+    Intenta primero un hard link (sin copiar bytes) y si no es posible copia.
+    """
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".tmp_", suffix=os.path.splitext(dest_path)[1])
+    os.close(fd)
+    try:
+        os.remove(tmp_path)
+        try:
+            os.link(src_path, tmp_path)
+        except OSError:
+            shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def atomic_write_json(data, dest_path, **dump_kwargs):
+    """Escribe un JSON de forma atómica (temporal + os.replace)."""
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ArtifactCache:
+    """
+    Caché direccionada por contenido para los artefactos de cada etapa.
+
+    La llave de un artefacto es el hash de: bytes de los archivos de entrada +
+    parámetros de la etapa + identificador del modelo. Si cualquiera cambia (video
+    regrabado, otro sample_rate, otro modelo) la llave cambia y la etapa se recalcula.
+    El manifiesto (manifest.json) guarda tamaño y último acceso de cada artefacto para
+    desalojar por LRU cuando se supera `max_bytes`.
+    """
+
+    def __init__(self, root_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.root_dir = root_dir
+        self.objects_dir = os.path.join(root_dir, "objects")
+        self.manifest_path = os.path.join(root_dir, "manifest.json")
+        self.max_bytes = max_bytes
+        # Las ramas de audio y visual usan la caché al mismo tiempo
+        self._lock = threading.RLock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._manifest = self._load_manifest()
+
+    # --- Llaves ---
+
+    def file_digest(self, path):
+        """
+        SHA-256 de los bytes del archivo. Se memoiza por (ruta, tamaño, mtime) para no
+        volver a leer videos grandes que no cambiaron.
+        """
+        stat = os.stat(path)
+        abs_path = os.path.abspath(path)
+        with self._lock:
+            memo = self._manifest["digests"].get(abs_path)
+            if memo and memo["size"] == stat.st_size and memo["mtime_ns"] == stat.st_mtime_ns:
+                return memo["sha256"]
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            self._manifest["digests"][abs_path] = {
+                "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest
+            }
+            self._save_manifest()
+        return digest
+
+    def make_key(self, stage, input_paths, params=None, model_id=None):
+        """Llave del artefacto: hash de entradas + parámetros de la etapa + modelo."""
+        payload = {
+            "stage": stage,
+            "inputs": [self.file_digest(path) for path in input_paths],
+            "params": params or {},
+            "model_id": model_id,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    # --- Lectura / Escritura ---
+
+    def get(self, key, dest_path):
+        """Si el artefacto existe lo materializa en `dest_path` y retorna True."""
+        with self._lock:
+            entry = self._manifest["entries"].get(key)
+            if entry is None:
+                return False
+            blob_path = os.path.join(self.root_dir, entry["file"])
+            if not os.path.exists(blob_path):
+                # Entrada huérfana (archivo borrado a mano)
+                del self._manifest["entries"][key]
+                self._save_manifest()
+                return False
+            entry["last_access"] = time.time()
+            self._save_manifest()
+        atomic_copy(blob_path, dest_path)
+        log.info(f"Caché HIT [{entry['stage']}] {key[:12]} -> {os.path.basename(dest_path)}")
+        return True
+
+    def put(self, key, src_path, stage):
+        """Guarda `src_path` como artefacto de la llave `key` y aplica el desalojo LRU."""
+        ext = os.path.splitext(src_path)[1]
+        rel_path = os.path.join("objects", key[:2], key + ext)
+        atomic_copy(src_path, os.path.join(self.root_dir, rel_path))
+        now = time.time()
+        with self._lock:
+            self._manifest["entries"][key] = {
+                "stage": stage,
+                "file": rel_path,
+                "size": os.path.getsize(src_path),
+                "created": now,
+                "last_access": now,
+            }
+            self._evict()
+            self._save_manifest()
+        log.info(f"Caché PUT [{stage}] {key[:12]} ({os.path.basename(src_path)})")
+
+    def get_json(self, key):
+        """Retorna el contenido JSON del artefacto `key` o None si no existe."""
+        with self._lock:
+            entry = self._manifest["entries"].get(key)
+            if entry is None:
+                return None
+            blob_path = os.path.join(self.root_dir, entry["file"])
+            entry["last_access"] = time.time()
+            self._save_manifest()
+        try:
+            with open(blob_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        log.info(f"Caché HIT [{entry['stage']}] {key[:12]}")
+        return data
+
+    def put_json(self, key, data, stage):
+        """Guarda un objeto serializable como artefacto JSON."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, prefix=".tmp_", suffix=".json")
+        os.close(fd)
+        try:
+            atomic_write_json(data, tmp_path)
+            self.put(key, tmp_path, stage)
+        finally:
+            os.remove(tmp_path)
+
+    # --- Manifiesto y desalojo ---
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry["size"] for entry in self._manifest["entries"].values())
+
+    def _evict(self):
+        entries = self._manifest["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            entry = entries.pop(key)
+            total -= entry["size"]
+            blob_path = os.path.join(self.root_dir, entry["file"])
+            if os.path.exists(blob_path):
+                os.remove(blob_path)
+            log.info(f"Caché: desalojado [{entry['stage']}] {key[:12]} ({entry['size']} bytes)")
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if manifest.get("version") == MANIFEST_VERSION:
+                    return manifest
+                log.warning("Manifiesto de caché con versión distinta. Se reinicia.")
+            except (OSError, ValueError) as e:
+                log.warning(f"Manifiesto de caché ilegible ({e}). Se reinicia.")
+        return {"version": MANIFEST_VERSION, "entries": {}, "digests": {}}
+
+    def _save_manifest(self):
+        atomic_write_json(self._manifest, self.manifest_path, indent=2)
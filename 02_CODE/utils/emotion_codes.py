@@ -0,0 +1,50 @@
+import numpy as np
+
+# Vocabulario fijo de emociones (mismo orden que la salida del modelo de DeepFace).
+# Internamente las emociones viajan como enteros pequeños (int8); los strings
+# solo aparecen al serializar el JSON.
+EMOTIONS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+EMOTION_INDEX = {emotion: code for code, emotion in enumerate(EMOTIONS)}
+N_EMOTIONS = len(EMOTIONS)
+
+NEUTRAL = EMOTION_INDEX["neutral"]
+# Código para "sin observación" (p. ej. texto vacío): no altera el estado oculto
+NO_OBSERVATION = -1
+
+# Etiquetas crudas de RoBERTuito que equivalen a una emoción del vocabulario
+ALIASES = {"joy": "happy", "sadness": "sad", "anger": "angry", "others": "neutral"}
+
+
+def encode(label):
+    """Convierte una etiqueta en su código. Etiquetas vacías -> NO_OBSERVATION."""
+    if not label or not isinstance(label, str):
+        return NO_OBSERVATION
+    label = ALIASES.get(label, label)
+    if label not in EMOTION_INDEX:
+        raise ValueError(f"Emoción fuera del vocabulario: {label}")
+    return EMOTION_INDEX[label]
+
+
+def encode_series(labels, default=NEUTRAL):
+    """
+    Codifica una serie de etiquetas como arreglo int8.
+    Las etiquetas desconocidas o vacías se reemplazan por `default`.
+    """
+    lookup = dict(EMOTION_INDEX)
+    lookup.update({alias: EMOTION_INDEX[target] for alias, target in ALIASES.items()})
+    return np.fromiter((lookup.get(label, default) for label in labels), dtype=np.int8, count=len(labels))
+
+
+def unknown_labels(labels):
+    """Etiquetas fuera del vocabulario y de ALIASES (encode_series las reemplaza por `default`)."""
+    return {label for label in labels if label not in EMOTION_INDEX and label not in ALIASES}
+
+
+def decode(code):
+    """Convierte un código en su etiqueta."""
+    return EMOTIONS[code]
+
+
+def decode_series(codes):
+    """Convierte un arreglo de códigos en la lista de etiquetas del contrato JSON."""
+    return [EMOTIONS[code] for code in codes]
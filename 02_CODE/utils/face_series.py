@@ -0,0 +1,204 @@
+import csv
+import os
+import sys
+import time
+import numpy as np
+
+# Permite ejecutar el conversor directamente (python 02_CODE/utils/face_series.py ...)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logger import get_logger
+from utils.emotion_codes import EMOTIONS, N_EMOTIONS, decode_series, encode_series, unknown_labels
+
+log = get_logger("Utils_Serie_Facial")
+
+# Columnas de la serie facial; la emoción viaja como código int8 (utils.emotion_codes)
+COLUMNS = (("timestamp_sec", "<f8"), ("emotion", "i1"), ("confidence", "<f4"))
+CSV_COLUMNS = [name for name, _ in COLUMNS]
+# Vector completo de probabilidades (0-1) por frame, en el orden de EMOTIONS.
+# En .npy es una matriz (n, 7) float16; en CSV, una columna prob_<emoción> por emoción.
+PROBABILITY_COLUMN = "probabilities"
+PROBABILITY_DTYPE = "<f2"
+PROB_COLUMNS = [f"prob_{emotion}" for emotion in EMOTIONS]
+
+FORMAT_CSV = "csv"
+FORMAT_NPY = "npy"
+
+
+def columnar_dtype(n_rows, probabilities=False):
+    """
+    dtype de un único registro cuyas columnas son bloques contiguos de `n_rows`
+    valores. Guardado en .npy, cada columna queda contigua en disco y con memory-map
+    se puede buscar por timestamp sin copiar ni leer las demás columnas.
+    """
+    fields = [(name, dtype, (n_rows,)) for name, dtype in COLUMNS]
+    if probabilities:
+        fields.append((PROBABILITY_COLUMN, PROBABILITY_DTYPE, (n_rows, N_EMOTIONS)))
+    return np.dtype(fields)
+
+
+def series_path(base_path, series_format):
+    """Ruta de la serie con la extensión del formato (`..._faces.csv` o `..._faces.npy`)."""
+    return os.path.splitext(base_path)[0] + "." + series_format
+
+
+def find_face_series(path, any_format=False):
+    """
+    Retorna `path` si existe, o None: el formato de la serie es el que piden las
+    opciones de la corrida. Si además existe la misma serie en el otro formato
+    (.csv/.npy) y es más reciente, se avisa en el log. Con `any_format`, si `path`
+    falta se acepta el otro formato (puede venir de una corrida anterior con otras
+    opciones), también con aviso.
+    """
+    others = [series_path(path, series_format) for series_format in (FORMAT_NPY, FORMAT_CSV)]
+    others = [other for other in others if other != path and os.path.exists(other)]
+    if os.path.exists(path):
+        newer = [other for other in others if os.path.getmtime(other) > os.path.getmtime(path)]
+        if newer:
+            log.warning(f"{newer[0]} es más reciente que {path}; se usa {path} (formato pedido).")
+        return path
+    if any_format and others:
+        modified = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(os.path.getmtime(others[0])))
+        log.warning(f"No existe {path}; se usa {others[0]} (otro formato, modificado el {modified}).")
+        return others[0]
+    return None
+
+
+def has_probabilities(rows):
+    """True si todas las filas traen el vector prob_<emoción> completo."""
+    return bool(rows) and all(all(row.get(col) not in (None, "") for col in PROB_COLUMNS) for row in rows)
+
+
+def rows_to_columns(rows):
+    """
+    Filas {timestamp_sec, emotion, confidence[, prob_<emoción>...]} -> columnas
+    (dict de arreglos) ordenadas por tiempo. Si todas las filas traen el vector de
+    probabilidades se agrega la columna `probabilities` (n, 7) float16. Las
+    etiquetas fuera del vocabulario se codifican como neutral, con aviso en el log.
+    """
+    timestamps = np.array([row["timestamp_sec"] for row in rows], dtype=np.float64)
+    order = np.argsort(timestamps, kind="stable")
+    labels = [row["emotion"] for row in rows]
+    unknown = unknown_labels(labels)
+    if unknown:
+        log.warning(f"Etiquetas fuera del vocabulario en la serie facial (se cuentan como neutral): "
+                    f"{', '.join(sorted(map(str, unknown)))}")
+    columns = {
+        "timestamp_sec": timestamps[order],
+        "emotion": encode_series(labels)[order],
+        "confidence": np.array([row["confidence"] for row in rows], dtype=np.float32)[order],
+    }
+    if has_probabilities(rows):
+        probabilities = np.array([[float(row[col]) for col in PROB_COLUMNS] for row in rows],
+                                 dtype=PROBABILITY_DTYPE).reshape(-1, N_EMOTIONS)
+        columns[PROBABILITY_COLUMN] = probabilities[order]
+    return columns
+
+
+def series_length(columns):
+    return len(columns["timestamp_sec"])
+
+
+def series_to_records(columns):
+    """Columnas -> lista de dicts con la emoción como etiqueta (formato del CSV)."""
+    labels = decode_series(columns["emotion"])
+    records = [
+        {"timestamp_sec": float(ts), "emotion": label, "confidence": float(conf)}
+        for ts, label, conf in zip(columns["timestamp_sec"], labels, columns["confidence"])
+    ]
+    if PROBABILITY_COLUMN in columns:
+        for record, probs in zip(records, columns[PROBABILITY_COLUMN]):
+            record.update(zip(PROB_COLUMNS, (float(p) for p in probs)))
+    return records
+
+
+def _save_npy(columns, path):
+    with_probs = PROBABILITY_COLUMN in columns
+    record = np.empty((), dtype=columnar_dtype(series_length(columns), probabilities=with_probs))
+    for name in record.dtype.names:
+        record[name] = columns[name]
+    # np.save agrega .npy si falta: se abre el archivo para respetar la ruta exacta
+    with open(path, "wb") as f:
+        np.save(f, record)
+
+
+def write_face_series(rows, path):
+    """
+    Escribe la serie facial según la extensión de `path`: `.npy` (columnar, ordenada
+    por tiempo) o `.csv` (columnas timestamp_sec, emotion, confidence y, si las filas
+    las traen, prob_<emoción>).
+    """
+    if path.endswith("." + FORMAT_NPY):
+        _save_npy(rows_to_columns(rows), path)
+        return
+    fieldnames = CSV_COLUMNS + (PROB_COLUMNS if has_probabilities(rows) else [])
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def read_csv_series(csv_path):
+    """
+    Lee una serie facial CSV con el módulo csv (sin pandas). Las filas sin timestamp
+    se descartan y el resultado queda ordenado por tiempo.
+    """
+    rows = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            ts = row.get("timestamp_sec")
+            if ts in (None, "") or ts.lower() == "nan":
+                continue
+            confidence = row.get("confidence")
+            record = {"timestamp_sec": float(ts), "emotion": row.get("emotion") or "",
+                      "confidence": float(confidence) if confidence not in (None, "") else np.nan}
+            record.update({col: row[col] for col in PROB_COLUMNS if row.get(col) not in (None, "")})
+            rows.append(record)
+    return rows_to_columns(rows)
+
+
+def load_face_series(path, mmap=True):
+    """
+    Abre la serie facial como columnas {timestamp_sec, emotion, confidence
+    [, probabilities]} ordenadas por tiempo. Las series anteriores al vector de
+    probabilidades no traen la columna `probabilities`. Los `.npy` se abren con memory-map: solo se leen las
+    páginas que se tocan (búsqueda binaria por timestamp + cortes). Los `.csv`
+    se parsean completos.
+    """
+    if not path.endswith("." + FORMAT_NPY):
+        return read_csv_series(path)
+    record = np.load(path, mmap_mode="r" if mmap else None)
+    if record.shape != () or record.dtype.names[:len(CSV_COLUMNS)] != tuple(CSV_COLUMNS):
+        raise ValueError(f"Serie facial .npy con formato inesperado: {record.dtype}")
+    return {name: record[name] for name in record.dtype.names}
+
+
+def slice_by_time(columns, start_sec, end_sec):
+    """Filas con start_sec <= timestamp_sec <= end_sec, como vistas de cada columna."""
+    timestamps = columns["timestamp_sec"]
+    lo = np.searchsorted(timestamps, start_sec, side="left")
+    hi = np.searchsorted(timestamps, end_sec, side="right")
+    return {name: values[lo:hi] for name, values in columns.items()}
+
+
+def convert_csv_to_npy(csv_path, npy_path=None):
+    """Conversor de una sola vez: `<serie>.csv` -> `<serie>.npy`. Retorna la ruta nueva."""
+    npy_path = npy_path or series_path(csv_path, FORMAT_NPY)
+    tmp_path = npy_path + ".partial"
+    _save_npy(read_csv_series(csv_path), tmp_path)
+    os.replace(tmp_path, npy_path)
+    log.info(f"Serie convertida: {os.path.basename(csv_path)} -> {os.path.basename(npy_path)} "
+             f"({os.path.getsize(csv_path)} -> {os.path.getsize(npy_path)} bytes)")
+    return npy_path
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    parser = argparse.ArgumentParser(description="Convierte series faciales CSV a .npy columnar.")
+    parser.add_argument("paths", nargs="+", help="CSVs o carpetas (se convierten todos los *_faces.csv).")
+    args = parser.parse_args()
+    for target in args.paths:
+        csv_files = sorted(glob.glob(os.path.join(target, "*_faces.csv"))) if os.path.isdir(target) else [target]
+        for csv_file in csv_files:
+            convert_csv_to_npy(csv_file)
@@ -1,5 +1,4 @@
 import os
-import cv2
 import datetime
 from utils.logger import get_logger
 
@@ -30,6 +29,7 @@ def get_video_properties(video_path):
     if not validate_input_file(video_path):
         return None
 
+    import cv2
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         log.error(f"No se pudo abrir el video con OpenCV: {video_path}")
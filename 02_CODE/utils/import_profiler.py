@@ -0,0 +1,82 @@
+import builtins
+import sys
+import threading
+import time
+
+# Imports por debajo de este umbral no aparecen en el reporte
+MIN_REPORT_SEC = 0.01
+
+
+class ImportProfiler:
+    """
+    Mide cuánto tarda cada import pesado y en qué etapa del pipeline ocurre.
+
+    Envuelve builtins.__import__ y solo registra el import "exterior" de un módulo
+    nuevo (los imports anidados quedan incluidos en su tiempo acumulado). Así se ve
+    qué etapa pagó la carga de torch, deepface, matplotlib, etc.
+    """
+
+    def __init__(self):
+        self.records = []  # (módulo, segundos, etapa)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._original_import = None
+
+    @property
+    def installed(self):
+        return self._original_import is not None
+
+    def install(self):
+        if self.installed:
+            return
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self.installed:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def set_stage(self, stage):
+        """Etiqueta los imports siguientes de este hilo con `stage`."""
+        self._local.stage = stage
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        depth = getattr(self._local, "depth", 0)
+        if depth > 0 or level != 0 or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._local.depth = depth
+            with self._lock:
+                self.records.append((name, elapsed, getattr(self._local, "stage", "startup")))
+
+    def summary(self, top=15, min_sec=MIN_REPORT_SEC):
+        """Imports más lentos como lista de dicts, ordenados por tiempo acumulado."""
+        with self._lock:
+            records = sorted(self.records, key=lambda r: r[1], reverse=True)
+        return [{"module": name, "seconds": round(elapsed, 3), "stage": stage}
+                for name, elapsed, stage in records[:top] if elapsed >= min_sec]
+
+    def report(self, log, top=15):
+        """Escribe en el log el resumen de imports por etapa."""
+        rows = self.summary(top)
+        with self._lock:
+            by_stage = {}
+            for _, elapsed, stage in self.records:
+                by_stage[stage] = by_stage.get(stage, 0.0) + elapsed
+        log.info("--- PERFIL DE IMPORTS ---")
+        for stage, elapsed in sorted(by_stage.items(), key=lambda item: item[1], reverse=True):
+            log.info(f"Etapa {stage:<20} {elapsed:7.3f}s en imports")
+        for row in rows:
+            log.info(f"  {row['module']:<32} {row['seconds']:7.3f}s  ({row['stage']})")
+        return rows
+
+
+# Instancia única por proceso
+PROFILER = ImportProfiler()
@@ -0,0 +1,194 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from utils.logger import get_logger
+
+log = get_logger("Utils_Perfilado")
+
+# Cada cuánto se muestrea la memoria residente mientras hay etapas activas
+RSS_SAMPLE_SEC = 0.05
+_MB = 1024 ** 2
+
+
+def current_rss_bytes():
+    """Memoria residente actual del proceso (bytes) o None si no se puede medir."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil  # Opcional (Windows/macOS)
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+def peak_rss_bytes():
+    """Pico de memoria residente del proceso desde su inicio (bytes) o None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageProfiler:
+    """
+    Instrumentación por etapa de una corrida del pipeline.
+
+    - `stage(name)`: context manager que mide duración y pico de memoria residente
+      (muestreada en segundo plano mientras la etapa está activa). Es seguro con
+      las ramas de audio y visual corriendo en hilos distintos.
+    - `wrap(name)`: lo mismo como decorador.
+    - `record(name, seconds, **contadores)`: sub-etapas medidas dentro de un módulo
+      (ej. decodificación vs. inferencia facial) y sus contadores (frames, fragmentos).
+    - `count(name, **contadores)`: suma contadores a una etapa; el resumen agrega
+      `<contador>_per_sec` sobre la duración de la etapa.
+    - Con `cprofile_dir`, cada etapa se ejecuta bajo cProfile y se guarda
+      `<etapa>.prof` (formato pstats: snakeviz, `python -m pstats`).
+
+    La memoria es la del proceso completo: dentro de una corrida, las etapas de las
+    ramas concurrentes se ven entre sí. Con varios videos en el mismo proceso (modo
+    lote o servidor con más de un worker) los valores se mezclarían entre videos;
+    ahí se usa `track_rss=False` y solo se miden tiempos y contadores.
+
+    `timings` conserva la forma de `stage_timings_sec` del reporte.
+    """
+
+    def __init__(self, cprofile_dir=None, sample_sec=RSS_SAMPLE_SEC, track_rss=True):
+        self.timings = {}
+        self.stages = {}
+        self.cprofile_dir = cprofile_dir
+        self.sample_sec = sample_sec
+        self.track_rss = track_rss
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._active = {}  # etapa -> pico de RSS observado mientras está activa
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+
+    @contextmanager
+    def stage(self, name):
+        rss_start = self._rss()
+        self._enter(name, rss_start)
+        profile = self._start_cprofile(name)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(os.path.join(self.cprofile_dir, f"{name}.prof"))
+            rss_peak = self._exit(name)
+            rss_end = self._rss()
+            entry = {"seconds": round(seconds, 3)}
+            if rss_peak is not None:
+                entry["rss_peak_mb"] = round(rss_peak / _MB, 1)
+            if rss_start is not None and rss_end is not None:
+                entry["rss_delta_mb"] = round((rss_end - rss_start) / _MB, 1)
+            with self._lock:
+                self.timings[name] = entry["seconds"]
+                self.stages.setdefault(name, {}).update(entry)
+
+    def wrap(self, name):
+        """Decorador: ejecuta la función dentro de `stage(name)`."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, seconds, **counters):
+        """Registra una sub-etapa medida por el propio módulo."""
+        with self._lock:
+            self.stages.setdefault(name, {})["seconds"] = round(seconds, 3)
+        self.count(name, **counters)
+
+    def count(self, name, **counters):
+        with self._lock:
+            entry = self.stages.setdefault(name, {})
+            for counter, value in counters.items():
+                entry[counter] = entry.get(counter, 0) + value
+
+    def summary(self):
+        """Métricas por etapa (duración, memoria, contadores y tasas) + totales del proceso."""
+        with self._lock:
+            stages = {name: dict(entry) for name, entry in self.stages.items()}
+        for entry in stages.values():
+            seconds = entry.get("seconds", 0)
+            for counter in [key for key in entry if key not in _RESERVED]:
+                if seconds > 0 and isinstance(entry[counter], (int, float)):
+                    entry[f"{counter}_per_sec"] = round(entry[counter] / seconds, 2)
+        summary = {"wall_sec": round(time.perf_counter() - self.start, 3), "stages": stages}
+        peak = peak_rss_bytes() if self.track_rss else None
+        if peak is not None:
+            summary["peak_rss_mb"] = round(peak / _MB, 1)
+        return summary
+
+    def write(self, path, **extra):
+        """Archivo de métricas legible por máquina (JSON) para comparar corridas."""
+        data = {**extra, **self.summary()}
+        tmp_path = path + ".partial"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return data
+
+    def _enter(self, name, rss):
+        with self._lock:
+            self._active[name] = rss or 0
+            if self._sampler is None and self._rss() is not None:
+                # Un evento por muestreador: uno que está terminando no revive con el siguiente
+                self._stop_sampling = threading.Event()
+                self._sampler = threading.Thread(target=self._sample, args=(self._stop_sampling,),
+                                                 name="perfil-rss", daemon=True)
+                self._sampler.start()
+
+    def _exit(self, name):
+        rss = self._rss()
+        with self._lock:
+            peak = self._active.pop(name, None)
+            if peak is not None and rss is not None:
+                peak = max(peak, rss)
+            if not self._active and self._sampler is not None:
+                self._stop_sampling.set()
+                self._sampler = None
+        return peak or None
+
+    def _rss(self):
+        return current_rss_bytes() if self.track_rss else None
+
+    def _sample(self, stop):
+        while not stop.wait(self.sample_sec):
+            rss = current_rss_bytes()
+            with self._lock:
+                for name, peak in self._active.items():
+                    self._active[name] = max(peak, rss)
+
+    def _start_cprofile(self, name):
+        if not self.cprofile_dir:
+            return None
+        import cProfile
+        os.makedirs(self.cprofile_dir, exist_ok=True)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Python 3.12+ admite un solo perfilador activo: la etapa concurrente se omite
+            log.warning(f"cProfile no disponible para la etapa '{name}': {e}")
+            return None
+        return profile
+
+
+# Llaves del resumen que no son contadores
+_RESERVED = {"seconds", "rss_peak_mb", "rss_delta_mb"}
@@ -0,0 +1,196 @@
+import json
+import os
+from utils.logger import get_logger
+
+log = get_logger("Utils_Reporte")
+
+# Formatos del reporte final
+REPORT_JSON = "json"        # Contrato _FINAL.json con indentación (legible)
+REPORT_COMPACT = "compact"  # Mismo contrato sin espacios ni saltos de línea
+REPORT_NDJSON = "ndjson"    # Una línea por registro: cabecera, eventos y métricas globales
+REPORT_FORMATS = (REPORT_JSON, REPORT_COMPACT, REPORT_NDJSON)
+
+# Representación de emotion_facial_history
+HISTORY_LIST = "list"  # Lista de etiquetas por frame (contrato original)
+HISTORY_RLE = "rle"    # Corridas [[etiqueta, repeticiones], ...] en emotion_facial_history_rle
+HISTORY_FIELD = "emotion_facial_history"
+HISTORY_RLE_FIELD = "emotion_facial_history_rle"
+
+_INDENT = 4
+
+
+def report_path(base_path, report_format):
+    """Ruta del reporte con la extensión del formato (`.ndjson` o `.json`)."""
+    ext = ".ndjson" if report_format == REPORT_NDJSON else ".json"
+    return os.path.splitext(base_path)[0] + ext
+
+
+def encode_history_rle(history):
+    """['neutral', 'neutral', 'sad'] -> [['neutral', 2], ['sad', 1]]."""
+    runs = []
+    for label in history:
+        if runs and runs[-1][0] == label:
+            runs[-1][1] += 1
+        else:
+            runs.append([label, 1])
+    return runs
+
+
+def decode_history_rle(runs):
+    """Inversa de encode_history_rle."""
+    return [label for label, count in runs for _ in range(count)]
+
+
+def rle_event(event):
+    """Copia del evento con la historia facial en corridas (misma posición dentro del evento)."""
+    if HISTORY_FIELD not in event:
+        return event
+    return {(HISTORY_RLE_FIELD if key == HISTORY_FIELD else key):
+            (encode_history_rle(value) if key == HISTORY_FIELD else value)
+            for key, value in event.items()}
+
+
+def expand_event(event):
+    """Inversa de rle_event: el evento con la forma del contrato (historia por frame)."""
+    if HISTORY_RLE_FIELD not in event:
+        return event
+    return {(HISTORY_FIELD if key == HISTORY_RLE_FIELD else key):
+            (decode_history_rle(value) if key == HISTORY_RLE_FIELD else value)
+            for key, value in event.items()}
+
+
+class ReportWriter:
+    """
+    Escritura incremental del reporte final: cada evento se serializa y se escribe
+    en cuanto sale de la fusión, sin armar el documento completo en memoria
+    (con un generador de eventos como synchronizer.iter_synchronize_data).
+    Las métricas globales se escriben al final (`finish`), así que en el JSON la
+    llave `global_metrics` queda después de `events`; el contenido del contrato
+    no cambia. El archivo se escribe en un temporal y se renombra al terminar.
+
+    Uso:
+        with ReportWriter(path, {"interview_id": ..., "video_path": ...}) as writer:
+            for event in iter_synchronize_data(transcription, faces_path):
+                writer.write_event(event)
+            writer.finish(global_metrics)
+    """
+
+    def __init__(self, path, header, report_format=REPORT_JSON, history=HISTORY_LIST):
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Formato de reporte desconocido: {report_format}")
+        self.path = path
+        self.report_format = report_format
+        self.history = history
+        self.n_events = 0
+        self.n_scored = 0
+        self.score_sum = 0.0
+        self.end_time_sec = 0.0
+        self._tmp_path = path + ".partial"
+        self._file = open(self._tmp_path, "w", encoding="utf-8")
+        self._finished = False
+        self._write_header(header)
+
+    def write_event(self, event):
+        """Escribe un evento del contrato (PBI 4.3) y acumula las métricas globales."""
+        self.n_events += 1
+        if "congruence_score" in event:
+            # Los eventos sin score no cuentan para el promedio
+            self.n_scored += 1
+            self.score_sum += event["congruence_score"]
+        self.end_time_sec = event.get("end_time_sec", self.end_time_sec)
+
+        if self.history == HISTORY_RLE:
+            event = rle_event(event)
+
+        if self.report_format == REPORT_NDJSON:
+            self._file.write(self._dumps(event) + "\n")
+        elif self.report_format == REPORT_COMPACT:
+            self._file.write(("," if self.n_events > 1 else "") + self._dumps(event))
+        else:
+            prefix = ",\n" if self.n_events > 1 else "\n"
+            self._file.write(prefix + _indent(_format_event(event), 2 * _INDENT))
+
+    def overall_score(self):
+        """Congruencia promedio de los eventos escritos que traen `congruence_score`."""
+        return self.score_sum / self.n_scored if self.n_scored else 0.0
+
+    def finish(self, global_metrics):
+        """Escribe las métricas globales, cierra el archivo y lo publica de forma atómica."""
+        if self.report_format == REPORT_NDJSON:
+            self._file.write(self._dumps({"global_metrics": global_metrics}) + "\n")
+        elif self.report_format == REPORT_COMPACT:
+            self._file.write('],"global_metrics":' + self._dumps(global_metrics) + "}")
+        else:
+            metrics = json.dumps(global_metrics, indent=_INDENT, ensure_ascii=False)
+            closing = f"\n{' ' * _INDENT}]" if self.n_events else "]"
+            self._file.write(f"{closing},\n{' ' * _INDENT}\"global_metrics\": {_indent(metrics, _INDENT).lstrip()}\n}}")
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        self._finished = True
+
+    def abort(self):
+        """Descarta el reporte a medio escribir."""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self._finished:
+            log.warning(f"Reporte incompleto descartado: {os.path.basename(self.path)}")
+            self.abort()
+
+    def _write_header(self, header):
+        if self.report_format == REPORT_NDJSON:
+            self._file.write(self._dumps(header) + "\n")
+            return
+        if self.report_format == REPORT_COMPACT:
+            self._file.write(self._dumps(header)[:-1] + ',"events":[')
+            return
+        lines = [f"{' ' * _INDENT}{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}"
+                 for key, value in header.items()]
+        self._file.write("{\n" + ",\n".join(lines) + f",\n{' ' * _INDENT}\"events\": [")
+
+    @staticmethod
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _format_event(event):
+    """Evento con indentación; las corridas RLE van en una sola línea (si no, ocupan más que la lista)."""
+    items = []
+    for key, value in event.items():
+        if key == HISTORY_RLE_FIELD:
+            text = json.dumps(value, ensure_ascii=False, separators=(", ", ": "))
+        else:
+            text = _indent(json.dumps(value, indent=_INDENT, ensure_ascii=False), _INDENT).lstrip()
+        items.append(f"{' ' * _INDENT}{json.dumps(key)}: {text}")
+    return "{\n" + ",\n".join(items) + "\n}"
+
+
+def _indent(text, spaces):
+    pad = " " * spaces
+    return "\n".join(pad + line for line in text.split("\n"))
+
+
+def load_report(path):
+    """
+    Lee un reporte en cualquiera de los formatos (json, compact, ndjson) y lo
+    retorna con la forma del contrato _FINAL.json: las historias en RLE se expanden
+    a `emotion_facial_history`.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".ndjson"):
+            records = [json.loads(line) for line in f if line.strip()]
+            report = dict(records[0])
+            report["events"] = [r for r in records[1:] if "global_metrics" not in r]
+            report["global_metrics"] = next((r["global_metrics"] for r in records[1:] if "global_metrics" in r), {})
+        else:
+            report = json.load(f)
+    for event in report.get("events", []):
+        if HISTORY_RLE_FIELD in event:
+            event[HISTORY_FIELD] = decode_history_rle(event.pop(HISTORY_RLE_FIELD))
+    return report
@@ -0,0 +1,56 @@
+import glob
+import os
+import sys
+import time
+
+# Rutas: este script vive en 03_EXPERIMENTS y los módulos en 02_CODE
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, "02_CODE"))
+
+from modules.visual.frame_sampler import (
+    iter_sampled_frames, estimate_gop_size, choose_strategy,
+    STRATEGY_SEQUENTIAL, STRATEGY_SEEK
+)
+
+RAW_DIR = os.path.join(ROOT_DIR, "01_DATA", "raw")
+SAMPLE_RATES = [5, 30, 120]
+REPEATS = 3
+
+
+def time_strategy(video_path, sample_rate, strategy):
+    """Retorna (mejor tiempo en segundos, frames muestreados) solo decodificando."""
+    best = float("inf")
+    count = 0
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_sampled_frames(video_path, sample_rate, strategy))
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def check_frame_sampler():
+    """
+    Compara la decodificación secuencial (grab/retrieve) contra el seek por frame
+    sobre los videos de 01_DATA/raw.
+    """
+    print("--- Benchmark: Muestreo de Frames (secuencial vs seek) ---")
+    videos = sorted(glob.glob(os.path.join(RAW_DIR, "*.mp4")))
+    if not videos:
+        print(f"\n ERROR: No hay videos .mp4 en {RAW_DIR}")
+        return
+
+    for video_path in videos:
+        gop = estimate_gop_size(video_path)
+        print(f"\n{os.path.basename(video_path)} (GOP estimado: {gop})")
+        print(f"{'sample_rate':>12} {'secuencial (s)':>15} {'seek (s)':>10} {'frames':>7} {'auto':>11}")
+        for sample_rate in SAMPLE_RATES:
+            t_seq, n_seq = time_strategy(video_path, sample_rate, STRATEGY_SEQUENTIAL)
+            t_seek, n_seek = time_strategy(video_path, sample_rate, STRATEGY_SEEK)
+            if n_seq != n_seek:
+                print(f" ADVERTENCIA: las estrategias muestrearon distinto número de frames ({n_seq} vs {n_seek})")
+            auto = choose_strategy(sample_rate, gop)
+            print(f"{sample_rate:>12} {t_seq:>15.3f} {t_seek:>10.3f} {n_seq:>7} {auto:>11}")
+
+
+if __name__ == "__main__":
+    check_frame_sampler()
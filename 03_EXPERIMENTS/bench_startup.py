@@ -0,0 +1,77 @@
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# Rutas: este script vive en 03_EXPERIMENTS y los módulos en 02_CODE
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CODE_DIR = os.path.join(ROOT_DIR, "02_CODE")
+
+# Módulos que NO deben cargarse al importar el pipeline (se difieren a su etapa)
+HEAVY_MODULES = ["torch", "transformers", "deepface", "tensorflow", "matplotlib", "cv2", "pandas", "ffmpeg"]
+# Presupuesto de arranque: importar main_pipeline debe quedar muy por debajo de 1 s
+MAX_STARTUP_SEC = 0.5
+RUNS = 5
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def time_import(module="main_pipeline"):
+    """Tiempo de pared de un proceso nuevo que solo importa `module`."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=CODE_DIR, check=True,
+                   capture_output=True)
+    return time.perf_counter() - start
+
+
+def loaded_heavy_modules(module="main_pipeline"):
+    script = (f"import sys, {module}; "
+              f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", script], cwd=CODE_DIR, check=True,
+                         capture_output=True, text=True).stdout.strip()
+    return [m for m in out.split(",") if m]
+
+
+def slowest_imports(module="main_pipeline", top=10):
+    """Imports más lentos (el módulo y sus imports directos) según `python -X importtime`."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=CODE_DIR,
+                            check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match and len(match.group(3)) <= 3:
+            rows.append((match.group(4), int(match.group(2)) / 1e6))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+
+def check_startup(runs=RUNS, max_sec=MAX_STARTUP_SEC):
+    # Intérprete vacío como referencia: el costo propio del pipeline es la diferencia
+    baseline = statistics.median(time_import("os") for _ in range(runs))
+    samples = [time_import() for _ in range(runs)]
+    median = statistics.median(samples)
+    print(f"python -c 'import os'          : {baseline:.3f}s (mediana de {runs})")
+    print(f"python -c 'import main_pipeline': {median:.3f}s (mediana de {runs})")
+
+    print("Imports más lentos (acumulado):")
+    for name, seconds in slowest_imports():
+        print(f"  {name:<32} {seconds:.3f}s")
+
+    heavy = loaded_heavy_modules()
+    ok = not heavy and median - baseline <= max_sec
+    if heavy:
+        print(f"REGRESIÓN: el arranque carga módulos pesados: {', '.join(heavy)}")
+    if median - baseline > max_sec:
+        print(f"REGRESIÓN: arranque de {median - baseline:.3f}s supera el presupuesto de {max_sec:.2f}s")
+    print("OK" if ok else "FALLO")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo de arranque del pipeline.")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--max-sec", type=float, default=MAX_STARTUP_SEC)
+    args = parser.parse_args()
+    sys.exit(0 if check_startup(args.runs, args.max_sec) else 1)
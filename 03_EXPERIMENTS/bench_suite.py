@@ -0,0 +1,320 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+
+# Rutas: este script vive en 03_EXPERIMENTS y los módulos en 02_CODE
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, "02_CODE"))
+
+from utils.emotion_codes import EMOTIONS
+from utils.face_series import PROB_COLUMNS, load_face_series, series_to_records, write_face_series
+from utils.report_writer import ReportWriter
+from modules.integration.synchronizer import synchronize_data
+from modules.integration.analyzer import generate_insights
+from modules.integration.validator import run_manual_validation
+from modules.integration.visualizer import generate_comparison_plot
+from modules.visual.emotion_cnn import consolidate_emotions_by_segment, consolidate_segments
+
+RESULTS_DIR = os.path.join(ROOT_DIR, "05_OUTPUTS", "benchmarks")
+# Duraciones de entrevista sintética (segundos)
+SIZES = {"1min": 60, "1h": 3600, "10h": 36000}
+DEFAULT_SIZES = ["1min", "1h"]
+# Cadencia de la serie facial (~2 frames por segundo, como en 01_DATA/series_temporales)
+# y largo de los segmentos de Whisper
+FACE_INTERVAL_SEC = 0.5
+SEGMENT_SEC = (2.0, 8.0)
+REPEATS = 5
+# Una medición no repite más allá de este tiempo acumulado
+BUDGET_SEC = 10.0
+# consolidate_emotions_by_segment (un segmento por llamada) recorre toda la serie en
+# cada llamada (O(S x F)): se mide sobre una muestra de segmentos y se extrapola
+CONSOLIDATE_SAMPLE = 200
+# Una regresión es un tiempo mayor a este factor del resultado de referencia
+MAX_REGRESSION = 1.25
+# Las llamadas más cortas se repiten en bucle hasta este tiempo por muestra (como timeit)
+MIN_SAMPLE_SEC = 0.02
+# Diferencias absolutas menores a esto son ruido y no cuentan como regresión
+NOISE_FLOOR_SEC = 0.001
+
+
+def make_interview(duration_sec, seed=0):
+    """
+    Entrevista sintética reproducible: serie facial con corridas de emoción (como
+    la salida real, no ruido uniforme) y vector de probabilidades, segmentos de
+    transcripción contiguos y etiquetas manuales sobre los mismos intervalos.
+    Retorna (filas_faciales, segmentos, etiquetas).
+    """
+    rng = np.random.default_rng(seed)
+    n_frames = int(duration_sec / FACE_INTERVAL_SEC)
+
+    # Cambio de emoción cada ~6 frames en promedio
+    changes = rng.random(n_frames) < 1 / 6
+    codes = rng.integers(0, len(EMOTIONS), size=n_frames)[np.maximum.accumulate(
+        np.where(changes, np.arange(n_frames), 0))]
+    probs = rng.dirichlet(np.ones(len(EMOTIONS)), size=n_frames) * 0.5
+    probs[np.arange(n_frames), codes] += 0.5
+    confidence = probs[np.arange(n_frames), codes] * 100
+
+    face_rows = []
+    for i in range(n_frames):
+        row = {"timestamp_sec": round(i * FACE_INTERVAL_SEC, 2), "emotion": EMOTIONS[codes[i]],
+               "confidence": round(float(confidence[i]), 4)}
+        row.update(zip(PROB_COLUMNS, (round(float(p), 4) for p in probs[i])))
+        face_rows.append(row)
+
+    bounds = [0.0]
+    while bounds[-1] < duration_sec:
+        bounds.append(min(duration_sec, bounds[-1] + rng.uniform(*SEGMENT_SEC)))
+    segments = [
+        {"start_time": round(a, 2), "end_time": round(b, 2), "text": "texto sintético",
+         "emotion": EMOTIONS[rng.integers(len(EMOTIONS))]}
+        for a, b in zip(bounds[:-1], bounds[1:])
+    ]
+    labels = [
+        {"video_id": "bench.mp4", "start_time_sec": seg["start_time"], "end_time_sec": seg["end_time"],
+         "manual_emotion_face": EMOTIONS[rng.integers(len(EMOTIONS))], "manual_emotion_text": seg["emotion"],
+         "manual_congruence": float(rng.choice([0.0, 0.5, 1.0]))}
+        for seg in segments
+    ]
+    return face_rows, segments, labels
+
+
+def measure(func, repeats=REPEATS, budget_sec=BUDGET_SEC):
+    """
+    Tiempo por llamada de `func`: hasta `repeats` muestras (o hasta agotar el
+    presupuesto). Si una llamada dura menos de MIN_SAMPLE_SEC, cada muestra la
+    repite en bucle y se divide por el número de llamadas.
+    """
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    loops = 1 if first >= MIN_SAMPLE_SEC else int(MIN_SAMPLE_SEC / max(first, 1e-6)) + 1
+
+    samples, spent = [], 0.0
+    while len(samples) < repeats and spent < budget_sec:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        spent += elapsed
+        samples.append(elapsed / loops)
+    return {"best_sec": round(min(samples), 6), "median_sec": round(statistics.median(samples), 6),
+            "runs": len(samples), "loops": loops}
+
+
+def with_rate(result, items, unit):
+    """Agrega el volumen procesado y su tasa sobre el mejor tiempo."""
+    result[unit] = items
+    if result["best_sec"] > 0:
+        result[f"{unit}_per_sec"] = round(items / result["best_sec"], 1)
+    return result
+
+
+def bench_size(label, duration_sec, workdir, repeats):
+    """Mide las etapas de integración sobre una entrevista sintética de `duration_sec`."""
+    face_rows, segments, labels = make_interview(duration_sec)
+    csv_path = os.path.join(workdir, f"{label}_faces.csv")
+    npy_path = os.path.join(workdir, f"{label}_faces.npy")
+    write_face_series(face_rows, csv_path)
+    write_face_series(face_rows, npy_path)
+    results = {"_input": {"duration_sec": duration_sec, "frames": len(face_rows), "segments": len(segments)}}
+
+    results["synchronize_data_npy"] = with_rate(
+        measure(lambda: synchronize_data(segments, npy_path), repeats), len(segments), "segments")
+    results["synchronize_data_csv"] = with_rate(
+        measure(lambda: synchronize_data(segments, csv_path), repeats), len(segments), "segments")
+    results["synchronize_data_soft"] = with_rate(
+        measure(lambda: synchronize_data(segments, npy_path, soft=True), repeats), len(segments), "segments")
+
+    records = series_to_records(load_face_series(npy_path, mmap=False))
+    sample = segments[:CONSOLIDATE_SAMPLE]
+    consolidate = measure(lambda: [consolidate_emotions_by_segment(records, s["start_time"], s["end_time"])
+                                   for s in sample], repeats)
+    if len(sample) < len(segments):
+        scale = len(segments) / len(sample)
+        consolidate = {key: round(value * scale, 6) if key.endswith("_sec") else value
+                       for key, value in consolidate.items()}
+        consolidate["extrapolated_from"] = len(sample)
+    results["consolidate_emotions_by_segment"] = with_rate(consolidate, len(segments), "segments")
+    columns = load_face_series(npy_path)
+    results["consolidate_segments"] = with_rate(
+        measure(lambda: consolidate_segments(columns, segments), repeats), len(segments), "segments")
+
+    events = synchronize_data(segments, npy_path)
+    results["generate_insights"] = with_rate(
+        measure(lambda: [generate_insights(event) for event in events], repeats), len(events), "events")
+
+    report_path = os.path.join(workdir, f"{label}_FINAL.json")
+    with ReportWriter(report_path, {"interview_id": f"INT-BENCH-{label}", "video_path": "bench.mp4"}) as writer:
+        for event in events:
+            writer.write_event(event)
+        writer.finish({"overall_congruence_score": round(writer.overall_score(), 2),
+                       "total_duration_sec": writer.end_time_sec})
+    labels_path = os.path.join(workdir, f"{label}_labels.csv")
+    with open(labels_path, "w", encoding="utf-8") as f:
+        f.write(",".join(labels[0]) + "\n")
+        f.writelines(",".join(str(value) for value in row.values()) + "\n" for row in labels)
+    results["run_manual_validation"] = with_rate(
+        measure(lambda: run_manual_validation(report_path, labels_path), repeats), len(events), "events")
+
+    # El gráfico es la etapa más lenta: pocas repeticiones
+    plot_path = os.path.join(workdir, f"{label}_dashboard.png")
+    results["generate_comparison_plot"] = with_rate(
+        measure(lambda: generate_comparison_plot(events, plot_path), min(repeats, 2)), len(events), "events")
+    results["generate_comparison_plot_fast"] = with_rate(
+        measure(lambda: generate_comparison_plot(events, plot_path, fast=True), min(repeats, 2)), len(events), "events")
+    return results
+
+
+def bench_models(workdir):
+    """
+    Nivel opcional: modelos reales sobre los artefactos incluidos en 01_DATA (audio
+    limpio y video de prueba), sin caché. Cada etapa sin sus dependencias queda
+    registrada como omitida y cualquier otro error (ffmpeg ausente, descarga del
+    modelo, video inválido o una extracción que retorna False) como fallida, sin
+    perder el resto de los resultados.
+    """
+    results = {}
+    audio_path = os.path.join(ROOT_DIR, "01_DATA", "audio_clean", "audio_video_01.wav")
+    try:
+        from modules.audio_text.transcriber import get_transcription_and_emotion
+        stats = {}
+        start = time.perf_counter()
+        segments = get_transcription_and_emotion(audio_path, stats=stats)
+        results["transcription"] = {"best_sec": round(time.perf_counter() - start, 3), "runs": 1,
+                                    "segments": len(segments or []), **stats}
+    except ImportError as e:
+        results["transcription"] = {"skipped": f"dependencia faltante: {e.name}"}
+    except Exception as e:
+        results["transcription"] = {"failed": str(e)}
+
+    video_path = os.path.join(ROOT_DIR, "01_DATA", "raw", "video_06.mp4")
+    try:
+        from modules.visual.face_extractor import extract_faces_from_video
+        stats = {}
+        start = time.perf_counter()
+        ok = extract_faces_from_video(video_path, os.path.join(workdir, "video_06_faces.csv"), stats=stats)
+        if ok:
+            results["face_extraction"] = {"best_sec": round(time.perf_counter() - start, 3), "runs": 1, **stats}
+        else:
+            # El extractor informa sus fallos (video ausente, decodificación) en el log, no con excepciones
+            results["face_extraction"] = {"failed": "extract_faces_from_video no generó la serie (ver log)"}
+    except ImportError as e:
+        results["face_extraction"] = {"skipped": f"dependencia faltante: {e.name}"}
+    except Exception as e:
+        results["face_extraction"] = {"failed": str(e)}
+    return results
+
+
+def environment():
+    """Commit y entorno de la corrida: permite comparar resultados entre commits."""
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare_results(current, baseline, max_regression=MAX_REGRESSION):
+    """Imprime la razón actual/referencia por etapa y retorna las regresiones."""
+    regressions = []
+    print(f"\nComparación con {baseline['environment'].get('commit')} (umbral x{max_regression:.2f}):")
+    for label, benches in current["results"].items():
+        for name, result in benches.items():
+            base = baseline["results"].get(label, {}).get(name, {})
+            if "best_sec" not in result or not base.get("best_sec"):
+                continue
+            ratio = result["best_sec"] / base["best_sec"]
+            slower = result["best_sec"] - base["best_sec"] > NOISE_FLOOR_SEC
+            flag = "REGRESIÓN" if ratio > max_regression and slower else ""
+            print(f"  {label:>5} {name:<33} {base['best_sec']:>10.4f}s -> {result['best_sec']:>10.4f}s  x{ratio:.2f} {flag}")
+            if flag:
+                regressions.append((label, name, ratio))
+    return regressions
+
+
+def check_suite(sizes=DEFAULT_SIZES, repeats=REPEATS, models=False, out_path=None, baseline_path=None,
+                max_regression=MAX_REGRESSION):
+    """
+    Suite reproducible (semilla fija) sobre entrevistas sintéticas. Guarda los
+    resultados en JSON (05_OUTPUTS/benchmarks/bench_<commit>_<fecha>.json) y, con
+    `baseline_path`, los compara contra una corrida anterior.
+    """
+    print(f"--- Benchmark: Suite de Integración ({', '.join(sizes)}) ---")
+    # Los logs por segmento saturan la consola y distorsionan la medición
+    logging.disable(logging.INFO)
+    report = {"environment": environment(), "config": {"face_interval_sec": FACE_INTERVAL_SEC,
+                                                       "segment_sec": SEGMENT_SEC, "repeats": repeats},
+              "results": {}}
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench_suite_") as workdir:
+            for label in sizes:
+                results = bench_size(label, SIZES[label], workdir, repeats)
+                report["results"][label] = results
+                print(f"\n{label}: {results['_input']['frames']} frames, {results['_input']['segments']} segmentos")
+                for name, result in results.items():
+                    if name != "_input":
+                        note = " (extrapolado)" if "extrapolated_from" in result else ""
+                        print(f"  {name:<33} {result['best_sec']:>10.4f}s{note}")
+            if models:
+                report["results"]["models"] = bench_models(workdir)
+                for name, result in report["results"]["models"].items():
+                    if "best_sec" in result:
+                        print(f"  {name:<33} {result['best_sec']:.2f}s")
+                    else:
+                        print(f"  {name:<33} {result.get('skipped') or 'FALLÓ: ' + result['failed']}")
+    finally:
+        logging.disable(logging.NOTSET)
+
+    if out_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out_path = os.path.join(RESULTS_DIR, f"bench_{report['environment']['commit'] or 'local'}_{stamp}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"\nResultados guardados en: {out_path}")
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            regressions = compare_results(report, json.load(f), max_regression)
+        print("OK" if not regressions else f"FALLO: {len(regressions)} regresiones")
+        return not regressions
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suite de benchmarks sobre entrevistas sintéticas.")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                        help=f"Duraciones a medir, separadas por coma ({', '.join(SIZES)}).")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--models", action="store_true",
+                        help="Incluye los modelos reales (Whisper, RoBERTuito, DeepFace) sobre 01_DATA.")
+    parser.add_argument("--out", help="Ruta del JSON de resultados.")
+    parser.add_argument("--compare", help="JSON de una corrida anterior contra el que comparar.")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION)
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"Duraciones desconocidas: {', '.join(unknown)}")
+    sys.exit(0 if check_suite(sizes, args.repeats, args.models, args.out, args.compare, args.max_regression) else 1)
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Rutas: este script vive en 03_EXPERIMENTS y los módulos en 02_CODE
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, "02_CODE"))
+
+from modules.integration.synchronizer import face_history_bounds, synchronize_frames
+
+EMOTIONS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+N_SEGMENTS = 10_000
+N_FRAMES = 1_000_000
+# La máscara original es O(S x F): se mide sobre una muestra y se extrapola
+BASELINE_SEGMENTS = 200
+
+
+def make_synthetic_series(n_segments, n_frames, seed=0):
+    """Serie facial uniforme y segmentos contiguos que cubren la misma duración."""
+    rng = np.random.default_rng(seed)
+    duration = n_frames * 0.1
+    df_faces = pd.DataFrame({
+        "timestamp_sec": np.round(np.arange(n_frames) * 0.1, 2),
+        "emotion": rng.choice(EMOTIONS, size=n_frames),
+        "confidence": rng.uniform(30, 100, size=n_frames),
+    })
+    bounds = np.sort(rng.uniform(0, duration, size=n_segments + 1))
+    segments = [
+        {"start_time": float(a), "end_time": float(b), "text": "...", "emotion": rng.choice(EMOTIONS)}
+        for a, b in zip(bounds[:-1], bounds[1:])
+    ]
+    return df_faces, segments
+
+
+def mask_histories(df_faces, segments):
+    """Implementación original: una máscara booleana completa por segmento."""
+    return [
+        df_faces.loc[(df_faces['timestamp_sec'] >= seg['start_time']) & (df_faces['timestamp_sec'] <= seg['end_time']), 'emotion'].tolist()
+        for seg in segments
+    ]
+
+
+def check_synchronizer():
+    print(f"--- Benchmark: Join de Intervalos ({N_SEGMENTS} segmentos / {N_FRAMES} frames) ---")
+    df_faces, segments = make_synthetic_series(N_SEGMENTS, N_FRAMES)
+
+    # 1. Join por búsqueda binaria (solo el cálculo de índices)
+    timestamps = df_faces["timestamp_sec"].to_numpy()
+    emotions = df_faces["emotion"].tolist()
+    start = time.perf_counter()
+    lo, hi = face_history_bounds(timestamps,
+                                 np.array([s["start_time"] for s in segments]),
+                                 np.array([s["end_time"] for s in segments]))
+    histories = [emotions[a:b] for a, b in zip(lo, hi)]
+    t_join = time.perf_counter() - start
+    print(f"searchsorted + slicing:   {t_join:8.3f} s")
+
+    # 2. Fusión completa (join + lógica recurrente)
+    start = time.perf_counter()
+    synchronize_frames(segments, df_faces)
+    t_fusion = time.perf_counter() - start
+    print(f"synchronize_frames:       {t_fusion:8.3f} s")
+
+    # 3. Máscara original sobre una muestra, extrapolada
+    sample = segments[:BASELINE_SEGMENTS]
+    start = time.perf_counter()
+    baseline = mask_histories(df_faces, sample)
+    t_mask = (time.perf_counter() - start) * N_SEGMENTS / BASELINE_SEGMENTS
+    print(f"máscara (extrapolado):    {t_mask:8.3f} s")
+
+    identical = baseline == histories[:BASELINE_SEGMENTS]
+    print(f"\nHistoriales idénticos en la muestra: {identical}")
+    print(f"Aceleración del join: x{t_mask / t_join:.1f}")
+
+
+if __name__ == "__main__":
+    check_synchronizer()